@@ -2,13 +2,14 @@ const { app, BrowserWindow, ipcMain, dialog } = require('electron');
 const path = require('path');
 const { exec } = require('child_process');
 const { spawn } = require('child_process');
+const readline = require('readline');
+const { randomUUID } = require('crypto');
 const Store = require('electron-store');
 const store = new Store();
 const fs = require('fs');
 // const fs = require('fs/promises'); // Import the Promises API
 const csvParser = require('csv-parser');
 
-const { createObjectCsvWriter } = require('csv-writer');
 // use stringyfy to convert data to csv
 
 const { stringify } = require('csv-stringify');
@@ -30,6 +31,110 @@ let mainWindowGlobal = null;
 
 let chartWindow = null;
 
+// Long-lived Python backend (vxi11-api.py --serve) speaking line-delimited JSON-RPC
+let pythonDaemon = null;
+let daemonRequestId = 0;
+const daemonPending = new Map(); // Map<requestId, { resolve, reject }>
+//=================================================================================
+function getPythonScriptPath(scriptName) {
+  if (app.isPackaged) {
+    return path.join(process.resourcesPath, 'python', scriptName);
+  }
+  return path.join(__dirname, '../src/services/python', scriptName);
+}
+//=================================================================================
+function startPythonDaemon() {
+  const daemon = spawn('python3', [getPythonScriptPath('vxi11-api.py'), '--serve']);
+  const lines = readline.createInterface({ input: daemon.stdout });
+
+  lines.on('line', (line) => {
+    let message;
+    try {
+      message = JSON.parse(line);
+    } catch (err) {
+      addLog('error', 'Invalid message from Python daemon:', line);
+      return;
+    }
+
+    if (message.id !== undefined && message.id !== null) {
+      const pending = daemonPending.get(message.id);
+      if (!pending) return;
+      daemonPending.delete(message.id);
+      if (message.error) {
+        pending.reject(new Error(message.error.message));
+      } else {
+        pending.resolve(message.result);
+      }
+    } else if (message.method) {
+      handleDaemonNotification(message.method, message.params);
+    }
+  });
+
+  daemon.stderr.on('data', (data) => {
+    addLog('info', 'Python daemon:', data.toString().trim());
+  });
+
+  daemon.on('close', (code) => {
+    addLog('error', `Python daemon exited with code ${code}`);
+    daemonPending.forEach(({ reject }) => reject(new Error('Python daemon exited')));
+    daemonPending.clear();
+    if (pythonDaemon === daemon) {
+      pythonDaemon = null;
+    }
+  });
+
+  return daemon;
+}
+//=================================================================================
+function callPython(method, params) {
+  if (!pythonDaemon) {
+    pythonDaemon = startPythonDaemon();
+  }
+  const id = ++daemonRequestId;
+  return new Promise((resolve, reject) => {
+    daemonPending.set(id, { resolve, reject });
+    pythonDaemon.stdin.write(JSON.stringify({ jsonrpc: '2.0', id, method, params }) + '\n');
+  });
+}
+//=================================================================================
+function handleDaemonNotification(method, params) {
+  if (method === 'device-found') {
+    // Discovery streams each instrument as soon as it answers
+    mainWindowGlobal.webContents.send('device-found', params);
+  } else if (method === 'test-samples') {
+    // Rate-limited sample batches; seq increases by one per batch, dropped counts coalesced samples
+    mainWindowGlobal.webContents.send('test-samples', params);
+  } else if (method === 'test-started') {
+    // A queued test got a worker; its duration counts from now
+    const testInfo = ongoingTests.get(params.test_id);
+    if (!testInfo) return;
+    testInfo.status = 'running';
+    testInfo.startTime = new Date().toISOString();
+    mainWindowGlobal.webContents.send('test-started', {
+      testId: params.test_id,
+      startTime: testInfo.startTime,
+    });
+  } else if (method === 'test-finished') {
+    const testInfo = ongoingTests.get(params.test_id);
+    if (!testInfo) return; // stopped by the user
+
+    testInfo.status = params.status === 'error' ? 'failed' : 'completed';
+    testInfo.endTime = new Date().toISOString();
+    testInfo.message = params.message;
+
+    // Move to completedTests
+    ongoingTests.delete(params.test_id);
+    completedTests.set(params.test_id, testInfo);
+
+    mainWindowGlobal.webContents.send('test-completed', {
+      testId: params.test_id,
+      status: testInfo.status,
+      endTime: testInfo.endTime,
+      message: testInfo.message,
+    });
+  }
+}
+
 ipcMain.handle('get-test-duration', async (_, testId) => {
   let testInfo = ongoingTests.get(testId);
   if (!testInfo) {
@@ -43,16 +148,9 @@ ipcMain.handle('get-test-duration', async (_, testId) => {
     throw new Error('Test not found');
   }
 });
-ipcMain.handle('generate-chart', async (_, { filePath, xAxis, yAxis }) => {
-  let pythonScriptPath;
-
-  if (app.isPackaged) {
-    pythonScriptPath = path.join(process.resourcesPath, 'python', 'charts.py');
-  } else {
-    pythonScriptPath = path.join(__dirname, '../src/services/python/charts.py');
-  }
-
-  addLog('info', 'Resolved Python script path:', pythonScriptPath);
+// filePath and yAxis may be arrays to overlay several runs or series;
+// pivot (e.g. 'Command') splits a long-format log into one series per value
+ipcMain.handle('generate-chart', async (_, { filePath, xAxis, yAxis, pivot }) => {
   // Retrieve the current theme
   // Retrieve the current theme from the renderer process
   const theme = await mainWindowGlobal.webContents.executeJavaScript(`
@@ -64,21 +162,13 @@ ipcMain.handle('generate-chart', async (_, { filePath, xAxis, yAxis }) => {
   //console.log('Current theme:', theme);
 
   try {
-    const { stdout } = await new Promise((resolve, reject) => {
-      exec(
-        `python3 ${pythonScriptPath} "${filePath}" "${xAxis}" "${yAxis}" "${theme}"`,
-        (error, stdout, stderr) => {
-          if (error) {
-            addLog('error', 'Error running Python script:', stderr);
-            reject(error);
-          } else {
-            resolve({ stdout });
-          }
-        }
-      );
+    const htmlPath = await callPython('chart', {
+      csv_file: filePath,
+      x_column: xAxis,
+      y_column: yAxis,
+      theme,
+      pivot,
     });
-
-    const htmlPath = stdout.trim(); // Python script should return the path to the HTML file
     addLog('info', 'Generated chart HTML path:', htmlPath);
 
     // Open the generated HTML in a new Electron window
@@ -170,34 +260,8 @@ ipcMain.handle('save-selected-device', (_, device) => {
 });
 //=================================================================================
 ipcMain.handle('search-devices', async (_, subnet) => {
-  let pythonScriptPath;
-
-  if (app.isPackaged) {
-    pythonScriptPath = path.join(process.resourcesPath, 'python', 'vxi11-api.py');
-  } else {
-    pythonScriptPath = path.join(__dirname, '../src/services/python/vxi11-api.py');
-  }
-
-
-  addLog('info', "Resolved Python script path:", pythonScriptPath);
-
   try {
-    const { stdout } = await new Promise((resolve, reject) => {
-      exec(
-        `python3 ${pythonScriptPath} --discover "${subnet}"`,
-        (error, stdout, stderr) => {
-          if (error) {
-            addLog('error', 'Error running Python script:', stderr);
-            reject(error);
-          } else {
-            resolve({ stdout });
-          }
-        }
-      );
-    });
-
-    addLog('info', 'Raw Python output:', stdout.trim());
-    return JSON.parse(stdout.trim()); // Parse JSON response
+    return await callPython('discover', { subnet });
   } catch (error) {
     addLog('error', 'Error executing discovery:', error);
     return { error: error.message };
@@ -205,16 +269,6 @@ ipcMain.handle('search-devices', async (_, subnet) => {
 });
 //=================================================================================
 ipcMain.handle('test-command', async (_, command) => {
-  let pythonScriptPath;
-  if (app.isPackaged) {
-    pythonScriptPath = path.join(process.resourcesPath, 'python', 'vxi11-api.py');
-  } else {
-    pythonScriptPath = path.join(__dirname, '../src/services/python/vxi11-api.py');
-  }
-
-
-  addLog("Resolved Python script path:", pythonScriptPath);
-
   if (!savedSelectedDevice || !savedSelectedDevice.address) {
     addLog('error', 'No device selected!');
     return `Error: No device selected`;
@@ -222,23 +276,10 @@ ipcMain.handle('test-command', async (_, command) => {
   const ip = savedSelectedDevice.address;
 
   try {
-    const { stdout } = await new Promise((resolve, reject) => {
-      exec(
-        `python3 ${pythonScriptPath} --ip "${ip}" --command "${command}"`,
-        (error, stdout, stderr) => {
-          if (error) {
-            addLog('error', 'Error running Python script:', stderr);
-            reject(error);
-          } else {
-            resolve({ stdout });
-          }
-        }
-      );
-    });
-
+    const response = await callPython('command', { address: ip, command });
     //addLog(`Command sent to ${deviceName} (${ip}): ${command}`);
-    addLog('info', 'Raw Python output:', stdout.trim());
-    return stdout.trim(); // Return plain text response
+    addLog('info', 'Raw Python output:', response.trim());
+    return response.trim(); // Return plain text response
   } catch (error) {
     addLog('error', 'Error executing command:', error);
     return `Error: ${error.message}`;
@@ -246,14 +287,6 @@ ipcMain.handle('test-command', async (_, command) => {
 });
 //=================================================================================
 ipcMain.handle('start-test', async (_, testData) => {
-  let pythonScriptPath;
-  if (app.isPackaged) {
-    pythonScriptPath = path.join(process.resourcesPath, 'python', 'vxi11-api.py');
-  } else {
-    pythonScriptPath = path.join(__dirname, '../src/services/python/vxi11-api.py');
-  }
-
-
   if (!savedSelectedDevice || !savedSelectedDevice.address) {
     addLog('error', 'No device selected!');
     return { status: 'error', message: 'No device selected' };
@@ -265,114 +298,46 @@ ipcMain.handle('start-test', async (_, testData) => {
   }
 
   const ip = savedSelectedDevice.address;
+  // Registered before the request is sent: a test that fails at once can
+  // finish (test-finished) before the start_test reply arrives
+  const testId = randomUUID().slice(0, 8);
+  const testInfo = {
+    name: testData.name,
+    duration: testData.duration, // Duration in minutes
+    startTime: new Date().toISOString(),
+    logFilePath: null,
+    status: 'queued',
+  };
+  ongoingTests.set(testId, testInfo);
 
   try {
-    const startTime = new Date().toISOString();
-
-    // Spawn the Python process
-    const childProcess = spawn('python3', [
-      pythonScriptPath,
-      '--ip',
-      ip,
-      '--start-test',
-      JSON.stringify(testData),
-      '--savedir',
-      saveDirectory,
-    ]);
-
-    // Generate a unique test ID
-    const testId = crypto.randomUUID();
-    let currentTestId = null; // Variable to store the test_id after parsing
-
-    const resultPromise = new Promise((resolve, reject) => {
-      childProcess.stdout.on('data', (data) => {
-        //console.log('Raw logs from Python:', data.toString().trim());
-        try {
-          const parsedData = JSON.parse(data.toString().trim());
-          if (parsedData.status === 'running' && !currentTestId) {
-            currentTestId = parsedData.test_id || testId; // Store the test_id
-
-            // Create the TestInfo object
-            const testInfo = {
-              childProcess,
-              name: testData.name,
-              duration: testData.duration, // Duration in minutes
-              startTime,
-              logFilePath: parsedData.log_file_path,
-              status: 'running',
-            };
-
-            // **Add this log to verify duration**
-            // //console.log('Storing TestInfo:', testInfo);
-
-            // Store in ongoingTests
-            ongoingTests.set(currentTestId, testInfo);
-
-            // Resolve with initial test details
-            resolve({
-              id: currentTestId,
-              name: testData.name,
-              duration: testData.duration,
-              startTime,
-              endTime: null,
-              status: 'running',
-              logFilePath: parsedData.log_file_path,
-            });
-
-            addLog('info', `Test started successfully. Log file: ${parsedData.log_file_path}`);
-          }
-        } catch (err) {
-          //console.error('Error parsing Python response:', err.message);
-        }
-      });
-
-      childProcess.stderr.on('data', (stderr) => {
-        //console.error('Error from Python:', stderr.toString().trim());
-        reject(stderr.toString().trim());
-      });
-
-      childProcess.on('close', (code) => {
-        //console.log(`Python process closed with code ${code}`);
-        if (code !== 0 && !currentTestId) {
-          reject(new Error(`Python script exited with code ${code}`));
-        }
-
-        if (currentTestId) {
-          const testInfo = ongoingTests.get(currentTestId);
-          if (testInfo) {
-            testInfo.status = code === 0 ? 'completed' : 'failed';
-            testInfo.endTime = new Date().toISOString();
-
-            // Move to completedTests
-            ongoingTests.delete(currentTestId);
-            completedTests.set(currentTestId, testInfo);
-
-
-            // Notify renderer process
-            // BrowserWindow.getAllWindows().forEach((window) => {
-            if (code === 0) {
-              // "test-completed" is just an example channel name
-              //console.log(`Emitting test-completed for Test ID: ${currentTestId}`);
-              mainWindowGlobal.webContents.send('test-completed', {
-                testId: currentTestId,
-                status: testInfo.status,
-                endTime: testInfo.endTime,
-              });
-            }
-
-          } else {
-            // pass
-
-            //console.error(`Test Info for Test ID ${currentTestId} not found.`);
-          }
-        }
-      });
+    // The daemon replies as soon as the test is scheduled ("running" or "queued");
+    // a queued test reports test-started and completion arrives as test-finished
+    const started = await callPython('start_test', {
+      test: testData,
+      address: ip,
+      save_dir: saveDirectory,
+      test_id: testId,
     });
 
-    const initialResult = await resultPromise;
-    //console.log('Initial Test Result:', initialResult);
-    return initialResult;
+    testInfo.logFilePath = started.log_file_path;
+    if (started.status === 'running' && testInfo.status === 'queued') {
+      testInfo.status = 'running';
+    }
+
+    addLog('info', `Test ${testInfo.status}. Log file: ${started.log_file_path}`);
+    return {
+      id: testId,
+      name: testData.name,
+      duration: testData.duration,
+      startTime: testInfo.startTime,
+      endTime: testInfo.endTime || null,
+      status: testInfo.status,
+      message: testInfo.message,
+      logFilePath: started.log_file_path,
+    };
   } catch (error) {
+    ongoingTests.delete(testId);
     addLog('error', 'Error executing start-test:', error);
     return { status: 'error', message: error.message || 'Unknown error' };
   }
@@ -386,23 +351,16 @@ ipcMain.handle('stop-test', async (_, testId) => {
     };
   }
 
-  const testInfo = ongoingTests.get(testId);
-  const childProcess = testInfo.childProcess;
-
-  if (typeof childProcess.kill !== 'function') {
-    return {
-      status: 'error',
-      message: `Cannot kill test ${testId} because childProcess.kill is not a function.`,
-    };
-  }
-
   try {
-    childProcess.kill();
+    const result = await callPython('stop_test', { test_id: testId });
+    if (result.status !== 'success') {
+      return result;
+    }
     ongoingTests.delete(testId);
 
     return { status: 'success', message: `Test ${testId} stopped.` };
   } catch (error) {
-    //console.error(`Failed to kill test ${testId}:`, error);
+    //console.error(`Failed to stop test ${testId}:`, error);
     return { status: 'error', message: `Failed to stop test ${testId}: ${error.message}` };
   }
 });
@@ -517,71 +475,34 @@ ipcMain.handle('file:readCSV', async (_, filePath) => {
 
 
 //=================================================================================
-ipcMain.handle('file:writeCSV', async (_, { filePath, headers, regexRules }) => {
-  try {
-    if (!fullDatasetCache[filePath]) {
-      throw new Error('Full dataset is not cached. Unable to save.');
-    }
-
-    console.log(`Starting to write CSV to: ${filePath}`);
-    console.log(`Headers: ${JSON.stringify(headers)}`);
-    console.log(`Regex rules: ${JSON.stringify(regexRules)}`);
+// A row or time window of a large log, read by the daemon through the log's index
+ipcMain.handle('file:readCSVRange', async (_, { filePath, startRow, stopRow, startTime, endTime, maxRows }) => {
+  return callPython('log_rows', {
+    log_file: filePath,
+    start_row: startRow,
+    stop_row: stopRow,
+    start_time: startTime,
+    end_time: endTime,
+    max_rows: maxRows,
+  });
+});
 
+//=================================================================================
+ipcMain.handle('file:writeCSV', async (_, { filePath, regexRules }) => {
+  try {
     // Ensure regexRules is in the expected format
     if (typeof regexRules !== 'object' || !regexRules) {
       throw new Error('Invalid regexRules format. Expected an object.');
     }
 
-    // Apply regex rules to the entire cached dataset
-    console.log('Applying regex rules to the dataset...');
-    const updatedDataset = fullDatasetCache[filePath].map((row, rowIndex) => {
-      const updatedRow = { ...row };
-      console.log(`Original row ${rowIndex}: ${JSON.stringify(row)}`);
-
-      for (const [column, regexList] of Object.entries(regexRules)) {
-        if (!Array.isArray(regexList)) {
-          console.error(`Invalid regex list for column "${column}":`, regexList);
-          continue;
-        }
-
-        if (updatedRow[column]) {
-          console.log(`Processing column "${column}" with value "${updatedRow[column]}"`);
-          try {
-            regexList.forEach((regex, regexIndex) => {
-              console.log(`Applying regex ${regexIndex}: "${regex}"`);
-              const regExp = new RegExp(regex, 'g');
-              updatedRow[column] = updatedRow[column].replace(regExp, '');
-              console.log(`Updated value for column "${column}": "${updatedRow[column]}"`);
-            });
-          } catch (err) {
-            console.error(`Error applying regex for column "${column}":`, err);
-          }
-        } else {
-          console.log(`Skipping column "${column}" as it does not exist in the current row.`);
-        }
-      }
-
-      console.log(`Updated row ${rowIndex}: ${JSON.stringify(updatedRow)}`);
-      return updatedRow;
-    });
-
-    console.log('Finished applying regex rules.');
-
-    // Update the cache with the modified dataset
-    fullDatasetCache[filePath] = updatedDataset;
-    console.log(`Cache updated for file: ${filePath}`);
-
-    // Configure the CSV writer
-    const csvWriter = createObjectCsvWriter({
-      path: filePath,
-      header: headers.map((header) => ({ id: header, title: header })),
-    });
-
-    // Write the updated dataset back to the file
-    console.log('Writing updated dataset to file...');
-    await csvWriter.writeRecords(updatedDataset);
-    console.log(`File saved successfully at: ${filePath}`);
+    // The daemon rewrites the whole log with precompiled patterns, in parallel for large files,
+    // instead of pushing every row through the main process
+    addLog('info', `Applying regex rules to ${filePath}: ${JSON.stringify(regexRules)}`);
+    const result = await callPython('transform_log', { log_file: filePath, rules: regexRules });
+    addLog('info', `File saved successfully at: ${filePath} (${result.rows} rows)`);
 
+    // The cached rows no longer match the file; readCSV reloads them
+    delete fullDatasetCache[filePath];
     return true;
   } catch (error) {
     console.error('Failed to write CSV:', error);
@@ -614,13 +535,14 @@ app.on('before-quit', () => {
 });
 //=================================================================================
 function cleanupResources() {
-  ongoingTests.forEach((childProcess, testId) => {
-    //console.log(`Terminating test: ${testId}`);
+  // Closing stdin tells the daemon to stop running tests and exit
+  if (pythonDaemon) {
     try {
-      childProcess.kill('SIGKILL'); // Forcefully terminate if necessary
+      pythonDaemon.stdin.end();
     } catch (error) {
-      //console.error(`Failed to terminate test: ${testId}`, error);
+      //console.error('Failed to stop Python daemon', error);
     }
-  });
+    pythonDaemon = null;
+  }
   ongoingTests.clear();
 }
\ No newline at end of file
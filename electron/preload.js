@@ -38,8 +38,11 @@ contextBridge.exposeInMainWorld(
   saveTests: (tests) => ipcRenderer.invoke('save-tests', tests),
   onTestCompleted: (callback) => ipcRenderer.on('test-completed', callback),
   offTestCompleted: (callback) => ipcRenderer.off('test-completed', callback),
+  onTestStarted: (callback) => ipcRenderer.on('test-started', callback),
+  offTestStarted: (callback) => ipcRenderer.off('test-started', callback),
   openDirectory: () => ipcRenderer.invoke('dialog:openDirectory'),
   readCSV: (filePath) => ipcRenderer.invoke('file:readCSV', filePath),
+  readCSVRange: (params) => ipcRenderer.invoke('file:readCSVRange', params),
   writeCSV: (params) => ipcRenderer.invoke('file:writeCSV', params),
   generateChart: (params) =>
     ipcRenderer.invoke('generate-chart', params),
@@ -48,7 +51,7 @@ contextBridge.exposeInMainWorld(
   getZoomLevel: () => webFrame.getZoomLevel(),
   setZoomLevel: (level) => webFrame.setZoomLevel(level),
   on: (channel, callback) => {
-    const validChannels = ['test-completed']; // Add other channels if necessary
+    const validChannels = ['test-completed', 'test-started', 'device-found', 'test-samples']; // Add other channels if necessary
     if (validChannels.includes(channel)) {
       ipcRenderer.on(channel, (event, ...args) => callback(...args));
     }
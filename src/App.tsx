@@ -30,29 +30,49 @@ export default function App() {
   const [expandedTest, setExpandedTest] = useState(null); // Initialize expandedTest
   const instrument = MockInstrument.getInstance();
 
-  // Listen for "test-completed" from main process
+  // Listen for "test-started" and "test-completed" from main process
   useEffect(() => {
-    const handleTestCompleted = (_event: any, data: { testId: string }) => {
+    const handleTestStarted = (_event: any, data: { testId: string; startTime: string }) => {
+      // A queued test got a worker
+      setTests((prevTests) =>
+        prevTests.map((t) =>
+          t.id === data.testId ? { ...t, status: 'running', startTime: data.startTime } : t
+        )
+      );
+      addLog('info', `Test ${data.testId} left the queue and is running.`);
+    };
+
+    const handleTestCompleted = (
+      _event: any,
+      data: { testId: string; status: 'completed' | 'failed'; endTime: string; message?: string }
+    ) => {
 
-      // Mark that test as completed
+      // Mark that test as completed or failed
       setTests((prevTests) =>
         prevTests.map((t) =>
           t.id === data.testId
             ? {
               ...t,
-              status: 'completed',
-              endTime: new Date().toISOString(),
+              status: data.status,
+              endTime: data.endTime,
             }
             : t
         )
       );
-      addLog('info', `Test ${data.testId} completed naturally.`);
-      toast.success(`Test ${data.testId} completed.`);
+      if (data.status === 'failed') {
+        addLog('error', `Test ${data.testId} failed: ${data.message}`);
+        toast.error(`Test ${data.testId} failed.`);
+      } else {
+        addLog('info', `Test ${data.testId} completed naturally.`);
+        toast.success(`Test ${data.testId} completed.`);
+      }
     };
 
+    window.api.onTestStarted(handleTestStarted);
     window.api.onTestCompleted(handleTestCompleted);
 
     return () => {
+      window.api.offTestStarted(handleTestStarted);
       window.api.offTestCompleted(handleTestCompleted);
 
     };
@@ -71,8 +91,17 @@ export default function App() {
         throw new Error(result.message);
       }
 
-      addLog('info', `Test started successfully.\nSaving to: ${result.logFilePath}`);
-      toast.success(`Test started successfully.`);
+      if (result.status === 'queued') {
+        addLog('info', `Test queued until a worker is free.\nSaving to: ${result.logFilePath}`);
+        toast.info(`Test queued.`);
+      } else if (result.status === 'failed') {
+        // it failed before the start reply arrived
+        addLog('error', `Test failed: ${result.message}`);
+        toast.error(`Test failed: ${result.message}`);
+      } else {
+        addLog('info', `Test started successfully.\nSaving to: ${result.logFilePath}`);
+        toast.success(`Test started successfully.`);
+      }
       setTests((prevTests) => [
         ...prevTests,
         {
@@ -128,7 +157,7 @@ export default function App() {
   const handleRemoveTest = async (testId: string, status: string) => {
     // If running, stop the test
     addLog('info', `Stopping test ${testId} ...`);
-    if (status === 'running') {
+    if (status === 'running' || status === 'queued') {
       const response = await window.api.stopTest(testId);
       if (response.status !== 'success') {
         addLog('error', `Failed to stop test ${testId}: ${response.message}`);
@@ -1,6 +1,6 @@
 import React from 'react';
 import { format } from 'date-fns';
-import { Activity, XCircle, CheckCircle2, Trash2 } from 'lucide-react';
+import { Activity, Clock, XCircle, CheckCircle2, Trash2 } from 'lucide-react';
 import type { TestResult } from '../types/test';
 import Timer from './Timer';
 
@@ -16,6 +16,8 @@ const TestResultsTableComponent: React.FC<TestResultsTableProps> = ({
 }) => {
   const getStatusIcon = (status: TestResult['status']) => {
     switch (status) {
+      case 'queued':
+        return <Clock className="h-5 w-5 text-gray-500" />;
       case 'running':
         return <Activity className="h-5 w-5 text-blue-500 animate-pulse" />;
       case 'completed':
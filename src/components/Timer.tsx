@@ -6,7 +6,7 @@ const processedTests = new Set<string>();
 interface TimerProps {
   testId: string;
   startTime: string; // ISO string
-  status: 'running' | 'completed' | 'failed';
+  status: 'queued' | 'running' | 'completed' | 'failed';
 }
 
 const Timer: React.FC<TimerProps> = ({ testId, startTime, status }) => {
@@ -39,7 +39,7 @@ const Timer: React.FC<TimerProps> = ({ testId, startTime, status }) => {
   }, [testId]);
 
   useEffect(() => {
-    if (duration === null) return;
+    if (duration === null || status === 'queued') return;
 
     const startTimestamp = new Date(startTime).getTime();
     const updateInterval = 1000; // 1 second
@@ -69,6 +69,10 @@ const Timer: React.FC<TimerProps> = ({ testId, startTime, status }) => {
     return <span className="text-red-500">{error}</span>;
   }
 
+  if (status === 'queued') {
+    return <span>Queued</span>;
+  }
+
   if (remaining === null) {
     return <span>Loading...</span>;
   }
@@ -83,7 +87,9 @@ const Timer: React.FC<TimerProps> = ({ testId, startTime, status }) => {
     <span>
       {status === 'running'
         ? formatTime(remaining)
-        : `Completed in ${formatTime(remaining)}`}
+        : status === 'failed'
+          ? `Failed after ${formatTime(remaining)}`
+          : `Completed in ${formatTime(remaining)}`}
     </span>
   );
 };
@@ -0,0 +1,243 @@
+import argparse
+import contextlib
+import csv
+import importlib.util
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from lxi_discovery import discover_devices
+from sim_instrument import SimulatedInstrument
+
+API_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vxi11-api.py")
+# Run in a fresh interpreter: how long importing vxi11-api.py takes and which heavy modules it pulls in
+IMPORT_PROBE = ("import importlib.util, json, sys, time\n"
+                "started = time.perf_counter()\n"
+                "spec = importlib.util.spec_from_file_location('vxi11_api', sys.argv[1])\n"
+                "spec.loader.exec_module(importlib.util.module_from_spec(spec))\n"
+                "print(json.dumps({'ms': (time.perf_counter() - started) * 1000.0,\n"
+                "                  'loaded': [name for name in ('pyvisa', 'vxi11', 'numpy', 'pyarrow', 'asyncio')\n"
+                "                             if name in sys.modules]}))\n")
+
+
+def load_api():
+    """
+    Import vxi11-api.py, whose file name is not a valid module name.
+    """
+    spec = importlib.util.spec_from_file_location("vxi11_api", API_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentiles(values, points=(50, 90, 99)):
+    """
+    Nearest-rank percentiles of values, plus min/max/mean, rounded to microseconds.
+    """
+    if not values:
+        return {}
+    ordered = sorted(values)
+    summary = {f"p{point}": ordered[min(len(ordered) - 1, max(0, -(-point * len(ordered) // 100) - 1))]
+               for point in points}
+    summary.update(min=ordered[0], max=ordered[-1], mean=sum(ordered) / len(ordered))
+    return {key: round(value, 6) for key, value in summary.items()}
+
+
+def bench_commands(api, address, count, command="MEAS:VOLT:DC?"):
+    """
+    Round trips through send_scpi_command(): commands/sec and latency in ms.
+    """
+    latencies = []
+    failures = 0
+    started = time.perf_counter()
+    for _ in range(count):
+        sent = time.perf_counter()
+        if api.send_scpi_command(address, command) == "No response":
+            failures += 1
+        latencies.append((time.perf_counter() - sent) * 1000.0)
+    elapsed = time.perf_counter() - started
+    return {
+        "commands": count,
+        "commands_per_sec": round(count / elapsed, 1),
+        "failures": failures,
+        "latency_ms": percentiles(latencies),
+    }
+
+
+def bench_loop(api, address, output_dir, interval_ms, seconds, commands=3):
+    """
+    Run a deadline-scheduled test and measure how far each row lands from its tick.
+    """
+    test_data = {
+        "name": "benchmark_loop",
+        "duration": seconds / 60.0,
+        "interval": interval_ms,
+        "schedule": "deadline",
+        "commands": [{"command": f"MEAS{channel}:VOLT?"} for channel in range(1, commands + 1)],
+    }
+    result = api.handle_test_data(test_data, address, output_dir)
+    drift = []
+    with open(result["log_file_path"], newline="") as log:
+        for row in csv.DictReader(log):
+            try:
+                drift.append((float(row["Actual"]) - float(row["Intended"])) * 1000.0)
+            except (KeyError, TypeError, ValueError):
+                continue
+    return {
+        "interval_ms": interval_ms,
+        "rows": len(drift),
+        "ticks": result.get("ticks"),
+        "late_ticks": result.get("late_ticks"),
+        "skipped_ticks": result.get("skipped_ticks"),
+        "drift_ms": percentiles(drift),
+    }
+
+
+def bench_discovery(api, instruments):
+    """
+    Time a discovery pass over the simulated instruments (no cache).
+    """
+    addresses = [instrument.address for instrument in instruments]
+    started = time.perf_counter()
+    devices = discover_devices(addresses, api.probe_idn)
+    return {
+        "instruments": len(addresses),
+        "found": sum(1 for device in devices if device.get("type") != "Error"),
+        "seconds": round(time.perf_counter() - started, 6),
+    }
+
+
+def write_log(path, rows, commands=("MEAS1:VOLT?", "MEAS2:VOLT?")):
+    """
+    Synthetic log in the layout handle_test_data() writes.
+    """
+    with open(path, "w", newline="") as log:
+        writer = csv.writer(log)
+        writer.writerow(["Index", "Command", "Response"])
+        for index in range(rows):
+            writer.writerow([index, commands[index % len(commands)], f"{random.gauss(0, 1):.6E}"])
+
+
+def bench_startup(address, runs, backend="pyvisa"):
+    """
+    Cold start of the CLI in fresh interpreters, in ms: a bare interpreter,
+    importing vxi11-api.py, and a whole --ip/--command round trip.
+    """
+    environment = dict(os.environ, SLATE_SCPI_BACKEND=backend)
+    interpreter, imports, commands = [], [], []
+    loaded = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        interpreter.append((time.perf_counter() - started) * 1000.0)
+        probe = json.loads(subprocess.run([sys.executable, "-c", IMPORT_PROBE, API_PATH], check=True,
+                                          capture_output=True, text=True, env=environment).stdout)
+        imports.append(probe["ms"])
+        loaded = probe["loaded"]
+        started = time.perf_counter()
+        subprocess.run([sys.executable, API_PATH, "--ip", address, "--command", "*IDN?"], check=True,
+                       capture_output=True, env=environment)
+        commands.append((time.perf_counter() - started) * 1000.0)
+    return {
+        "runs": runs,
+        "interpreter_ms": percentiles(interpreter),
+        "import_ms": percentiles(imports),
+        "command_ms": percentiles(commands),
+        "modules_loaded_by_import": loaded,
+    }
+
+
+def bench_charts(output_dir, sizes):
+    """
+    charts.generate_chart() time per log size, one trace per command.
+    """
+    import charts
+
+    results = []
+    for rows in sizes:
+        log_path = os.path.join(output_dir, f"benchmark_{rows}.csv")
+        write_log(log_path, rows)
+        started = time.perf_counter()
+        charts.generate_chart(log_path, "Index", "Response", os.path.splitext(log_path)[0] + "_chart.html",
+                              "light", pivot_column="Command")
+        results.append({"rows": rows, "seconds": round(time.perf_counter() - started, 6),
+                        "log_bytes": os.path.getsize(log_path)})
+    return results
+
+
+def run_benchmarks(latency=0.001, jitter=0.0, response_size=0, error_rate=0.0, error_mode="garbage",
+                   commands=1000, interval_ms=50, loop_seconds=5, instruments=8, log_sizes=(10000, 100000, 1000000),
+                   output_dir=None, backend="pyvisa", protocol="raw", native=True, startup_runs=10):
+    """
+    Run every benchmark against simulated instruments and return the report.
+    Latency and jitter are in seconds; backend is the SCPI backend under test.
+    The simulators speak protocol ("raw" or "hislip"); with native=False they
+    are reached through the backend instead of the native transports
+    (liblxi always reaches raw sockets itself).
+    """
+    api = load_api()
+    api.select_backend(backend)
+    if not native:
+        api.session_pool.transports = None
+    with tempfile.TemporaryDirectory() as scratch:
+        output_dir = output_dir or scratch
+        simulators = [SimulatedInstrument(latency=latency, jitter=jitter, response_size=response_size,
+                                          error_rate=error_rate, error_mode=error_mode, protocol=protocol).start()
+                      for _ in range(max(1, instruments))]
+        try:
+            address = simulators[0].address
+            report = {
+                "settings": {"latency_ms": latency * 1000.0, "jitter_ms": jitter * 1000.0,
+                             "response_size": response_size, "error_rate": error_rate,
+                             "error_mode": error_mode, "backend": backend, "protocol": protocol,
+                             "native_transports": native},
+                "commands": bench_commands(api, address, commands),
+                "loop": bench_loop(api, address, output_dir, interval_ms, loop_seconds),
+                "discovery": bench_discovery(api, simulators),
+                "charts": bench_charts(output_dir, log_sizes),
+                "startup": bench_startup(address, startup_runs, backend),
+            }
+        finally:
+            api.session_pool.close_all()
+            for simulator in simulators:
+                simulator.close()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Slate's SCPI, test loop, discovery and chart paths "
+                                                 "against simulated instruments.")
+    parser.add_argument("--latency", type=float, default=1.0, help="Instrument reply delay in ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random +/- reply delay in ms")
+    parser.add_argument("--response-size", type=int, default=0, help="Minimum reply size in bytes")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of commands that fail")
+    parser.add_argument("--error-mode", choices=["drop", "garbage"], default="garbage",
+                        help="How failures look; \"drop\" costs a full client timeout each")
+    parser.add_argument("--commands", type=int, default=1000, help="Queries sent for the throughput benchmark")
+    parser.add_argument("--interval", type=float, default=50, help="Test loop interval in ms")
+    parser.add_argument("--loop-seconds", type=float, default=5, help="Test loop duration in seconds")
+    parser.add_argument("--instruments", type=int, default=8, help="Simulated instruments for discovery")
+    parser.add_argument("--log-sizes", default="10000,100000,1000000", help="Chart log sizes in rows, comma separated")
+    parser.add_argument("--output", help="Write the JSON report to this file as well")
+    parser.add_argument("--backend", choices=["pyvisa", "liblxi"], default="pyvisa", help="SCPI backend under test")
+    parser.add_argument("--startup-runs", type=int, default=10, help="Fresh CLI processes for the startup benchmark")
+    parser.add_argument("--protocol", choices=["raw", "hislip"], default="raw", help="Protocol the simulators speak")
+    parser.add_argument("--no-native", action="store_true",
+                        help="Reach the simulators through the backend, not the native transports")
+    args = parser.parse_args()
+
+    # status lines printed by the code under test go to stderr, the report to stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run_benchmarks(args.latency / 1000.0, args.jitter / 1000.0, args.response_size, args.error_rate,
+                                args.error_mode, args.commands, args.interval, args.loop_seconds, args.instruments,
+                                [int(size) for size in args.log_sizes.split(",") if size], backend=args.backend,
+                                protocol=args.protocol, native=not args.no_native, startup_runs=args.startup_runs)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text)
@@ -1,17 +1,225 @@
 import argparse
+import contextlib
 import csv
+import json
 import os
 
-def generate_chart(csv_file, x_column, y_column, output_html , theme):
-    # Read data from the CSV file
-    x_data = []
-    y_data = []
-    with open(csv_file, 'r', encoding='utf-8') as file:  # Specify UTF-8 encoding
-        reader = csv.DictReader(file)
+import log_index
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Points drawn per trace; min/max decimation keeps peaks and glitches at any file size
+DEFAULT_MAX_POINTS = 4000
+# Rows converted at a time, which bounds memory use independently of the file size
+CHUNK_ROWS = 65536
+
+
+class MinMaxDecimator:
+    """
+    Single-pass level-of-detail reducer.
+    Rows are grouped into buckets and only the minimum and maximum of each
+    bucket are kept. Whenever there are more than twice the wanted number of
+    buckets, neighbouring buckets are merged, so memory stays proportional to
+    max_points however many rows are added.
+    """
+
+    def __init__(self, max_points=DEFAULT_MAX_POINTS):
+        self.max_buckets = max(1, max_points // 2)
+        self.bucket_size = 1
+        self.rows = 0
+        # closed buckets: [min_pos, min_x, min_y, max_pos, max_x, max_y]
+        self._buckets = []
+        self._current = None
+        self._current_count = 0
+
+    def _add_one(self, x, y):
+        position = self.rows
+        self.rows += 1
+        current = self._current
+        if current is None:
+            self._current = [position, x, y, position, x, y]
+        else:
+            if y < current[2]:
+                current[0:3] = [position, x, y]
+            if y > current[5]:
+                current[3:6] = [position, x, y]
+        self._current_count += 1
+        if self._current_count >= self.bucket_size:
+            self._buckets.append(self._current)
+            self._current = None
+            self._current_count = 0
+
+    def add(self, xs, ys):
+        """
+        Add a chunk of x values and numeric y values.
+        """
+        start = 0
+        count = len(ys)
+        # finish the partially filled bucket one row at a time
+        while start < count and self._current is not None:
+            self._add_one(xs[start], ys[start])
+            start += 1
+        if numpy is not None and self.bucket_size > 1:
+            full = (count - start) // self.bucket_size
+            if full:
+                end = start + full * self.bucket_size
+                block = numpy.asarray(ys[start:end], dtype=float).reshape(full, self.bucket_size)
+                offsets = numpy.arange(full) * self.bucket_size + start
+                min_positions = (block.argmin(axis=1) + offsets).tolist()
+                max_positions = (block.argmax(axis=1) + offsets).tolist()
+                for low, high in zip(min_positions, max_positions):
+                    self._buckets.append([self.rows + low - start, xs[low], float(ys[low]),
+                                          self.rows + high - start, xs[high], float(ys[high])])
+                self.rows += end - start
+                start = end
+        for index in range(start, count):
+            self._add_one(xs[index], ys[index])
+        while len(self._buckets) > 2 * self.max_buckets:
+            self._merge()
+
+    def _merge(self):
+        merged = []
+        for index in range(0, len(self._buckets), 2):
+            pair = self._buckets[index:index + 2]
+            low = min(pair, key=lambda bucket: bucket[2])
+            high = max(pair, key=lambda bucket: bucket[5])
+            merged.append(low[0:3] + high[3:6])
+        self._buckets = merged
+        self.bucket_size *= 2
+
+    def points(self):
+        """
+        Return (x_data, y_data) in file order.
+        """
+        x_data = []
+        y_data = []
+        buckets = self._buckets + ([self._current] if self._current is not None else [])
+        for min_pos, min_x, min_y, max_pos, max_x, max_y in buckets:
+            pairs = [(min_pos, min_x, min_y), (max_pos, max_x, max_y)]
+            if min_pos == max_pos:
+                pairs = pairs[:1]
+            for _, x, y in sorted(pairs):
+                x_data.append(x)
+                y_data.append(y)
+        return x_data, y_data
+
+
+def to_numbers(values):
+    """
+    Convert a chunk of strings to floats; returns (numbers, mask of rows that converted).
+    """
+    if numpy is not None:
+        try:
+            numbers = numpy.asarray(values, dtype=float)
+        except ValueError:
+            pass
+        else:
+            finite = numpy.isfinite(numbers)
+            if finite.all():
+                return numbers, None
+            return numbers[finite], finite.tolist()
+    numbers = []
+    mask = []
+    for value in values:
+        try:
+            numbers.append(float(value))
+            mask.append(True)
+        except (TypeError, ValueError):
+            mask.append(False)
+    return numbers, mask
+
+
+def read_traces(csv_file, x_column, y_columns, max_points=DEFAULT_MAX_POINTS, pivot_column=None,
+                start_time=None, end_time=None):
+    """
+    Stream csv_file once and return a decimated trace per y column as
+    (name, x_data, y_data) tuples. With pivot_column the log is treated as
+    long format: every distinct value of that column (e.g. each SCPI Command)
+    becomes its own trace, with values taken from y_columns[0].
+    Rows whose y value is not numeric are skipped.
+    start_time/end_time (seconds, see log_index.py) zoom into a window that is
+    read through the log's index instead of reading the whole file.
+    """
+    series = {}  # name -> [decimator, pending xs, pending ys]
+
+    def collect(name, x, value):
+        entry = series.get(name)
+        if entry is None:
+            entry = series[name] = [MinMaxDecimator(max_points), [], []]
+        entry[1].append(x)
+        entry[2].append(value)
+        if len(entry[2]) >= CHUNK_ROWS:
+            add_chunk(entry[0], entry[1], entry[2])
+            entry[1] = []
+            entry[2] = []
+
+    with contextlib.ExitStack() as stack:
+        if start_time is not None or end_time is not None:
+            # iter_rows maps just the window's byte range itself
+            header, reader = log_index.iter_rows(csv_file, start_time=start_time, end_time=end_time)
+        else:
+            file = stack.enter_context(open(csv_file, 'r', encoding='utf-8', newline=''))  # Specify UTF-8 encoding
+            reader = csv.reader(file)
+            header = next(reader)
+        x_index = header.index(x_column)
+        y_indexes = [header.index(column) for column in y_columns]
+        pivot_index = header.index(pivot_column) if pivot_column else None
+        min_length = max([x_index] + y_indexes + ([pivot_index] if pivot_column else [])) + 1
+        if pivot_index is None:
+            # keep the requested column order even if a column has no numeric rows
+            for column in y_columns:
+                series[column] = [MinMaxDecimator(max_points), [], []]
         for row in reader:
-            x_data.append(row[x_column])
-            y_data.append(float(row[y_column]))  # Ensure numeric data for Chart.js
+            if len(row) < min_length:
+                continue
+            x = row[x_index]
+            if pivot_index is None:
+                for column, index in zip(y_columns, y_indexes):
+                    collect(column, x, row[index])
+            else:
+                collect(row[pivot_index], x, row[y_indexes[0]])
+
+    traces = []
+    for name, (decimator, xs, ys) in series.items():
+        if ys:
+            add_chunk(decimator, xs, ys)
+        x_data, y_data = decimator.points()
+        traces.append((name, x_data, y_data))
+    return traces
+
+
+def add_chunk(decimator, xs, ys):
+    numbers, mask = to_numbers(ys)
+    if mask is not None:
+        xs = [x for x, keep in zip(xs, mask) if keep]
+    decimator.add(xs, numbers)
+
+
+def generate_chart(csv_files, x_column, y_columns, output_html , theme, max_points=DEFAULT_MAX_POINTS,
+                   pivot_column=None, start_time=None, end_time=None):
+    """
+    csv_files and y_columns may each be a single name or a list; every file is
+    read once and all of its series are overlaid in one chart, optionally
+    only between start_time and end_time.
+    """
+    if isinstance(csv_files, str):
+        csv_files = [csv_files]
+    if isinstance(y_columns, str):
+        y_columns = [y_columns]
 
+    # Read data from the CSV files, each series reduced to at most max_points points
+    traces = []
+    for csv_file in csv_files:
+        run_name = os.path.splitext(os.path.basename(csv_file))[0]
+        for name, x_data, y_data in read_traces(csv_file, x_column, y_columns, max_points, pivot_column,
+                                                start_time, end_time):
+            if len(csv_files) > 1:
+                name = f"{run_name}: {name}"
+            traces.append({"name": name, "x": x_data, "y": y_data})
+    y_label = y_columns[0] if len(y_columns) == 1 else "Value"
 
     template_path = os.path.join(os.path.dirname(__file__), 'chart_template.html')
 
@@ -19,29 +227,37 @@ def generate_chart(csv_file, x_column, y_column, output_html , theme):
         html_template = template_file.read()
 
     # Inject data into the template
-    html_content = html_template.replace('{{ x_data }}', str(x_data))
-    html_content = html_content.replace('{{ y_data }}', str(y_data))
+    html_content = html_template.replace('{{ traces }}', json.dumps(traces))
     html_content = html_content.replace('{{ x_label }}', x_column)
-    html_content = html_content.replace('{{ y_label }}', y_column)
+    html_content = html_content.replace('{{ y_label }}', y_label)
     html_content = html_content.replace('{{ theme }}', theme)  # Inject theme
     # Save the final HTML
     with open(output_html, 'w', encoding='utf-8') as output_file:  # Specify UTF-8 encoding
         output_file.write(html_content)
     print(output_html)
+    return output_html
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate a Chart.js line graph from a CSV file.")
     parser.add_argument("csv_file", help="Path to the CSV file")
     parser.add_argument("x_column", help="Column name to be used for the X-axis")
-    parser.add_argument("y_column", help="Column name to be used for the Y-axis")
+    parser.add_argument("y_column", help="Column name(s) to be used for the Y-axis, comma separated")
     parser.add_argument("theme", help="Default Theme to be used for the chart")
+    parser.add_argument("--max-points", type=int, default=DEFAULT_MAX_POINTS,
+                        help="Maximum points drawn; larger logs are min/max decimated")
+    parser.add_argument("--overlay", nargs="+", default=[],
+                        help="Additional CSV files (e.g. other runs) drawn on the same chart")
+    parser.add_argument("--pivot", help="Split the Y column into one series per value of this column, e.g. Command")
+    parser.add_argument("--start", type=float, help="Only chart rows from this time on (seconds, see log_index.py)")
+    parser.add_argument("--end", type=float, help="Only chart rows up to this time (seconds)")
     args = parser.parse_args()
 
-    output_file = os.path.splitext(args.csv_file)[0] + "_chart.html" 
+    output_file = os.path.splitext(args.csv_file)[0] + "_chart.html"
 
     try:
-        generate_chart(args.csv_file, args.x_column, args.y_column, output_file, args.theme)
+        generate_chart([args.csv_file] + args.overlay, args.x_column, args.y_column.split(","), output_file,
+                       args.theme, args.max_points, args.pivot, args.start, args.end)
     except Exception as e:
         print(f"An error occurred: {e}")
         exit(1)
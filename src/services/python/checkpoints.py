@@ -0,0 +1,54 @@
+import glob
+import json
+import os
+import time
+
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+# Seconds between checkpoints unless the plan sets "checkpointInterval"
+DEFAULT_CHECKPOINT_INTERVAL = 60
+
+
+def checkpoint_path(log_file_path):
+    """
+    The checkpoint lives next to its log: <log name>.checkpoint.json.
+    """
+    return os.path.splitext(log_file_path)[0] + CHECKPOINT_SUFFIX
+
+
+def write_checkpoint(path, state):
+    """
+    Atomically replace the checkpoint at path with state (a JSON-serialisable dict),
+    so a crash leaves either the old or the new checkpoint, never half of one.
+    """
+    state = dict(state, updated=time.time())
+    temporary = path + ".tmp"
+    with open(temporary, "w") as file:
+        json.dump(state, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+def load_checkpoint(output_dir, test_id):
+    """
+    Return the checkpoint of test_id in output_dir.
+    Raises FileNotFoundError if the test never checkpointed there and
+    ValueError if it already finished.
+    """
+    matches = glob.glob(os.path.join(glob.escape(output_dir), f"*_{glob.escape(test_id)}{CHECKPOINT_SUFFIX}"))
+    if not matches:
+        raise FileNotFoundError(f"No checkpoint for test {test_id} in {output_dir}")
+    with open(matches[0]) as file:
+        state = json.load(file)
+    if state.get("status") == "success":
+        raise ValueError(f"Test {test_id} already finished")
+    return state
+
+
+def truncate_log(log_file_path, offset):
+    """
+    Cut the log back to the offset recorded with the checkpoint, dropping a
+    partly written last row and rows the checkpoint does not account for.
+    """
+    with open(log_file_path, "r+b") as file:
+        file.truncate(offset)
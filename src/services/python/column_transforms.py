@@ -0,0 +1,196 @@
+import argparse
+import collections
+import csv
+import json
+import multiprocessing
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# Rows handed to a worker process at a time by transform_log()
+DEFAULT_CHUNK_ROWS = 20000
+# Logs smaller than this are cleaned in-process; starting workers costs more than it saves
+PARALLEL_MIN_BYTES = 16 << 20
+NUMBER_TYPES = {"float": float, "int": int}
+
+
+def _to_number(text, number_type):
+    try:
+        return number_type(text)
+    except ValueError:
+        if number_type is int:
+            try:
+                return int(float(text))
+            except ValueError:
+                pass
+    return ""
+
+
+class ColumnTransform:
+    """
+    Per-column regex rules compiled once and applied to rows of a log with a known header.
+    rules maps a column name to a list of steps, applied in order:
+      "regex"                              remove every match (what the Analyze page does)
+      {"pattern": p, "replace": r}         substitute every match (r may use \\1 group references)
+      {"extract": p, "type": "float"|"int", "into": name}
+                                           parse the first match (group 1 if p has a group) as a
+                                           number; it replaces the value, or goes into a new column
+                                           `into` appended after the existing ones ("" if no match)
+    Rules for columns missing from the header are ignored.
+    """
+
+    def __init__(self, rules, header):
+        self.source_header = list(header)
+        self.header = list(header)
+        self.column_types = {}  # column -> "float" or "int", for typed columnar logs
+        self._steps = []  # (column index, kind, compiled pattern, replacement/number type, target index)
+        for column, steps in (rules or {}).items():
+            if column not in self.source_header:
+                continue
+            if isinstance(steps, (str, dict)):
+                steps = [steps]
+            index = self.source_header.index(column)
+            for step in steps:
+                if isinstance(step, str):
+                    self._steps.append((index, "sub", re.compile(step), "", index))
+                elif "extract" in step:
+                    number_type = step.get("type", "float")
+                    if number_type not in NUMBER_TYPES:
+                        raise ValueError(f"Unknown number type for column {column}: {number_type}")
+                    target = step.get("into", column)
+                    if target not in self.header:
+                        self.header.append(target)
+                    self.column_types[target] = number_type
+                    self._steps.append((index, "extract", re.compile(step["extract"]), NUMBER_TYPES[number_type],
+                                        self.header.index(target)))
+                else:
+                    self._steps.append((index, "sub", re.compile(step["pattern"]), step.get("replace", ""), index))
+        self._extra = len(self.header) - len(self.source_header)
+
+    def __bool__(self):
+        return bool(self._steps)
+
+    def apply(self, row):
+        """
+        Return the transformed row. Rows that do not match the header (short error rows) pass unchanged.
+        """
+        if len(row) != len(self.source_header) or not self._steps:
+            return row
+        row = list(row) + [""] * self._extra
+        for index, kind, pattern, argument, target in self._steps:
+            value = row[index]
+            if not isinstance(value, str):
+                value = "" if value is None else str(value)
+            if kind == "sub":
+                row[target] = pattern.sub(argument, value)
+            else:
+                match = pattern.search(value)
+                if match is None:
+                    row[target] = ""
+                else:
+                    row[target] = _to_number(match.group(1) if pattern.groups else match.group(0), argument)
+        return row
+
+
+# Transform of the worker process, built once by _init_worker()
+_worker_transform = None
+
+
+def _init_worker(rules, header):
+    global _worker_transform
+    _worker_transform = ColumnTransform(rules, header)
+
+
+def _transform_chunk(rows):
+    return [_worker_transform.apply(row) for row in rows]
+
+
+def _chunks(reader, chunk_rows):
+    chunk = []
+    for row in reader:
+        chunk.append(row)
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def transform_log(log_file, rules, output_file=None, workers=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Apply rules (see ColumnTransform) to every row of a CSV log.
+    The log is rewritten in place unless output_file is given. Large logs are
+    processed in chunks of chunk_rows rows by `workers` processes (default:
+    one per CPU) while the main process reads and writes in order.
+    Returns {"path", "rows", "header"}.
+    """
+    output_file = output_file or log_file
+    temporary = output_file + ".tmp"
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if os.path.getsize(log_file) < PARALLEL_MIN_BYTES:
+        workers = 1
+    rows = 0
+    try:
+        with open(log_file, newline='') as source, open(temporary, 'w', newline='') as output:
+            reader = csv.reader(source)
+            header = next(reader, None)
+            if header is None:
+                raise ValueError(f"{log_file} is empty")
+            transform = ColumnTransform(rules, header)
+            writer = csv.writer(output)
+            writer.writerow(transform.header)
+            if workers <= 1:
+                for row in reader:
+                    writer.writerow(transform.apply(row))
+                    rows += 1
+            else:
+                # spawn, not fork: the daemon that calls this runs threads
+                with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=_init_worker, initargs=(rules, header)) as executor:
+                    # keep a bounded number of chunks in flight so memory stays flat on huge logs
+                    pending = collections.deque()
+                    for chunk in _chunks(reader, chunk_rows):
+                        pending.append(executor.submit(_transform_chunk, chunk))
+                        if len(pending) >= workers * 2:
+                            done = pending.popleft().result()
+                            writer.writerows(done)
+                            rows += len(done)
+                    while pending:
+                        done = pending.popleft().result()
+                        writer.writerows(done)
+                        rows += len(done)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    # the index and summary of a log rewritten in place describe rows that are gone
+    from log_analytics import discard_summary
+    from log_index import discard_index
+
+    discard_index(output_file)
+    discard_summary(output_file)
+    os.replace(temporary, output_file)
+    return {"path": output_file, "rows": rows, "header": transform.header}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply per-column regex rules to a CSV test log.")
+    parser.add_argument("log_file", help="Path to the .csv log")
+    parser.add_argument("rules", help="Rules as JSON, or @file to read them from a file")
+    parser.add_argument("--output", help="Write here instead of rewriting the log in place")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows per worker task")
+    args = parser.parse_args()
+
+    try:
+        if args.rules.startswith("@"):
+            with open(args.rules[1:]) as file:
+                rules = json.load(file)
+        else:
+            rules = json.loads(args.rules)
+        print(json.dumps(transform_log(args.log_file, rules, args.output, args.workers, args.chunk_rows)))
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
@@ -0,0 +1,220 @@
+import ctypes
+import os
+import threading
+
+# lxi_protocol_t
+LXI_VXI11 = 0
+LXI_RAW = 1
+# lxi_discover_t
+DISCOVER_VXI11 = 0
+DEFAULT_DISCOVER_TIMEOUT_MS = 1000
+# Bytes received per lxi_receive() call. Longer replies (e.g. waveform blocks)
+# are read in several calls.
+DEFAULT_BUFFER_SIZE = 1 << 20
+DEFAULT_OPEN_TIMEOUT_MS = 3000
+LIBRARY_NAME = "liblxi.so.1.0.0"
+
+
+# lxi_discover() callbacks: broadcast(address, interface) and device(address, id)
+BroadcastCallback = ctypes.CFUNCTYPE(None, ctypes.c_char_p, ctypes.c_char_p)
+DeviceCallback = ctypes.CFUNCTYPE(None, ctypes.c_char_p, ctypes.c_char_p)
+
+
+class LxiInfo(ctypes.Structure):
+    _fields_ = [
+        ("broadcast", BroadcastCallback),
+        ("device", DeviceCallback),
+    ]
+
+
+class LxiLibrary:
+    """
+    liblxi loaded once, with argtypes/restype declared for every call and
+    lxi_init() run a single time. It is loaded with ctypes.CDLL, which drops
+    the GIL for the duration of each foreign call, so blocking sends and
+    receives on different instruments proceed in parallel from threads.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join(os.path.dirname(os.path.abspath(__file__)), LIBRARY_NAME)
+        lib = ctypes.CDLL(path)
+        lib.lxi_init.argtypes = []
+        lib.lxi_init.restype = ctypes.c_int
+        lib.lxi_connect.argtypes = [ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_int]
+        lib.lxi_connect.restype = ctypes.c_int
+        lib.lxi_send.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_int]
+        lib.lxi_send.restype = ctypes.c_int
+        lib.lxi_receive.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int, ctypes.c_int]
+        lib.lxi_receive.restype = ctypes.c_int
+        lib.lxi_disconnect.argtypes = [ctypes.c_int]
+        lib.lxi_disconnect.restype = ctypes.c_int
+        lib.lxi_discover.argtypes = [ctypes.POINTER(LxiInfo), ctypes.c_int, ctypes.c_int]
+        lib.lxi_discover.restype = ctypes.c_int
+        if lib.lxi_init() != 0:
+            raise OSError("Failed to initialize the LXI library")
+        self.lib = lib
+        # liblxi's session table is shared; connect and disconnect one at a time
+        self.lock = threading.Lock()
+
+    @classmethod
+    def get(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+
+def parse_address(address):
+    """
+    Split a VISA-style address into (host, port, device name, protocol).
+    TCPIP::host[::inst0]::INSTR and bare host names use VXI-11,
+    TCPIP::host::port::SOCKET uses a raw SCPI socket.
+    """
+    parts = address.split("::")
+    if len(parts) == 1:
+        return address, 0, None, LXI_VXI11
+    if not parts[0].upper().startswith("TCPIP"):
+        raise ValueError(f"liblxi only reaches TCPIP instruments, not {address}")
+    host = parts[1]
+    suffix = parts[-1].upper()
+    if suffix == "SOCKET":
+        return host, int(parts[2]), None, LXI_RAW
+    if suffix == "INSTR":
+        name = parts[2] if len(parts) > 3 else None
+        if name is not None and name.lower().startswith("hislip"):
+            raise ValueError(f"liblxi does not speak HiSLIP: {address}")
+        return host, 0, name, LXI_VXI11
+    raise ValueError(f"Unsupported address for liblxi: {address}")
+
+
+class LxiSession:
+    """
+    A persistent liblxi connection with the parts of the pyvisa resource
+    interface the SCPI helpers use (timeout, write, read, query, close),
+    plus read_into() for binary blocks. Replies are received into one
+    buffer allocated with the session and reused for every read.
+    """
+
+    def __init__(self, library, address, open_timeout=DEFAULT_OPEN_TIMEOUT_MS, buffer_size=DEFAULT_BUFFER_SIZE):
+        self._library = library
+        self.address = address
+        host, port, name, self.protocol = parse_address(address)
+        self.timeout = open_timeout
+        self.read_termination = None
+        self.write_termination = None
+        with library.lock:
+            self._device = library.lib.lxi_connect(host.encode(), port, name.encode() if name else None,
+                                                   int(open_timeout), self.protocol)
+        if self._device < 0:
+            raise OSError(f"Failed to connect to {address}")
+        self._buffer = ctypes.create_string_buffer(buffer_size)
+        self._view = memoryview(self._buffer).cast("B")
+        # bytes received but not handed out yet
+        self._pending_start = 0
+        self._pending_end = 0
+
+    @property
+    def session(self):
+        # like pyvisa, a closed session has no handle
+        if self._device is None:
+            raise OSError(f"Session to {self.address} is closed")
+        return self._device
+
+    def _timeout(self):
+        return int(self.timeout) if self.timeout is not None else -1
+
+    def write(self, command):
+        message = command.encode()
+        if self.protocol == LXI_RAW and not message.endswith(b"\n"):
+            # a raw socket has no end-of-message signal other than the newline
+            message += b"\n"
+        self._pending_start = self._pending_end = 0
+        if self._library.lib.lxi_send(self.session, message, len(message), self._timeout()) < 0:
+            raise ConnectionResetError(f"Failed to send {command!r} to {self.address}")
+        return len(message)
+
+    def _receive(self):
+        received = self._library.lib.lxi_receive(self.session, ctypes.addressof(self._buffer), len(self._buffer),
+                                                 self._timeout())
+        if received <= 0:
+            raise TimeoutError(f"No response from {self.address}")
+        self._pending_start = 0
+        self._pending_end = received
+
+    def _complete(self):
+        """
+        Whether the last receive ended the reply: a raw socket reply ends at
+        its newline, a VXI-11 one when it did not fill the buffer (a full
+        buffer means the instrument may still hold the rest).
+        """
+        if self._view[self._pending_end - 1] == ord("\n"):
+            return True
+        return self.protocol != LXI_RAW and self._pending_end < len(self._buffer)
+
+    def read_into(self, view):
+        """
+        Copy up to len(view) bytes of the reply into view and return how many were copied.
+        """
+        if self._pending_start >= self._pending_end:
+            self._receive()
+        count = min(len(view), self._pending_end - self._pending_start)
+        view[:count] = self._view[self._pending_start:self._pending_start + count]
+        self._pending_start += count
+        return count
+
+    def read(self):
+        """
+        Read one reply as text without its trailing newline,
+        receiving as many times as it takes when it is longer than the buffer.
+        """
+        if self._pending_start >= self._pending_end:
+            self._receive()
+        parts = [self._view[self._pending_start:self._pending_end].tobytes()]
+        self._pending_start = self._pending_end
+        while not self._complete():
+            self._receive()
+            parts.append(self._view[:self._pending_end].tobytes())
+            self._pending_start = self._pending_end
+        return b"".join(parts).decode().rstrip("\r\n")
+
+    def query(self, command):
+        self.write(command)
+        return self.read()
+
+    def close(self):
+        if self._device is not None:
+            with self._library.lock:
+                self._library.lib.lxi_disconnect(self._device)
+            self._device = None
+
+
+class LxiResourceManager:
+    """
+    Stands in for pyvisa.ResourceManager in a SessionPool, so liblxi sessions
+    get the same pooling, per-address locking and reconnects as pyvisa ones.
+    """
+
+    def __init__(self, library_path=None, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.library = LxiLibrary(library_path) if library_path else LxiLibrary.get()
+        self.buffer_size = buffer_size
+
+    def open_resource(self, address, open_timeout=DEFAULT_OPEN_TIMEOUT_MS, **kwargs):
+        return LxiSession(self.library, address, open_timeout, self.buffer_size)
+
+    def list_resources(self, query="?*::INSTR", timeout_ms=DEFAULT_DISCOVER_TIMEOUT_MS):
+        """
+        VXI-11 instruments answering liblxi's broadcast discovery on every
+        interface, as TCPIP::<address>::INSTR. query is accepted like
+        pyvisa's but not used: liblxi only finds LAN instruments.
+        """
+        found = []
+        # the callbacks must outlive the call, so keep them referenced here
+        info = LxiInfo(BroadcastCallback(lambda address, interface: None),
+                       DeviceCallback(lambda address, idn: found.append(address.decode())))
+        if self.library.lib.lxi_discover(ctypes.byref(info), int(timeout_ms), DISCOVER_VXI11) != 0:
+            raise OSError("LXI discovery failed")
+        return tuple(f"TCPIP::{address}::INSTR" for address in dict.fromkeys(found))
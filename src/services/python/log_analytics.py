@@ -0,0 +1,328 @@
+import argparse
+import array
+import csv
+import glob
+import json
+import math
+import os
+import statistics
+import sys
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from log_index import LogIndexer
+from log_sinks import VALUE_COLUMN
+from scpi_timing import ERROR_COLUMN
+
+SUMMARY_SUFFIX = ".summary.json"
+SUMMARY_VERSION = 2
+DEFAULT_PERCENTILES = (50, 90, 95, 99)
+
+
+def summary_path(log_file):
+    """
+    The summary lives next to its log: <log name>.summary.json.
+    """
+    return os.path.splitext(log_file)[0] + SUMMARY_SUFFIX
+
+
+def discard_summary(log_file):
+    """
+    Remove the summary of a log that is about to be rewritten.
+    """
+    try:
+        os.remove(summary_path(log_file))
+    except FileNotFoundError:
+        pass
+
+
+class _Series:
+    """
+    Numeric responses of one command in log order, with their times when the
+    log has a time column, kept as packed doubles until the log is read.
+    """
+
+    def __init__(self):
+        self.values = array.array("d")
+        self.times = array.array("d")
+        self.text = 0
+        self.errors = 0
+
+
+def _percentile(ordered, q):
+    # linear interpolation between closest ranks, as numpy.percentile does by default
+    position = (len(ordered) - 1) * q / 100.0
+    low = math.floor(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def _describe(series, limits, percentiles):
+    """
+    Statistics of one command's numeric responses.
+    Rate of change is per second between consecutive samples when they have
+    times, per sample otherwise; "overall" is the end-to-end slope.
+    """
+    summary = {"count": len(series.values), "text": series.text, "errors": series.errors}
+    if not series.values:
+        return summary
+    timed = len(series.times) == len(series.values)
+    if numpy is not None:
+        values = numpy.frombuffer(series.values, dtype=numpy.float64)
+        summary.update(min=float(values.min()), max=float(values.max()), mean=float(values.mean()),
+                       std=float(values.std()))
+        summary["percentiles"] = {f"p{q:g}": float(value)
+                                  for q, value in zip(percentiles, numpy.percentile(values, percentiles))}
+        steps = numpy.diff(values)
+        if timed:
+            times = numpy.frombuffer(series.times, dtype=numpy.float64)
+            elapsed = numpy.diff(times)
+            moving = elapsed > 0
+            rates = steps[moving] / elapsed[moving]
+        else:
+            rates = steps
+        low = limits.get("low") if limits else None
+        high = limits.get("high") if limits else None
+        below = int((values < low).sum()) if low is not None else 0
+        above = int((values > high).sum()) if high is not None else 0
+        rate = {"per": "second" if timed else "sample"}
+        if len(rates):
+            rate.update(min=float(rates.min()), max=float(rates.max()), mean=float(rates.mean()),
+                        max_abs=float(numpy.abs(rates).max()))
+    else:
+        values = series.values
+        ordered = sorted(values)
+        summary.update(min=ordered[0], max=ordered[-1], mean=statistics.fmean(values), std=statistics.pstdev(values))
+        summary["percentiles"] = {f"p{q:g}": _percentile(ordered, q) for q in percentiles}
+        if timed:
+            times = series.times
+            rates = [(values[i + 1] - values[i]) / (times[i + 1] - times[i])
+                     for i in range(len(values) - 1) if times[i + 1] > times[i]]
+        else:
+            rates = [values[i + 1] - values[i] for i in range(len(values) - 1)]
+        low = limits.get("low") if limits else None
+        high = limits.get("high") if limits else None
+        below = sum(1 for value in values if value < low) if low is not None else 0
+        above = sum(1 for value in values if value > high) if high is not None else 0
+        rate = {"per": "second" if timed else "sample"}
+        if rates:
+            rate.update(min=min(rates), max=max(rates), mean=statistics.fmean(rates),
+                        max_abs=max(abs(value) for value in rates))
+    span = series.times[-1] - series.times[0] if timed else len(series.values) - 1
+    if span > 0:
+        rate["overall"] = (series.values[-1] - series.values[0]) / span
+    summary["rate"] = rate
+    if limits:
+        summary["limits"] = {"low": low, "high": high, "below": below, "above": above,
+                             "out_of_limits": below + above,
+                             "fraction": (below + above) / len(series.values)}
+    return summary
+
+
+def _series_for(all_series, command):
+    series = all_series.get(command)
+    if series is None:
+        series = all_series[command] = _Series()
+    return series
+
+
+def _read_csv(log_file, all_series):
+    """
+    Stream a CSV log once into per-command series. Returns (rows, time column).
+    """
+    rows = 0
+    with open(log_file, newline='') as file:
+        reader = csv.reader(file)
+        header = next(reader, None)
+        if header is None or "Command" not in header or "Response" not in header:
+            raise ValueError(f"{log_file} has no Command/Response columns")
+        times = LogIndexer(header=header)
+        width = len(header)
+        command_index = header.index("Command")
+        response_index = header.index("Response")
+        error_index = header.index(ERROR_COLUMN) if ERROR_COLUMN in header else None
+        for row in reader:
+            rows += 1
+            if len(row) != width:
+                continue
+            series = _series_for(all_series, row[command_index])
+            if error_index is not None and row[error_index]:
+                series.errors += 1
+                continue
+            try:
+                value = float(row[response_index])
+            except ValueError:
+                series.text += 1
+                continue
+            if not math.isfinite(value):
+                series.text += 1
+                continue
+            time = times.row_time(row)
+            series.values.append(value)
+            if time is not None:
+                series.times.append(time)
+    return rows, times.time_column
+
+
+def _read_arrow(log_file, all_series):
+    """
+    Stream a columnar log once, a record batch at a time, into per-command series.
+    Uses the typed Value column, so responses are not parsed again; with numpy
+    each batch is split by command with array masks instead of row by row.
+    """
+    import pyarrow
+    import pyarrow.compute
+
+    rows = 0
+    with pyarrow.OSFile(log_file, "rb") as source:
+        reader = pyarrow.ipc.open_stream(source)
+        names = reader.schema.names
+        if "Command" not in names or VALUE_COLUMN not in names:
+            raise ValueError(f"{log_file} has no Command/Value columns")
+        times = LogIndexer(header=names)
+        numeric_time = times.time_column is not None and times.time_column != "Timestamp"
+        for batch in reader:
+            rows += batch.num_rows
+            column = batch.column("Command")
+            if numpy is None or not numeric_time and times.time_column is not None:
+                # clock strings are unwrapped in log order, one at a time
+                _add_rows(batch, column.to_pylist(), names, times, all_series)
+                continue
+            codes = pyarrow.compute.fill_null(column.indices, -1).to_numpy()
+            values = batch.column(VALUE_COLUMN).to_numpy(zero_copy_only=False)
+            failed = numpy.zeros(batch.num_rows, dtype=bool)
+            if ERROR_COLUMN in names:
+                lengths = pyarrow.compute.utf8_length(batch.column(ERROR_COLUMN))
+                failed = pyarrow.compute.fill_null(lengths, 0).to_numpy() > 0
+            stamps = batch.column(times.time_column).to_numpy(zero_copy_only=False) if numeric_time else None
+            finite = numpy.isfinite(values)
+            for code, command in enumerate(column.dictionary.to_pylist()):
+                selected = codes == code
+                if not selected.any():
+                    continue
+                series = _series_for(all_series, command)
+                series.errors += int((selected & failed).sum())
+                selected &= ~failed
+                series.text += int((selected & ~finite).sum())
+                selected &= finite
+                series.values.frombytes(values[selected].astype(numpy.float64).tobytes())
+                if stamps is not None:
+                    stamped = stamps[selected]
+                    if numpy.isfinite(stamped).all():
+                        series.times.frombytes(stamped.astype(numpy.float64).tobytes())
+    return rows, times.time_column
+
+
+def _add_rows(batch, commands, names, times, all_series):
+    values = batch.column(VALUE_COLUMN).to_pylist()
+    errors = batch.column(ERROR_COLUMN).to_pylist() if ERROR_COLUMN in names else [None] * batch.num_rows
+    stamps = (batch.column(times.time_column).to_pylist() if times.time_column is not None
+              else [None] * batch.num_rows)
+    for command, value, error, stamp in zip(commands, values, errors, stamps):
+        if command is None:
+            continue
+        series = _series_for(all_series, command)
+        if error:
+            series.errors += 1
+        elif value is None or not math.isfinite(value):
+            series.text += 1
+        else:
+            series.values.append(value)
+            time = times.time_of(stamp) if stamp is not None else None
+            if time is not None:
+                series.times.append(time)
+
+
+def summarize_log(log_file, limits=None, percentiles=DEFAULT_PERCENTILES, save=True):
+    """
+    Read a CSV or columnar log once and return per-command statistics:
+    count, min/max/mean/std, percentiles, rate of change and, for commands
+    with limits ({command: {"low": x, "high": y}}), out-of-limit counts.
+    Error rows and non-numeric responses are counted, not averaged.
+    The summary is saved next to the log unless save is false.
+    """
+    limits = limits or {}
+    all_series = {}
+    status = os.stat(log_file)
+    if log_file.endswith(".arrow"):
+        rows, time_column = _read_arrow(log_file, all_series)
+    else:
+        rows, time_column = _read_csv(log_file, all_series)
+    summary = {
+        "version": SUMMARY_VERSION,
+        "log_file": log_file,
+        "log_size": status.st_size,
+        "log_mtime_ns": status.st_mtime_ns,
+        "rows": rows,
+        "time_column": time_column,
+        "vectorized": numpy is not None,
+        "percentiles": list(percentiles),
+        "commands": {command: _describe(series, limits.get(command), percentiles)
+                     for command, series in all_series.items()},
+    }
+    if save:
+        path = summary_path(log_file)
+        temporary = path + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump(summary, file, indent=1)
+        os.replace(temporary, path)
+    return summary
+
+
+def load_summary(log_file, limits=None, percentiles=DEFAULT_PERCENTILES):
+    """
+    Return the saved summary of a log, computing it again only if the log
+    changed since, the summary is missing or from another version, or other
+    limits or percentiles are asked for.
+    """
+    try:
+        with open(summary_path(log_file)) as file:
+            summary = json.load(file)
+        status = os.stat(log_file)
+        if (summary.get("version") == SUMMARY_VERSION and summary["log_size"] == status.st_size
+                and summary["log_mtime_ns"] == status.st_mtime_ns and limits is None and summary["percentiles"] == list(percentiles)):
+            return summary
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+    return summarize_log(log_file, limits, percentiles)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize test logs per command (count, min/max/mean/std, "
+                                                 "percentiles, rate of change, out-of-limit counts).")
+    parser.add_argument("logs", nargs="+", help="Log files (.csv or .arrow) or directories of them")
+    parser.add_argument("--limits", help="Limits as JSON {command: {\"low\": x, \"high\": y}}, or @file")
+    parser.add_argument("--percentiles", default=",".join(map(str, DEFAULT_PERCENTILES)),
+                        help="Percentiles to report, comma separated")
+    parser.add_argument("--recompute", action="store_true", help="Ignore saved summaries")
+    args = parser.parse_args()
+
+    try:
+        limits = None
+        if args.limits:
+            if args.limits.startswith("@"):
+                with open(args.limits[1:]) as file:
+                    limits = json.load(file)
+            else:
+                limits = json.loads(args.limits)
+        percentiles = [float(value) for value in args.percentiles.split(",") if value]
+        log_files = []
+        for path in args.logs:
+            if os.path.isdir(path):
+                log_files += sorted(glob.glob(os.path.join(glob.escape(path), "*.csv"))
+                                    + glob.glob(os.path.join(glob.escape(path), "*.arrow")))
+            else:
+                log_files.append(path)
+        summaries = []
+        for log_file in log_files:
+            if args.recompute:
+                summaries.append(summarize_log(log_file, limits, percentiles))
+            else:
+                summaries.append(load_summary(log_file, limits, percentiles))
+        print(json.dumps(summaries if len(summaries) != 1 else summaries[0]))
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
@@ -0,0 +1,381 @@
+import argparse
+import bisect
+import csv
+import hashlib
+import io
+import json
+import math
+import mmap
+import os
+import sys
+
+INDEX_SUFFIX = ".index.json"
+INDEX_VERSION = 2
+# Leading bytes of a log hashed into its index, so a log rewritten in place
+# (e.g. by column_transforms) is told apart from one that only grew
+FINGERPRINT_BYTES = 1 << 16
+# Rows per index chunk: the unit of seeking and of the per-command min/max
+DEFAULT_CHUNK_ROWS = 4096
+# Columns the row time is taken from, best first. Intended/Actual are seconds
+# since the test started; Timestamp (HH:MM:SS) becomes seconds since the first row.
+TIME_COLUMNS = ("Actual", "Intended", "Timestamp")
+
+
+def index_path(log_file):
+    """
+    The index lives next to its log: <log name>.index.json.
+    """
+    return os.path.splitext(log_file)[0] + INDEX_SUFFIX
+
+
+def discard_index(log_file):
+    """
+    Remove the index of a log that is about to be rewritten.
+    """
+    try:
+        os.remove(index_path(log_file))
+    except FileNotFoundError:
+        pass
+
+
+def log_fingerprint(log_file, log_size):
+    """
+    Hash of the first bytes of a log, as far as log_size reaches.
+    """
+    with open(log_file, "rb") as file:
+        return hashlib.sha1(file.read(min(log_size, FINGERPRINT_BYTES))).hexdigest()
+
+
+def _clock_seconds(value):
+    hours, minutes, seconds = value.split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+class LogIndexer:
+    """
+    Builds the index of a CSV log row by row, as it is written or read back.
+    add() is given every row (the header first) together with a tell()
+    callable returning the byte offset the row starts at; tell() is only
+    called at chunk boundaries, so indexing costs little per row.
+    Each chunk records its first row number, byte offset, first and last
+    time and {command: [min, max, numeric count]} of the Response values.
+    With header the first row given to add() is data; row_time() and
+    time_of() can then be used on their own, without building an index.
+    """
+
+    def __init__(self, chunk_rows=DEFAULT_CHUNK_ROWS, header=None):
+        self.chunk_rows = chunk_rows
+        self.header = None
+        self.rows = 0
+        self.chunks = []
+        self.time_column = None
+        self.time_origin = None
+        self._last_time = None
+        self._time_index = None
+        self._command_index = None
+        self._response_index = None
+        if header is not None:
+            self._set_header(header)
+
+    def _set_header(self, header):
+        self.header = [str(name) for name in header]
+        for column in TIME_COLUMNS:
+            if column in self.header:
+                self.time_column = column
+                self._time_index = self.header.index(column)
+                break
+        if "Command" in self.header and "Response" in self.header:
+            self._command_index = self.header.index("Command")
+            self._response_index = self.header.index("Response")
+
+    def row_time(self, row):
+        """
+        Time of a row in seconds on the index's time axis, or None if the row has none.
+        """
+        if self._time_index is None or len(row) != len(self.header):
+            return None
+        return self.time_of(row[self._time_index])
+
+    def time_of(self, value):
+        """
+        Seconds on the index's time axis for one cell of the time column, or None.
+        Timestamp cells must be given in log order.
+        """
+        try:
+            if self.time_column != "Timestamp":
+                return float(value)
+            seconds = _clock_seconds(value)
+        except (TypeError, ValueError):
+            return None
+        if self.time_origin is None:
+            self.time_origin = seconds
+        seconds -= self.time_origin
+        # the wall clock wraps at midnight; keep the axis increasing over multi-day tests
+        reference = self._last_time if self._last_time is not None else 0.0
+        seconds += round((reference - seconds) / 86400) * 86400
+        self._last_time = seconds
+        return seconds
+
+    def add(self, row, tell):
+        if self.header is None:
+            self._set_header(row)
+            return
+        if self.rows % self.chunk_rows == 0:
+            self.chunks.append({"row": self.rows, "offset": tell(), "t0": None, "t1": None, "commands": {}})
+        chunk = self.chunks[-1]
+        self.rows += 1
+        time = self.row_time(row)
+        if time is not None:
+            self._last_time = time
+            if chunk["t0"] is None:
+                chunk["t0"] = time
+            chunk["t1"] = time
+        if self._response_index is None or len(row) != len(self.header):
+            return
+        try:
+            value = float(row[self._response_index])
+        except (TypeError, ValueError):
+            return
+        if not math.isfinite(value):
+            return
+        command = str(row[self._command_index])
+        extremes = chunk["commands"].get(command)
+        if extremes is None:
+            chunk["commands"][command] = [value, value, 1]
+        else:
+            if value < extremes[0]:
+                extremes[0] = value
+            if value > extremes[1]:
+                extremes[1] = value
+            extremes[2] += 1
+
+    def to_dict(self, log_size):
+        return {
+            "version": INDEX_VERSION,
+            "log_size": log_size,
+            "header": self.header,
+            "rows": self.rows,
+            "chunk_rows": self.chunk_rows,
+            "time_column": self.time_column,
+            "time_origin": self.time_origin,
+            "chunks": self.chunks,
+        }
+
+    @classmethod
+    def from_dict(cls, index):
+        """
+        Continue an index from its last chunk, which is dropped and read again.
+        Returns the indexer and the byte offset to continue reading from.
+        """
+        indexer = cls(index["chunk_rows"], index["header"])
+        indexer.time_origin = index["time_origin"]
+        indexer.chunks = index["chunks"][:-1]
+        last = index["chunks"][-1]
+        indexer.rows = last["row"]
+        indexer._last_time = next((chunk["t1"] for chunk in reversed(indexer.chunks) if chunk["t1"] is not None),
+                                  None)
+        return indexer, last["offset"]
+
+    def save(self, log_file, log_size):
+        """
+        Write the index of the first log_size bytes of log_file (already on disk) and return it.
+        """
+        index = self.to_dict(log_size)
+        index["fingerprint"] = log_fingerprint(log_file, log_size)
+        path = index_path(log_file)
+        temporary = path + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump(index, file, separators=(",", ":"))
+        os.replace(temporary, path)
+        return index
+
+
+class _Lines:
+    """
+    Decoded lines of a binary file that keep count of the bytes handed out,
+    so csv.reader's next record starts at .offset.
+    """
+
+    def __init__(self, file, offset):
+        self.file = file
+        self.offset = offset
+
+    def __iter__(self):
+        for line in self.file:
+            self.offset += len(line)
+            yield line.decode("utf-8")
+
+
+def build_index(log_file, chunk_rows=DEFAULT_CHUNK_ROWS, previous=None):
+    """
+    Index an existing CSV log and save the index next to it.
+    previous (an index of an earlier, shorter state of the same log) is
+    extended from its last chunk instead of reading the whole log again.
+    """
+    if previous is not None and previous.get("chunks"):
+        indexer, offset = LogIndexer.from_dict(previous)
+    else:
+        indexer, offset = LogIndexer(chunk_rows), 0
+    with open(log_file, "rb") as file:
+        file.seek(offset)
+        lines = _Lines(file, offset)
+        reader = csv.reader(lines)
+        while True:
+            # the record read next starts where the lines consumed so far end
+            start = lines.offset
+            try:
+                row = next(reader)
+            except StopIteration:
+                break
+            indexer.add(row, lambda: start)
+        log_size = lines.offset
+    return indexer.save(log_file, log_size)
+
+
+def load_index(log_file):
+    """
+    Return the index of a CSV log, building it when missing and extending it
+    when the log grew since it was written.
+    """
+    try:
+        with open(index_path(log_file)) as file:
+            index = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return build_index(log_file)
+    size = os.path.getsize(log_file)
+    if (index.get("version") != INDEX_VERSION or index["log_size"] > size
+            or index.get("fingerprint") != log_fingerprint(log_file, index["log_size"])):
+        # written by another version, the log was cut back, or it was rewritten
+        return build_index(log_file)
+    if index["log_size"] < size:
+        return build_index(log_file, index["chunk_rows"], previous=index)
+    return index
+
+
+def _chunk_end(index, position):
+    chunks = index["chunks"]
+    return chunks[position]["offset"] if position < len(chunks) else index["log_size"]
+
+
+def iter_rows(log_file, start_row=None, stop_row=None, start_time=None, end_time=None, index=None):
+    """
+    Return (header, rows) for part of a CSV log, located with its index and
+    read through a memory map of just the needed byte range. Rows are selected
+    by row number (start_row <= n < stop_row, data rows counted from 0) and/or
+    by time (start_time <= t <= end_time in seconds on the index's time axis);
+    rows without a time of their own (error rows) follow the row before them.
+    """
+    index = index or load_index(log_file)
+    chunks = index["chunks"]
+    header = index["header"]
+    if not chunks:
+        return header, iter(())
+    first = 0
+    last = len(chunks)  # exclusive
+    if start_row is not None:
+        first = max(first, min(start_row // index["chunk_rows"], len(chunks)))
+    if stop_row is not None:
+        last = min(last, -(-stop_row // index["chunk_rows"]))
+    if index["time_column"] is not None and (start_time is not None or end_time is not None):
+        starts = []
+        previous = -math.inf
+        for chunk in chunks:
+            # chunks of only error rows have no time; they sort with the chunk before them
+            previous = chunk["t0"] if chunk["t0"] is not None else previous
+            starts.append(previous)
+        if start_time is not None:
+            first = max(first, bisect.bisect_right(starts, start_time) - 1)
+        if end_time is not None:
+            last = min(last, bisect.bisect_right(starts, end_time))
+    if first >= last:
+        return header, iter(())
+    begin = chunks[first]["offset"]
+    end = _chunk_end(index, last)
+
+    def rows():
+        indexer = LogIndexer(header=header)
+        indexer.time_origin = index["time_origin"]
+        indexer._last_time = chunks[first]["t0"]
+        number = chunks[first]["row"]
+        with open(log_file, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            text = view[begin:end].decode("utf-8")
+        time = None
+        for row in csv.reader(io.StringIO(text, newline="")):
+            row_time = indexer.row_time(row)
+            if row_time is not None:
+                time = indexer._last_time = row_time
+            if start_row is not None and number < start_row:
+                number += 1
+                continue
+            if stop_row is not None and number >= stop_row:
+                break
+            number += 1
+            if time is not None:
+                if start_time is not None and time < start_time:
+                    continue
+                if end_time is not None and time > end_time:
+                    break
+            yield row
+
+    return header, rows()
+
+
+def read_rows(log_file, start_row=None, stop_row=None, start_time=None, end_time=None, max_rows=None):
+    """
+    Like iter_rows(), but returns {"header", "rows"} with at most max_rows rows
+    and "truncated" set when more were available.
+    """
+    header, rows = iter_rows(log_file, start_row, stop_row, start_time, end_time)
+    selected = []
+    truncated = False
+    for row in rows:
+        if max_rows is not None and len(selected) >= max_rows:
+            truncated = True
+            break
+        selected.append(row)
+    return {"header": header, "rows": selected, "truncated": truncated}
+
+
+def overview(log_file, command, start_time=None, end_time=None):
+    """
+    Per-chunk min/max of one command's numeric responses straight from the
+    index, without reading the log: a list of {row, t0, t1, min, max, count}.
+    """
+    index = load_index(log_file)
+    summary = []
+    for chunk in index["chunks"]:
+        extremes = chunk["commands"].get(command)
+        if extremes is None:
+            continue
+        if start_time is not None and chunk["t1"] is not None and chunk["t1"] < start_time:
+            continue
+        if end_time is not None and chunk["t0"] is not None and chunk["t0"] > end_time:
+            continue
+        summary.append({"row": chunk["row"], "t0": chunk["t0"], "t1": chunk["t1"],
+                        "min": extremes[0], "max": extremes[1], "count": extremes[2]})
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index a CSV test log and read row or time ranges from it.")
+    parser.add_argument("log_file", help="Path to the .csv log")
+    parser.add_argument("--rows", help="Row range start:stop (data rows counted from 0)")
+    parser.add_argument("--time", help="Time range start:end in seconds")
+    parser.add_argument("--rebuild", action="store_true", help="Index the whole log again")
+    args = parser.parse_args()
+
+    try:
+        index = build_index(args.log_file) if args.rebuild else load_index(args.log_file)
+        if args.rows is None and args.time is None:
+            print(json.dumps({"index": index_path(args.log_file), "rows": index["rows"],
+                              "chunks": len(index["chunks"]), "time_column": index["time_column"]}))
+        else:
+            start_row, stop_row = (int(value) if value else None for value in (args.rows or ":").split(":"))
+            start_time, end_time = (float(value) if value else None for value in (args.time or ":").split(":"))
+            header, rows = iter_rows(args.log_file, start_row, stop_row, start_time, end_time, index)
+            writer = csv.writer(sys.stdout)
+            writer.writerow(header)
+            writer.writerows(rows)
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        exit(1)
@@ -0,0 +1,168 @@
+import collections
+
+# Columns added to the log when any command aggregates windows
+WINDOW_COLUMNS = ["Min", "Max", "Samples"]
+
+
+def to_number(response):
+    try:
+        return float(response)
+    except (TypeError, ValueError):
+        return None
+
+
+class ResponseReducer:
+    """
+    Decides which rows of one command reach the log.
+    options (the plan's or the command's "reduce"):
+      "deadband": only log a value that moved more than this from the last
+                  logged one ("changeOnly": true is a deadband of 0; text
+                  responses are logged when they change)
+      "window":   log one row per this many samples, holding the mean as
+                  Response and the window's Min, Max and Samples count
+      "trigger":  {"above": x, "below": y, "pre": n, "post": n} logs every
+                  sample at full rate while the value is outside the limits,
+                  plus the n samples before the crossing and after it clears;
+                  with neither a deadband nor a window, samples outside a
+                  triggered stretch are not logged at all
+    feed() returns the rows to write for one sample; flush() returns what
+    is still held back at the end of the test. A window row carries the
+    index and time of the sample that closed it, so rows stay in log order.
+    state() and restore() carry what is held back across a checkpoint and resume.
+    """
+
+    def __init__(self, options, response_index, window_columns=False):
+        self.response_index = response_index
+        self.window_columns = window_columns
+        self.deadband = options.get("deadband")
+        if self.deadband is None and options.get("changeOnly", False):
+            self.deadband = 0
+        self.window = options.get("window", 0)
+        trigger = options.get("trigger") or {}
+        self.above = trigger.get("above")
+        self.below = trigger.get("below")
+        self.post = trigger.get("post", 0)
+        self.pre_rows = collections.deque(maxlen=trigger.get("pre", 0)) if trigger else None
+        # a trigger alone logs nothing between triggered stretches
+        self.trigger_only = bool(trigger) and self.deadband is None and not self.window
+        self.post_left = 0
+        self.last_logged = None
+        self.window_rows = []
+        self.window_values = []
+        self.rows_in = 0
+        self.rows_out = 0
+        self.triggers = 0
+
+    def _raw(self, row):
+        return list(row) + ["", "", ""] if self.window_columns else list(row)
+
+    def _triggered(self, value):
+        if value is None:
+            return False
+        return ((self.above is not None and value > self.above)
+                or (self.below is not None and value < self.below))
+
+    def _moved(self, response, value):
+        if self.deadband is None or self.last_logged is None:
+            return True
+        last_response, last_value = self.last_logged
+        if value is None or last_value is None:
+            return response != last_response
+        return abs(value - last_value) > self.deadband
+
+    def _aggregate(self, head=None):
+        """
+        The row of the current window. head replaces the cells before Command
+        when something other than the window's last sample closes it.
+        """
+        values = self.window_values
+        row = list(self.window_rows[-1])
+        if head is not None:
+            row[:len(head)] = head
+        mean = sum(values) / len(values)
+        row[self.response_index] = f"{mean:.10g}"
+        row += [f"{min(values):.10g}", f"{max(values):.10g}", len(values)]
+        self.window_rows = []
+        self.window_values = []
+        return row, mean
+
+    def feed(self, row, response):
+        self.rows_in += 1
+        value = to_number(response)
+        rows = []
+        if self._triggered(value) or self.post_left > 0:
+            if self._triggered(value):
+                if self.post_left == 0:
+                    self.triggers += 1
+                    if self.window_values:
+                        rows.append(self._aggregate(row[:self.response_index - 1])[0])
+                    rows += [self._raw(held) for held in self.pre_rows]
+                    self.pre_rows.clear()
+                self.post_left = self.post + 1
+            self.post_left -= 1
+            rows.append(self._raw(row))
+            self.last_logged = (response, value)
+            self.window_rows = []
+            self.window_values = []
+        else:
+            if self.pre_rows is not None:
+                self.pre_rows.append(row)
+            if self.window and value is not None:
+                self.window_rows.append(row)
+                self.window_values.append(value)
+                if len(self.window_values) >= self.window:
+                    aggregate, mean = self._aggregate()
+                    if self._moved(str(mean), mean):
+                        rows.append(aggregate)
+                        self.last_logged = (str(mean), mean)
+            elif not self.trigger_only and self._moved(response, value):
+                rows.append(self._raw(row))
+                self.last_logged = (response, value)
+            if rows and self.pre_rows is not None:
+                # logged rows need not be repeated when a trigger fires
+                self.pre_rows.clear()
+        self.rows_out += len(rows)
+        return rows
+
+    def flush(self, head=None):
+        """
+        The partial window at the end of the test, if any; head (index and
+        time cells of the end of the test) places it after the rows logged
+        since its last sample.
+        """
+        rows = [self._aggregate(head)[0]] if self.window_values else []
+        self.rows_out += len(rows)
+        return rows
+
+    def stats(self):
+        return {"rows_in": self.rows_in, "rows_out": self.rows_out, "triggers": self.triggers}
+
+    def state(self):
+        """
+        Everything feed() remembers between samples, as JSON-serialisable values
+        copied so later samples do not change them.
+        """
+        return {
+            "pre_rows": list(self.pre_rows) if self.pre_rows is not None else None,
+            "post_left": self.post_left,
+            "last_logged": self.last_logged,
+            "window_rows": list(self.window_rows),
+            "window_values": list(self.window_values),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "triggers": self.triggers,
+        }
+
+    def restore(self, state):
+        """
+        Continue from a state() taken with the same options.
+        """
+        if self.pre_rows is not None:
+            self.pre_rows.extend(state["pre_rows"] or [])
+        self.post_left = state["post_left"]
+        self.last_logged = tuple(state["last_logged"]) if state["last_logged"] is not None else None
+        self.window_rows = [list(row) for row in state["window_rows"]]
+        self.window_values = list(state["window_values"])
+        self.rows_in = state["rows_in"]
+        self.rows_out = state["rows_out"]
+        self.triggers = state["triggers"]
@@ -0,0 +1,428 @@
+import argparse
+import csv
+import json
+import os
+import queue
+import threading
+import time
+
+from log_index import LogIndexer
+
+# Columns stored with a numeric type in columnar logs; everything else is text
+INTEGER_COLUMNS = {"Index"}
+FLOAT_COLUMNS = {"Intended", "Actual", "ConnectMs", "WriteMs", "ReadMs", "ParseMs"}
+# Derived column holding the Response parsed as a float (NaN when not numeric)
+VALUE_COLUMN = "Value"
+
+
+class CsvLogSink:
+    """
+    Plain CSV log, the default output of handle_test_data().
+    Same writerow()/flush()/sync()/close() interface as the other sinks.
+    line_buffered pushes every row to the OS; turn it off when an
+    AsyncLogWriter decides when to flush. append continues an existing log
+    (when resuming a test) instead of starting a new one. With index the
+    sidecar index of log_index.py is built as rows are written and saved on close.
+    """
+
+    def __init__(self, path, metadata=None, line_buffered=True, append=False, column_types=None, index=False):
+        self.path = path
+        self._file = open(path, mode='a' if append else 'w', newline='', buffering=1 if line_buffered else -1)
+        self._writer = csv.writer(self._file)
+        # an appended log is indexed on demand instead
+        self._indexer = LogIndexer() if index and not append else None
+
+    def writerow(self, row):
+        if self._indexer is not None:
+            self._indexer.add(row, self._file.tell)
+        self._writer.writerow(row)
+
+    def flush(self):
+        self._file.flush()
+
+    def sync(self):
+        self.flush()
+        os.fsync(self._file.fileno())
+
+    def sync_offset(self):
+        """
+        Make every row written so far durable and return the file size they occupy.
+        """
+        self.sync()
+        return self._file.tell()
+
+    def at_sync_point(self, callback):
+        """
+        callback(sync_offset()), right away: without a writer thread there is nothing to wait for.
+        """
+        callback(self.sync_offset())
+
+    def close(self):
+        if self._indexer is not None and self._indexer.header is not None:
+            # the index fingerprints the log as it is on disk
+            self._file.flush()
+            self._indexer.save(self.path, self._file.tell())
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ArrowLogSink:
+    """
+    Columnar log written as an Arrow IPC stream in chunks of chunk_rows rows.
+    The first row is the header, as with CSV. Index/Intended/Actual are stored
+    as numbers, Command is dictionary-encoded, and the Response is kept as text
+    plus a typed float Value column. metadata (test name, plan, device) is
+    stored in the schema. The stream format stays readable up to the last
+    complete chunk if the process dies. column_types ({name: "int"|"float"})
+    types further columns, such as numbers extracted by a ColumnTransform.
+    """
+
+    def __init__(self, path, metadata=None, chunk_rows=8192, line_buffered=False, append=False,
+                 column_types=None, index=False):
+        if append:
+            raise ValueError("Columnar logs cannot be appended to; only CSV logs can be resumed")
+        import pyarrow
+        self._pa = pyarrow
+        self.path = path
+        self.metadata = {key: value if isinstance(value, str) else json.dumps(value)
+                         for key, value in (metadata or {}).items()}
+        self.chunk_rows = chunk_rows
+        column_types = column_types or {}
+        self._integer_columns = INTEGER_COLUMNS | {name for name, kind in column_types.items() if kind == "int"}
+        self._float_columns = FLOAT_COLUMNS | {name for name, kind in column_types.items() if kind == "float"}
+        self._header = None
+        self._columns = None
+        self._schema_cache = None
+        self._writer = None
+        self._sink = None
+
+    def _schema(self):
+        pa = self._pa
+        fields = []
+        for name in self._header:
+            if name in self._integer_columns:
+                fields.append(pa.field(name, pa.int64()))
+            elif name in self._float_columns:
+                fields.append(pa.field(name, pa.float64()))
+            elif name == "Command":
+                fields.append(pa.field(name, pa.dictionary(pa.int32(), pa.string())))
+            else:
+                fields.append(pa.field(name, pa.string()))
+        if "Response" in self._header:
+            fields.append(pa.field(VALUE_COLUMN, pa.float64()))
+        return pa.schema(fields, metadata=self.metadata)
+
+    def writerow(self, row):
+        if self._header is None:
+            self._header = [str(name) for name in row]
+            self._columns = [[] for _ in self._header]
+            self._schema_cache = self._schema()
+            self._sink = open(self.path, "wb")
+            self._writer = self._pa.ipc.new_stream(self._sink, self._schema_cache)
+            return
+        # error rows can be shorter than the header
+        for column, value in zip(self._columns, list(row) + [None] * (len(self._header) - len(row))):
+            column.append(value)
+        if len(self._columns[0]) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if self._writer is None or not self._columns[0]:
+            return
+        pa = self._pa
+        arrays = []
+        for name, values, field in zip(self._header, self._columns, self._schema_cache):
+            if name in self._integer_columns:
+                arrays.append(pa.array([to_int(v) for v in values], type=field.type))
+            elif name in self._float_columns:
+                arrays.append(pa.array([to_float(v) for v in values], type=field.type))
+            elif name == "Command":
+                arrays.append(pa.array([None if v is None else str(v) for v in values]).dictionary_encode())
+            else:
+                arrays.append(pa.array([None if v is None else str(v) for v in values], type=pa.string()))
+        if "Response" in self._header:
+            responses = self._columns[self._header.index("Response")]
+            arrays.append(pa.array([to_float(v) for v in responses], type=pa.float64()))
+        self._writer.write_batch(pa.record_batch(arrays, schema=self._schema_cache))
+        self._columns = [[] for _ in self._header]
+        self._sink.flush()
+
+    def sync(self):
+        self.flush()
+        if self._sink is not None:
+            os.fsync(self._sink.fileno())
+
+    def sync_offset(self):
+        self.sync()
+        return self._sink.tell() if self._sink is not None else 0
+
+    def at_sync_point(self, callback):
+        callback(self.sync_offset())
+
+    def close(self):
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# logFormat value in the test plan -> (sink class, file extension)
+LOG_FORMATS = {
+    "csv": (CsvLogSink, ".csv"),
+    "arrow": (ArrowLogSink, ".arrow"),
+}
+
+
+def open_log_sink(path, log_format="csv", metadata=None, writer_options=None, append=False, column_types=None,
+                  index=False):
+    """
+    Open the sink for the plan's logFormat, appending to an existing log with append.
+    column_types names extra numeric columns for typed (columnar) logs; index
+    builds the sidecar index of CSV logs while writing.
+    Unless writer_options has "async": false, the sink is wrapped in an
+    AsyncLogWriter configured from the remaining writer_options
+    (queueSize, flushRows, flushBytes, flushInterval in ms, fsync).
+    """
+    try:
+        sink_class, _ = LOG_FORMATS[log_format]
+    except KeyError:
+        raise ValueError(f"Unknown log format: {log_format}")
+    writer_options = writer_options or {}
+    if not writer_options.get("async", True):
+        return sink_class(path, metadata, append=append, column_types=column_types, index=index)
+    return AsyncLogWriter(
+        sink_class(path, metadata, line_buffered=False, append=append, column_types=column_types, index=index),
+        max_queue=writer_options.get("queueSize", 10000),
+        flush_rows=writer_options.get("flushRows", 1000),
+        flush_bytes=writer_options.get("flushBytes", 1 << 20),
+        flush_interval=writer_options.get("flushInterval", 1000) / 1000.0,
+        fsync=writer_options.get("fsync", False),
+    )
+
+
+class AsyncLogWriter:
+    """
+    Moves log writes off the acquisition thread.
+    Rows go into a bounded queue and a writer thread hands them to the sink,
+    flushing after flush_rows rows, flush_bytes bytes (approximate) or
+    flush_interval seconds, whichever comes first, and fsyncing after each
+    flush when fsync is set. When the queue is full writerow() blocks until
+    there is room and the stall is counted as backpressure, so no rows are
+    lost. A write error in the writer thread is raised by the next
+    writerow() or by close().
+    """
+
+    _STOP = object()
+
+    class _SyncPoint:
+        def __init__(self, callback=None):
+            self.done = threading.Event()
+            self.offset = None
+            self.callback = callback
+
+    def __init__(self, sink, max_queue=10000, flush_rows=1000, flush_bytes=1 << 20,
+                 flush_interval=1.0, fsync=False, on_backpressure=None):
+        self.sink = sink
+        self.path = sink.path
+        self.flush_rows = flush_rows
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.on_backpressure = on_backpressure
+        self.rows_written = 0
+        self.flushes = 0
+        self.backpressure_events = 0
+        self.blocked_seconds = 0.0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="slate-log-writer", daemon=True)
+        self._thread.start()
+
+    def writerow(self, row):
+        if self._error is not None:
+            raise self._error
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.backpressure_events += 1
+            if self.on_backpressure is not None:
+                self.on_backpressure(self._queue.qsize())
+            blocked_at = time.monotonic()
+            self._queue.put(row)
+            self.blocked_seconds += time.monotonic() - blocked_at
+
+    def _flush(self):
+        if self.fsync:
+            self.sink.sync()
+        else:
+            self.sink.flush()
+        self.flushes += 1
+
+    def _run(self):
+        pending_rows = 0
+        pending_bytes = 0
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(0.0, last_flush + self.flush_interval - time.monotonic())
+            try:
+                row = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                row = None
+            if row is self._STOP:
+                break
+            try:
+                if isinstance(row, self._SyncPoint):
+                    row.offset = self.sink.sync_offset()
+                    self.flushes += 1
+                    pending_rows = 0
+                    pending_bytes = 0
+                    last_flush = time.monotonic()
+                    if row.callback is not None:
+                        row.callback(row.offset)
+                    row.done.set()
+                    continue
+                if row is not None:
+                    self.sink.writerow(row)
+                    self.rows_written += 1
+                    pending_rows += 1
+                    pending_bytes += sum(len(str(value)) + 1 for value in row)
+                if pending_rows and (pending_rows >= self.flush_rows
+                                     or pending_bytes >= self.flush_bytes
+                                     or time.monotonic() - last_flush >= self.flush_interval):
+                    self._flush()
+                    pending_rows = 0
+                    pending_bytes = 0
+                    last_flush = time.monotonic()
+                elif not pending_rows:
+                    last_flush = time.monotonic()
+            except Exception as e:
+                self._error = e
+                if isinstance(row, self._SyncPoint):
+                    row.done.set()
+                # keep draining so writerow() and sync_offset() never block forever
+                while True:
+                    row = self._queue.get()
+                    if row is self._STOP:
+                        return
+                    if isinstance(row, self._SyncPoint):
+                        row.done.set()
+
+    def sync_offset(self):
+        """
+        Wait until every row queued so far is written and fsynced, and return
+        the log size they occupy (used for checkpoints).
+        """
+        sync_point = self._SyncPoint()
+        self._queue.put(sync_point)
+        sync_point.done.wait()
+        if self._error is not None:
+            raise self._error
+        return sync_point.offset
+
+    def at_sync_point(self, callback):
+        """
+        Have the writer thread call callback(offset) once every row queued so
+        far is written and fsynced, without waiting for it here. A failing
+        callback is raised like a write error.
+        """
+        if self._error is not None:
+            raise self._error
+        self._queue.put(self._SyncPoint(callback))
+
+    def stats(self):
+        """
+        Counters for the test result.
+        """
+        return {
+            "rows": self.rows_written,
+            "flushes": self.flushes,
+            "backpressure_events": self.backpressure_events,
+            "blocked_seconds": round(self.blocked_seconds, 6),
+        }
+
+    def close(self):
+        self._queue.put(self._STOP)
+        self._thread.join()
+        try:
+            if self._error is None:
+                self._flush()
+        finally:
+            self.sink.close()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def arrow_to_csv(arrow_file, csv_file=None):
+    """
+    Export a columnar log back to the CSV layout handle_test_data() writes.
+    Returns the path of the CSV file.
+    """
+    import pyarrow
+
+    if csv_file is None:
+        csv_file = os.path.splitext(arrow_file)[0] + ".csv"
+    with pyarrow.OSFile(arrow_file, "rb") as source:
+        reader = pyarrow.ipc.open_stream(source)
+        names = [name for name in reader.schema.names if name != VALUE_COLUMN]
+        with open(csv_file, mode='w', newline='') as output:
+            writer = csv.writer(output)
+            writer.writerow(names)
+            for batch in reader:
+                columns = [batch.column(name).to_pylist() for name in names]
+                writer.writerows(["" if value is None else value for value in row] for row in zip(*columns))
+    return csv_file
+
+
+def read_log_metadata(arrow_file):
+    """
+    Return the test metadata stored in a columnar log.
+    """
+    import pyarrow
+
+    with pyarrow.OSFile(arrow_file, "rb") as source:
+        metadata = pyarrow.ipc.open_stream(source).schema.metadata or {}
+    return {key.decode(): value.decode() for key, value in metadata.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a columnar (.arrow) test log to CSV.")
+    parser.add_argument("arrow_file", help="Path to the .arrow log")
+    parser.add_argument("csv_file", nargs="?", help="Output CSV path (defaults to the log name with .csv)")
+    args = parser.parse_args()
+
+    try:
+        print(arrow_to_csv(args.arrow_file, args.csv_file))
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        exit(1)
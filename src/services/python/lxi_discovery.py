@@ -0,0 +1,217 @@
+import ipaddress
+import os
+import socket
+import struct
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+PORTMAPPER_PORT = 111
+PORTMAPPER_PROGRAM = 100000
+PORTMAPPER_VERSION = 2
+PORTMAPPER_GETPORT = 3
+VXI11_CORE_PROGRAM = 0x0607AF
+VXI11_CORE_VERSION = 1
+IPPROTO_TCP = 6
+
+# Largest sweep allowed, so a typo like /8 does not flood the network
+MAX_SWEEP_HOSTS = 1024
+
+
+def subnet_hosts(subnet):
+    """
+    Host addresses for a subnet given as "10.0.0", "10.0.0.x" or "10.0.0.0/24".
+    """
+    subnet = subnet.strip()
+    if "/" not in subnet:
+        octets = [octet for octet in subnet.split(".") if octet not in ("", "x", "*")]
+        subnet = ".".join(octets + ["0"] * (4 - len(octets))) + f"/{8 * len(octets)}"
+    network = ipaddress.ip_network(subnet, strict=False)
+    if network.num_addresses > MAX_SWEEP_HOSTS + 2:
+        raise ValueError(f"Subnet {subnet} is larger than {MAX_SWEEP_HOSTS} hosts")
+    return [str(host) for host in network.hosts()]
+
+
+def getport_request(xid):
+    """
+    ONC-RPC portmapper GETPORT call asking for the VXI-11 core channel over TCP.
+    """
+    return struct.pack(">10I4I",
+                       xid, 0, 2, PORTMAPPER_PROGRAM, PORTMAPPER_VERSION, PORTMAPPER_GETPORT,
+                       0, 0, 0, 0,  # AUTH_NULL credentials and verifier
+                       VXI11_CORE_PROGRAM, VXI11_CORE_VERSION, IPPROTO_TCP, 0)
+
+
+def parse_getport_reply(data):
+    """
+    Return (xid, port) from a GETPORT reply, or None if it is not an accepted reply.
+    """
+    if len(data) < 24:
+        return None
+    xid, message_type, reply_status, _, verifier_length = struct.unpack_from(">5I", data)
+    if message_type != 1 or reply_status != 0:
+        return None
+    offset = 20 + (verifier_length + 3) // 4 * 4
+    if len(data) < offset + 8:
+        return None
+    accept_status, port = struct.unpack_from(">2I", data, offset)
+    if accept_status != 0:
+        return None
+    return xid, port
+
+
+def portmapper_sweep(subnet, timeout=1.0):
+    """
+    Ask every host in subnet whether it runs a VXI-11 server, using one UDP
+    portmapper GETPORT call per host. Yields host addresses as replies arrive.
+    subnet may also be a list of host addresses from subnet_hosts().
+    """
+    hosts = subnet_hosts(subnet) if isinstance(subnet, str) else subnet
+    base_xid = int.from_bytes(os.urandom(4), "big") & 0x7FFF0000
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for index, host in enumerate(hosts):
+            try:
+                sock.sendto(getport_request(base_xid + index), (host, PORTMAPPER_PORT))
+            except OSError:
+                continue
+        seen = set()
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            sock.settimeout(remaining)
+            try:
+                data, (host, _) = sock.recvfrom(512)
+            except socket.timeout:
+                break
+            except OSError:
+                continue
+            reply = parse_getport_reply(data)
+            if reply is None:
+                continue
+            xid, port = reply
+            if port and 0 <= xid - base_xid < len(hosts) and host not in seen:
+                seen.add(host)
+                yield host
+
+
+def resource_host(address):
+    """
+    Host part of a VISA resource string such as TCPIP0::10.0.0.5::inst0::INSTR.
+    Raw sockets (TCPIP::10.0.0.5::5025::SOCKET) keep their port, since one
+    host may serve several instruments on different ports.
+    """
+    parts = address.split("::")
+    if len(parts) > 1 and parts[0].upper().startswith("TCPIP"):
+        if len(parts) > 3 and parts[3].upper() == "SOCKET":
+            return f"{parts[1]}:{parts[2]}"
+        return parts[1]
+    return address
+
+
+def device_from_idn(address, idn):
+    idn_parts = idn.split(",")
+    return {
+        "id": str(uuid.uuid4()),
+        "name": idn_parts[1].strip() if len(idn_parts) > 1 else "Unknown",
+        "address": address,
+        "type": "Unknown",  # Type determination could be added here if needed
+        "isConnected": False,  # Assume devices are not connected for now
+        "idn": idn.strip(),
+    }
+
+
+class IdnCache:
+    """
+    *IDN? results per address, reused for ttl seconds so rescans only probe new addresses.
+    """
+
+    def __init__(self, ttl=300.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, address):
+        with self._lock:
+            entry = self._entries.get(address)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                return None
+            return dict(entry[1])
+
+    def put(self, address, device):
+        with self._lock:
+            self._entries[address] = (time.monotonic(), dict(device))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def discover_devices(resources, probe, subnet=None, cache=None, on_device=None,
+                     sweep_timeout=1.0, max_workers=32):
+    """
+    Identify instruments concurrently.
+    resources are VISA resource strings already known (e.g. from list_resources());
+    with subnet, hosts answering a VXI-11 portmapper sweep are added as
+    TCPIP::<host>::INSTR. probe(address) returns the *IDN? reply and should
+    apply its own timeout, so a dead instrument only delays itself.
+    on_device(device) is called as each result arrives; the full list is returned.
+    Failed probes are reported with "type": "Error" and are not cached.
+    An invalid or too large subnet raises ValueError before anything is probed;
+    a sweep that fails midway still returns the devices that answered.
+    """
+    hosts = subnet_hosts(subnet) if subnet else []
+    devices = []
+    seen_hosts = set()
+    lock = threading.Lock()
+
+    def report(device):
+        with lock:
+            devices.append(device)
+            if on_device is not None:
+                on_device(device)
+
+    def probed(future, address):
+        try:
+            device = device_from_idn(address, future.result())
+        except Exception as e:
+            # Add a placeholder for devices that failed to respond
+            report({
+                "id": str(uuid.uuid4()),
+                "name": "Unknown",
+                "address": address,
+                "type": "Error",
+                "isConnected": False,
+                "error": str(e),
+            })
+            return
+        if cache is not None:
+            cache.put(address, device)
+        report(device)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        def add(address):
+            host = resource_host(address)
+            if host in seen_hosts:
+                return
+            seen_hosts.add(host)
+            cached = cache.get(address) if cache is not None else None
+            if cached is not None:
+                report(cached)
+            else:
+                future = executor.submit(probe, address)
+                future.add_done_callback(lambda done: probed(done, address))
+
+        for address in resources:
+            add(address)
+        if hosts:
+            # probes of earlier hosts run while the sweep is still collecting replies
+            try:
+                for host in portmapper_sweep(hosts, sweep_timeout):
+                    add(f"TCPIP::{host}::INSTR")
+            except OSError:
+                # no UDP socket or no route: keep what the known resources gave
+                pass
+    return devices
@@ -0,0 +1,83 @@
+import time
+
+
+class SampleClock:
+    """
+    Fixed-rate tick source built on absolute deadlines from time.monotonic().
+    Tick k is due at origin + k * period, so command I/O and waits inside a
+    tick never push later ticks back. A tick that starts more than
+    `tolerance` after its deadline is counted as late; when whole periods
+    have been missed the clock either skips them (overrun="skip") or runs
+    them back to back until it has caught up (overrun="catchup").
+    """
+
+    def __init__(self, period, overrun="skip", tolerance=None, clock=time.monotonic):
+        if period <= 0:
+            raise ValueError("period must be positive")
+        if overrun not in ("skip", "catchup"):
+            raise ValueError(f"Unknown overrun policy: {overrun}")
+        self.period = period
+        self.overrun = overrun
+        self.tolerance = period * 0.1 if tolerance is None else tolerance
+        self._clock = clock
+        self.origin = None
+        self.tick = 0
+        self.late_ticks = 0
+        self.skipped_ticks = 0
+
+    def start(self):
+        """
+        Fix tick 0 at the current time. Called implicitly by the first wait().
+        """
+        self.origin = self._clock()
+        self.tick = 0
+
+    def elapsed(self):
+        """
+        Seconds since tick 0.
+        """
+        return self._clock() - self.origin
+
+    def wait(self, stop_event=None):
+        """
+        Block until the next tick is due.
+        Returns (tick, intended, actual) with both times in seconds since
+        tick 0, or None if stop_event was set while waiting.
+        """
+        if self.origin is None:
+            self.start()
+        deadline = self.origin + self.tick * self.period
+        now = self._clock()
+
+        if self.overrun == "skip" and now - deadline >= self.period:
+            missed = int((now - deadline) // self.period)
+            self.skipped_ticks += missed
+            self.tick += missed
+            deadline = self.origin + self.tick * self.period
+
+        remaining = deadline - now
+        if remaining > 0:
+            if stop_event is not None:
+                if stop_event.wait(remaining):
+                    return None
+            else:
+                time.sleep(remaining)
+        elif stop_event is not None and stop_event.is_set():
+            return None
+
+        actual = self._clock()
+        if actual - deadline > self.tolerance:
+            self.late_ticks += 1
+        tick = self.tick
+        self.tick += 1
+        return tick, deadline - self.origin, actual - self.origin
+
+    def stats(self):
+        """
+        Overrun counters for the test result.
+        """
+        return {
+            "ticks": self.tick - self.skipped_ticks,
+            "late_ticks": self.late_ticks,
+            "skipped_ticks": self.skipped_ticks,
+        }
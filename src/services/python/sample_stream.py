@@ -0,0 +1,61 @@
+import collections
+import threading
+
+
+class SampleStream:
+    """
+    Rate-limited live feed of samples for the UI.
+    The acquisition loop calls publish() for every sample; a background thread
+    coalesces them and calls emit(batch) at most max_rate times per second.
+    Each batch is {"test_id", "seq", "samples", "dropped"}: seq increases by one
+    per batch so gaps are detectable, and when more than max_batch samples
+    arrive between two batches only the newest are kept and the rest are
+    counted in "dropped". Dropped samples are only missing from the live
+    feed: the log is written separately (and reduced only by "reduce").
+    """
+
+    def __init__(self, emit, test_id, max_rate=4.0, max_batch=1000):
+        self._emit = emit
+        self.test_id = test_id
+        self.interval = 1.0 / max_rate
+        self._lock = threading.Lock()
+        self._buffer = collections.deque(maxlen=max_batch)
+        self._dropped = 0
+        self.seq = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="slate-sample-stream", daemon=True)
+        self._thread.start()
+
+    def publish(self, sample):
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self._dropped += 1
+            self._buffer.append(sample)
+
+    def _flush(self):
+        with self._lock:
+            if not self._buffer:
+                return
+            samples = list(self._buffer)
+            self._buffer.clear()
+            dropped = self._dropped
+            self._dropped = 0
+            seq = self.seq
+            self.seq += 1
+        try:
+            self._emit({"test_id": self.test_id, "seq": seq, "samples": samples, "dropped": dropped})
+        except Exception:
+            # a closed UI pipe must never stop the acquisition
+            pass
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._flush()
+        self._flush()
+
+    def close(self):
+        """
+        Send whatever is still buffered and stop the background thread.
+        """
+        self._stop.set()
+        self._thread.join()
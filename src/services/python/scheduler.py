@@ -0,0 +1,125 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TestScheduler:
+    """
+    Runs many test plans against many instruments inside one process.
+    At most max_workers tests run at once and later submissions wait as
+    "queued". Every test gets its own stop event for cooperative
+    cancellation; I/O to a shared instrument is serialized by the session pool.
+    """
+
+    def __init__(self, runner, max_workers=8, max_history=200):
+        # runner(test_data, address, output_dir, test_id=, stop_event=, on_status=, on_samples=, resume=) -> result dict
+        self._runner = runner
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="slate-test")
+        self._lock = threading.Lock()
+        self._tests = {}
+        self._stop_events = {}
+        self._finished = []
+        self.max_history = max_history
+
+    def submit(self, test_data, address, output_dir, test_id=None, on_finished=None, on_samples=None,
+               resume=None, on_started=None):
+        """
+        Queue a test and return its test_id.
+        on_started(test_id) is called from the worker thread when it leaves the
+        queue and on_finished(test_id, result) when it ends;
+        on_samples is handed to the runner for live sample batches and resume
+        (a checkpoint) continues an earlier run of the test.
+        """
+        if test_id is None:
+            test_id = f"{str(uuid.uuid4())[:8]}"
+        record = {
+            "test_id": test_id,
+            "name": test_data.get("name", "unnamed_test"),
+            "address": address,
+            "status": "queued",
+            "submitted": time.time(),
+            "started": None,
+            "finished": None,
+            "log_file_path": None,
+            "result": None,
+        }
+        stop_event = threading.Event()
+        with self._lock:
+            if test_id in self._stop_events:
+                raise ValueError(f"Test {test_id} already exists")
+            if test_id in self._tests:
+                # a finished test being resumed starts a new record
+                self._finished.remove(test_id)
+            self._tests[test_id] = record
+            self._stop_events[test_id] = stop_event
+        self._executor.submit(self._run, test_id, test_data, address, output_dir, stop_event, on_started,
+                              on_finished, on_samples, resume)
+        return test_id
+
+    def _run(self, test_id, test_data, address, output_dir, stop_event, on_started, on_finished, on_samples,
+             resume):
+        record = self._tests[test_id]
+        if stop_event.is_set():
+            # cancelled while still queued
+            result = {"status": "stopped"}
+        else:
+            with self._lock:
+                record["status"] = "running"
+                record["started"] = time.time()
+            if on_started is not None:
+                on_started(test_id)
+
+            def on_status(status):
+                with self._lock:
+                    record["log_file_path"] = status.get("log_file_path")
+
+            try:
+                result = self._runner(test_data, address, output_dir,
+                                      test_id=test_id, stop_event=stop_event, on_status=on_status,
+                                      on_samples=on_samples, resume=resume)
+            except Exception as e:
+                result = {"status": "error", "message": str(e)}
+
+        with self._lock:
+            record["status"] = result.get("status", "error")
+            record["finished"] = time.time()
+            record["result"] = result
+            self._stop_events.pop(test_id, None)
+            self._finished.append(test_id)
+            # keep only the most recent finished records
+            while len(self._finished) > self.max_history:
+                self._tests.pop(self._finished.pop(0), None)
+        if on_finished is not None:
+            on_finished(test_id, result)
+
+    def cancel(self, test_id):
+        """
+        Ask a queued or running test to stop. Returns False if it is unknown or already finished.
+        """
+        with self._lock:
+            stop_event = self._stop_events.get(test_id)
+        if stop_event is None:
+            return False
+        stop_event.set()
+        return True
+
+    def status(self, test_id=None):
+        """
+        Return a snapshot of one test's record, or of every known test.
+        """
+        with self._lock:
+            if test_id is not None:
+                record = self._tests.get(test_id)
+                return dict(record) if record is not None else None
+            return [dict(record) for record in self._tests.values()]
+
+    def shutdown(self, wait=True):
+        """
+        Stop every queued and running test and release the worker threads.
+        """
+        with self._lock:
+            stop_events = list(self._stop_events.values())
+        for stop_event in stop_events:
+            stop_event.set()
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,152 @@
+import array
+import sys
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class BlockFormatError(ValueError):
+    pass
+
+
+class VisaBlockReader:
+    """
+    Adapts a pyvisa resource to read_into(memoryview) -> bytes read.
+    """
+
+    def __init__(self, dev):
+        self.dev = dev
+
+    def read_into(self, view):
+        data, _ = self.dev.visalib.read(self.dev.session, len(view))
+        view[:len(data)] = data
+        return len(data)
+
+
+class SocketBlockReader:
+    """
+    Adapts a connected socket; recv_into writes into the buffer without an intermediate copy.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def read_into(self, view):
+        return self.sock.recv_into(view)
+
+
+def read_exact(reader, view):
+    """
+    Fill the whole memoryview from reader.
+    """
+    filled = 0
+    while filled < len(view):
+        count = reader.read_into(view[filled:])
+        if count <= 0:
+            raise BlockFormatError(f"Connection closed after {filled} of {len(view)} bytes")
+        filled += count
+
+
+def parse_block_header(header):
+    """
+    Parse '#<n><length>' and return the payload length.
+    """
+    if len(header) < 2 or header[0:1] != b"#" or not header[1:2].isdigit():
+        raise BlockFormatError(f"Not a definite-length block header: {bytes(header[:12])!r}")
+    digits = int(header[1:2])
+    if digits == 0:
+        raise BlockFormatError("Indefinite-length (#0) blocks are not supported")
+    length = header[2:2 + digits]
+    if len(length) != digits or not length.isdigit():
+        raise BlockFormatError(f"Malformed block length: {bytes(header[:2 + digits])!r}")
+    return int(length)
+
+
+def read_block(reader, buffer=None, terminator=True):
+    """
+    Read one IEEE 488.2 definite-length block (#<n><length><data>) from reader
+    and return a memoryview of its payload.
+    buffer (bytearray or writable array) is reused when it is large enough;
+    otherwise a new bytearray of exactly the payload size is allocated.
+    terminator consumes the trailing newline most instruments send after the block.
+    """
+    prefix = bytearray(2)
+    read_exact(reader, memoryview(prefix))
+    if prefix[0:1] != b"#" or not prefix[1:2].isdigit():
+        raise BlockFormatError(f"Not a definite-length block header: {bytes(prefix)!r}")
+    digits = bytearray(int(prefix[1:2]))
+    read_exact(reader, memoryview(digits))
+    length = parse_block_header(bytes(prefix + digits))
+
+    if buffer is None or memoryview(buffer).nbytes < length:
+        buffer = bytearray(length)
+    payload = memoryview(buffer).cast("B")[:length]
+    read_exact(reader, payload)
+    if terminator:
+        read_exact(reader, memoryview(bytearray(1)))
+    return payload
+
+
+def parse_preamble(text):
+    """
+    Parse an IEEE-style waveform preamble
+    (format,type,points,count,xincrement,xorigin,xreference,yincrement,yorigin,yreference)
+    as returned by :WAVeform:PREamble? on most scopes.
+    """
+    fields = [field.strip() for field in text.strip().split(",")]
+    if len(fields) < 10:
+        raise BlockFormatError(f"Expected 10 preamble fields, got {len(fields)}")
+    return {
+        "points": int(float(fields[2])),
+        "x_increment": float(fields[4]),
+        "x_origin": float(fields[5]),
+        "x_reference": float(fields[6]),
+        "y_increment": float(fields[7]),
+        "y_origin": float(fields[8]),
+        "y_reference": float(fields[9]),
+    }
+
+
+def scale_samples(payload, dtype="B", preamble=None, byteorder="big"):
+    """
+    Interpret payload as samples of dtype (array-module type code) and, if a
+    preamble is given, convert them to physical units:
+    (raw - y_reference) * y_increment + y_origin.
+    byteorder is that of multi-byte samples; IEEE 488.2 blocks are big-endian
+    unless the instrument was switched (e.g. :WAV:BYT LSBF).
+    Returns a numpy array when numpy is installed, otherwise an array.array.
+    """
+    if numpy is not None:
+        endian = "<" if byteorder == "little" else ">"
+        raw = numpy.frombuffer(payload, dtype=numpy.dtype(dtype).newbyteorder(endian))
+        if preamble is None:
+            return raw
+        return (raw - preamble["y_reference"]) * preamble["y_increment"] + preamble["y_origin"]
+
+    raw = array.array(dtype)
+    raw.frombytes(payload)
+    if raw.itemsize > 1 and byteorder != sys.byteorder:
+        raw.byteswap()
+    if preamble is None:
+        return raw
+    y_reference = preamble["y_reference"]
+    y_increment = preamble["y_increment"]
+    y_origin = preamble["y_origin"]
+    return array.array("d", ((value - y_reference) * y_increment + y_origin for value in raw))
+
+
+def save_samples(samples, path):
+    """
+    Write samples next to the test log: .npy with numpy, raw native-order .bin without.
+    Returns the path that was written.
+    """
+    if numpy is not None:
+        path = path + ".npy"
+        numpy.save(path, samples)
+    else:
+        path = path + ".bin"
+        with open(path, "wb") as file:
+            samples.tofile(file)
+    return path
@@ -0,0 +1,212 @@
+import json
+import os
+import threading
+import time
+
+# Where the VISA library that pyvisa.ResourceManager() found is remembered
+VISA_PROBE_CACHE = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+                                "slate", "visa_library.json")
+
+
+def _library_spec(visalib):
+    """
+    The ResourceManager() argument that opens visalib directly, if there is one.
+    """
+    if type(visalib).__module__.startswith("pyvisa_py."):
+        return "@py"
+    if type(visalib).__module__.startswith("pyvisa.ctwrapper."):
+        return f"{visalib.library_path}@ivi"
+    return None
+
+
+def open_resource_manager(cache_file=VISA_PROBE_CACHE):
+    """
+    pyvisa.ResourceManager() without searching for a VISA library on every
+    start: the library found the first time is remembered in cache_file and
+    opened directly afterwards. A library that no longer opens, a new pyvisa
+    version, PYVISA_LIBRARY or a ~/.pyvisarc all fall back to the search.
+    """
+    import pyvisa
+
+    if (cache_file is None or os.environ.get("PYVISA_LIBRARY")
+            or os.path.exists(os.path.join(os.path.expanduser("~"), ".pyvisarc"))):
+        return pyvisa.ResourceManager()
+    try:
+        with open(cache_file) as file:
+            cached = json.load(file)
+        if cached["pyvisa"] == pyvisa.__version__:
+            return pyvisa.ResourceManager(cached["library"])
+    except Exception:
+        # missing or stale cache, or the library is gone: search again
+        pass
+    resource_manager = pyvisa.ResourceManager()
+    library = _library_spec(resource_manager.visalib)
+    if library is not None:
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            temporary = cache_file + ".tmp"
+            with open(temporary, "w") as file:
+                json.dump({"pyvisa": pyvisa.__version__, "library": library}, file)
+            os.replace(temporary, cache_file)
+        except OSError:
+            pass
+    return resource_manager
+
+
+class SessionPool:
+    """
+    Keeps one open instrument session per device address so repeated
+    commands reuse the same VXI-11 link instead of reconnecting every time.
+    Access to each address is serialized with its own lock.
+    Addresses that `transports` handles (see scpi_transports.NativeTransports)
+    are opened through it instead of the resource manager.
+    """
+
+    def __init__(self, resource_manager=None, probe_after=30.0, probe_command="*OPC?", transports=None):
+        # probe_after: seconds a session may sit idle before it is probed
+        # with probe_command before being handed out again
+        self._rm = resource_manager
+        self.transports = transports
+        self._rm_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._address_locks = {}
+        self._last_used = {}
+        self._users = {}
+        self.probe_after = probe_after
+        self.probe_command = probe_command
+
+    def resource_manager(self):
+        with self._rm_lock:
+            if self._rm is None:
+                self._rm = open_resource_manager()
+            return self._rm
+
+    def use(self, resource_manager, transports=None):
+        """
+        Switch to another resource manager (None: pyvisa's default one)
+        and set of native transports (None: none).
+        Sessions opened through the previous ones are closed first.
+        """
+        self.close_all()
+        with self._rm_lock:
+            self._rm = resource_manager
+            self.transports = transports
+
+    def open(self, address, **kwargs):
+        """
+        Open a new, unpooled session for address.
+        Raw sockets (::SOCKET) have no end-of-message signal, so their
+        replies are read up to the newline SCPI terminates them with.
+        """
+        if self.transports is not None and self.transports.handles(address):
+            return self.transports.open(address, **kwargs)
+        dev = self.resource_manager().open_resource(address, **kwargs)
+        if address.upper().endswith("::SOCKET"):
+            dev.read_termination = "\n"
+            dev.write_termination = "\n"
+        return dev
+
+    def _address_lock(self, address):
+        with self._lock:
+            lock = self._address_locks.get(address)
+            if lock is None:
+                lock = threading.RLock()
+                self._address_locks[address] = lock
+            return lock
+
+    def _is_alive(self, address, dev):
+        try:
+            # pyvisa raises InvalidSession once the handle has been closed
+            dev.session
+        except Exception:
+            return False
+        idle = time.monotonic() - self._last_used.get(address, 0)
+        if self.probe_after is not None and idle > self.probe_after:
+            try:
+                dev.query(self.probe_command)
+            except Exception:
+                return False
+        return True
+
+    def _get(self, address):
+        dev = self._sessions.get(address)
+        if dev is not None and not self._is_alive(address, dev):
+            self._drop(address)
+            dev = None
+        if dev is None:
+            dev = self.open(address)
+            self._sessions[address] = dev
+        return dev
+
+    def _drop(self, address):
+        dev = self._sessions.pop(address, None)
+        self._last_used.pop(address, None)
+        if dev is not None:
+            try:
+                dev.close()
+            except Exception:
+                pass
+
+    def execute(self, address, operation, retries=1, timer=None):
+        """
+        Run operation(dev) on the pooled session for address.
+        On failure the session is closed, reopened and the operation
+        retried up to `retries` times before the error is raised.
+        With a PhaseTimer, getting the session is timed as its "connect" phase.
+        """
+        with self._address_lock(address):
+            attempt = 0
+            while True:
+                try:
+                    if timer is not None:
+                        with timer.phase("connect"):
+                            dev = self._get(address)
+                    else:
+                        dev = self._get(address)
+                    result = operation(dev)
+                    self._last_used[address] = time.monotonic()
+                    return result
+                except Exception:
+                    self._drop(address)
+                    if attempt >= retries:
+                        raise
+                    attempt += 1
+                    if timer is not None:
+                        timer.retries += 1
+
+    def acquire(self, address):
+        """
+        Count a long-lived user of address, such as a running test.
+        """
+        with self._lock:
+            self._users[address] = self._users.get(address, 0) + 1
+
+    def release(self, address):
+        """
+        Undo acquire(). The session is closed when the last user releases it,
+        after any operation in progress on it.
+        """
+        with self._lock:
+            users = self._users.get(address, 0) - 1
+            if users > 0:
+                self._users[address] = users
+                return
+            self._users.pop(address, None)
+        self.close(address)
+
+    def close(self, address):
+        """
+        Close the session for address, if one is open.
+        """
+        with self._address_lock(address):
+            self._drop(address)
+
+    def close_all(self):
+        """
+        Close every open session.
+        """
+        with self._lock:
+            addresses = list(self._sessions)
+        for address in addresses:
+            self.close(address)
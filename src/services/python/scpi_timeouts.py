@@ -0,0 +1,142 @@
+import collections
+import threading
+import time
+
+from scpi_timing import ScpiError
+
+# Timeout for queries that have neither a configured nor a learned timeout
+DEFAULT_TIMEOUT_MS = 25000
+
+
+class ResponseTimes:
+    """
+    The last `window` response times of every (device, command) pair,
+    shared by all tests so later runs start with what earlier ones learned.
+    """
+
+    def __init__(self, window=200):
+        self.window = window
+        self._lock = threading.Lock()
+        self._times = {}
+
+    def observe(self, device, command, seconds):
+        with self._lock:
+            times = self._times.get((device, command))
+            if times is None:
+                times = self._times[(device, command)] = collections.deque(maxlen=self.window)
+            times.append(seconds)
+
+    def percentile(self, device, command, percent, min_samples=20):
+        """
+        Nearest-rank percentile in seconds, or None until min_samples responses were seen.
+        """
+        with self._lock:
+            times = sorted(self._times.get((device, command), ()))
+        if not times or len(times) < min_samples:
+            return None
+        rank = max(0, min(len(times) - 1, -(-percent * len(times) // 100) - 1))
+        return times[int(rank)]
+
+    def clear(self):
+        with self._lock:
+            self._times.clear()
+
+
+class TimeoutPolicy:
+    """
+    Timeout and retry rules of one test plan.
+    A command's own "timeout" (ms) wins, then the learned timeout when
+    "adaptiveTimeout" is on, then the plan's "timeout", then DEFAULT_TIMEOUT_MS.
+    The learned timeout is the chosen percentile of recent response times
+    times a multiplier, kept between min and max ms. Failed commands are
+    retried up to "retries" times, waiting retryBackoff ms doubled per attempt
+    (at most maxBackoff ms), and every retry doubles the timeout up to max.
+    """
+
+    def __init__(self, history, default_ms=DEFAULT_TIMEOUT_MS, adaptive=None, retries=0,
+                 backoff_ms=100, max_backoff_ms=5000):
+        self.history = history
+        self.default_ms = default_ms
+        self.adaptive = adaptive
+        self.retries = retries
+        self.backoff_ms = backoff_ms
+        self.max_backoff_ms = max_backoff_ms
+
+    @classmethod
+    def from_plan(cls, test_data, history):
+        options = test_data.get("adaptiveTimeout")
+        adaptive = None
+        if options:
+            # true, or a dict overriding some of the defaults
+            options = options if isinstance(options, dict) else {}
+            adaptive = {
+                "percentile": options.get("percentile", 99),
+                "multiplier": options.get("multiplier", 3),
+                "min": options.get("min", 100),
+                "max": options.get("max", test_data.get("timeout", DEFAULT_TIMEOUT_MS)),
+                "minSamples": options.get("minSamples", 20),
+            }
+        return cls(history, test_data.get("timeout", DEFAULT_TIMEOUT_MS), adaptive,
+                   test_data.get("retries", 0), test_data.get("retryBackoff", 100),
+                   test_data.get("maxBackoff", 5000))
+
+    def ceiling_ms(self, command):
+        if "timeout" in command:
+            return max(command["timeout"], self.default_ms)
+        return self.adaptive["max"] if self.adaptive else self.default_ms
+
+    def timeout_ms(self, device, command, attempt=0):
+        """
+        Timeout in ms for a command dict of the plan on the given attempt (0 = first try).
+        """
+        if "timeout" in command:
+            timeout = command["timeout"]
+        else:
+            timeout = self.default_ms
+            if self.adaptive:
+                learned = self.history.percentile(device, command.get("command", ""),
+                                                  self.adaptive["percentile"], self.adaptive["minSamples"])
+                if learned is not None:
+                    timeout = min(max(learned * 1000.0 * self.adaptive["multiplier"], self.adaptive["min"]),
+                                  self.adaptive["max"])
+        return int(min(timeout * 2 ** attempt, max(timeout, self.ceiling_ms(command))))
+
+    def backoff(self, attempt):
+        """
+        Seconds to wait before retry number attempt + 1.
+        """
+        return min(self.backoff_ms * 2 ** attempt, self.max_backoff_ms) / 1000.0
+
+    def call(self, device, commands, request, stop_event=None, timer=None):
+        """
+        Run request(timeout_ms) for one command dict, or a list of them sharing
+        a round trip, retrying ScpiErrors as configured. The response time of
+        successful single commands is recorded for adaptive timeouts, minus
+        the connect phase when the request times into timer; answers that
+        only came after the session pool reconnected are not recorded.
+        """
+        if not isinstance(commands, (list, tuple)):
+            commands = [commands]
+        attempt = 0
+        while True:
+            timeout = max(self.timeout_ms(device, command, attempt) for command in commands)
+            started = time.perf_counter()
+            connect = timer.phases.get("connect", 0.0) if timer is not None else 0.0
+            pool_retries = timer.retries if timer is not None else 0
+            try:
+                response = request(timeout)
+            except ScpiError:
+                if attempt >= self.retries or (stop_event is not None and stop_event.is_set()):
+                    raise
+                if stop_event is not None:
+                    stop_event.wait(self.backoff(attempt))
+                else:
+                    time.sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+            if len(commands) == 1 and (timer is None or timer.retries == pool_retries):
+                elapsed = time.perf_counter() - started
+                if timer is not None:
+                    elapsed -= timer.phases.get("connect", 0.0) - connect
+                self.history.observe(device, commands[0].get("command", ""), elapsed)
+            return response
@@ -0,0 +1,158 @@
+import contextlib
+import socket
+import time
+
+# VISA status codes (pyvisa.constants.StatusCode) used to classify errors
+VI_ERROR_TMO = -1073807339
+VI_ERROR_CONN_LOST = -1073807194
+VI_ERROR_RSRC_NFOUND = -1073807343
+
+# Phases a command is split into, in the order they happen
+PHASES = ("connect", "write", "read", "parse", "log")
+# Extra log columns with the per-phase time of each row in milliseconds
+TIMING_COLUMNS = ["ConnectMs", "WriteMs", "ReadMs", "ParseMs"]
+ERROR_COLUMN = "Error"
+# Upper bounds of the histogram buckets in milliseconds; slower samples go in a last "over" bucket
+HISTOGRAM_BOUNDS_MS = (0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class ScpiError(Exception):
+    """
+    A failed instrument exchange.
+    kind is one of "timeout", "refused", "unreachable", "connection_lost",
+    "bad_reply" or "error"; phase is the phase that failed, when known.
+    """
+
+    def __init__(self, kind, message, phase=None):
+        super().__init__(f"{kind}: {message}")
+        self.kind = kind
+        self.phase = phase
+
+
+def classify_error(error):
+    """
+    Map an exception from pyvisa or the socket layer to an error kind.
+    """
+    if isinstance(error, ScpiError):
+        return error.kind
+    code = getattr(error, "error_code", None)
+    if code == VI_ERROR_TMO or isinstance(error, (socket.timeout, TimeoutError)):
+        return "timeout"
+    if isinstance(error, ConnectionRefusedError):
+        return "refused"
+    if code == VI_ERROR_CONN_LOST or isinstance(error, (ConnectionResetError, ConnectionAbortedError,
+                                                        BrokenPipeError, EOFError)):
+        return "connection_lost"
+    if code == VI_ERROR_RSRC_NFOUND or isinstance(error, (socket.gaierror, OSError)):
+        return "unreachable"
+    if isinstance(error, (UnicodeDecodeError, ValueError)):
+        # undecodable text, a malformed block header or a reply that cannot be split
+        return "bad_reply"
+    return "error"
+
+
+class PhaseTimer:
+    """
+    Accumulates wall time per phase for one command.
+    The phase that raised is remembered in failed_phase, and retries counts
+    how often the session pool reopened the session and tried again.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.failed_phase = None
+        self.retries = 0
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.failed_phase = name
+            raise
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def columns(self):
+        """
+        Connect, write, read and parse times in ms for the extra log columns.
+        """
+        return [f"{self.phases[name] * 1000.0:.3f}" if name in self.phases else ""
+                for name in ("connect", "write", "read", "parse")]
+
+    def reset(self):
+        self.phases = {}
+        self.failed_phase = None
+        self.retries = 0
+
+
+class Histogram:
+    """
+    Count, total, extremes and bucketed distribution of durations.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+
+    def add(self, seconds):
+        ms = seconds * 1000.0
+        self.count += 1
+        self.total += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = ms if self.max is None else max(self.max, ms)
+        for index, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if ms <= bound:
+                self.buckets[index] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def summary(self):
+        labels = [f"<={bound}ms" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}ms"]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else None,
+            "min_ms": round(self.min, 3) if self.min is not None else None,
+            "max_ms": round(self.max, 3) if self.max is not None else None,
+            "histogram": {label: count for label, count in zip(labels, self.buckets) if count},
+        }
+
+
+class TimingStats:
+    """
+    Per-phase histograms for a whole test, overall and per command,
+    plus pass durations and error counts by kind.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.commands = {}
+        self.iterations = Histogram()
+        self.errors = {}
+
+    def add(self, command, phases):
+        per_command = self.commands.setdefault(command, {})
+        for name, seconds in phases.items():
+            self.phases.setdefault(name, Histogram()).add(seconds)
+            per_command.setdefault(name, Histogram()).add(seconds)
+
+    def add_iteration(self, seconds):
+        self.iterations.add(seconds)
+
+    def add_error(self, command, kind):
+        per_command = self.errors.setdefault(kind, {})
+        per_command[command] = per_command.get(command, 0) + 1
+
+    def summary(self):
+        return {
+            "phases": {name: self.phases[name].summary() for name in PHASES if name in self.phases},
+            "iterations": self.iterations.summary(),
+            "commands": {command: {name: phases[name].summary() for name in PHASES if name in phases}
+                         for command, phases in self.commands.items()},
+            "errors": self.errors,
+        }
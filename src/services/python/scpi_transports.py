@@ -0,0 +1,690 @@
+import socket
+import struct
+import threading
+
+# Default ports of raw-socket SCPI and HiSLIP instruments
+RAW_SOCKET_PORT = 5025
+HISLIP_PORT = 4880
+DEFAULT_OPEN_TIMEOUT_MS = 5000
+# Longest newline-terminated raw-socket reply
+MAX_LINE = 16 << 20
+
+# HiSLIP message types (IVI-6.1)
+HS_INITIALIZE = 0
+HS_INITIALIZE_RESPONSE = 1
+HS_FATAL_ERROR = 2
+HS_ERROR = 3
+HS_DATA = 6
+HS_DATA_END = 7
+HS_ASYNC_MAX_MESSAGE_SIZE = 15
+HS_ASYNC_MAX_MESSAGE_SIZE_RESPONSE = 16
+HS_ASYNC_INITIALIZE = 17
+HS_ASYNC_INITIALIZE_RESPONSE = 18
+HS_HEADER = struct.Struct("!2sBBIQ")  # prologue, type, control code, parameter, payload length
+HS_MAX_MESSAGE_SIZE = 1 << 20
+HS_VENDOR_ID = b"SL"
+HS_ANY_MESSAGE_ID = 0xFFFFFFFF
+
+
+def parse_transport(address):
+    """
+    Return (transport, host, port, sub_address) for addresses the native
+    transports serve, or None for everything else (VXI-11, USB, GPIB, ...):
+      TCPIP::host::port::SOCKET              -> ("socket", host, port, None)
+      TCPIP::host::hislip0[,port]::INSTR     -> ("hislip", host, port or 4880, "hislip0")
+    """
+    parts = address.split("::")
+    if len(parts) < 3 or not parts[0].upper().startswith("TCPIP"):
+        return None
+    suffix = parts[-1].upper()
+    if suffix == "SOCKET" and len(parts) == 4:
+        return "socket", parts[1], int(parts[2]), None
+    if suffix == "INSTR" and len(parts) == 4 and parts[2].lower().startswith("hislip"):
+        sub_address, _, port = parts[2].partition(",")
+        return "hislip", parts[1], int(port) if port else HISLIP_PORT, sub_address
+    return None
+
+
+def _terminated(message):
+    return message if message.endswith(b"\n") else message + b"\n"
+
+
+def _unterminated(reply):
+    return reply.rstrip(b"\r\n")
+
+
+def _hs_message(kind, control, parameter, payload=b""):
+    return HS_HEADER.pack(b"HS", kind, control, parameter, len(payload)) + bytes(payload)
+
+
+def _hs_header(header):
+    """
+    (type, control code, parameter, payload length) of a HiSLIP message header.
+    """
+    prologue, kind, control, parameter, length = HS_HEADER.unpack(header)
+    if prologue != b"HS":
+        raise ValueError(f"Not a HiSLIP message: {prologue!r}")
+    return kind, control, parameter, length
+
+
+def _hs_error(kind, control, payload):
+    text = payload.decode("ascii", "replace")
+    return ConnectionAbortedError(f"HiSLIP {'fatal ' if kind == HS_FATAL_ERROR else ''}error {control}: {text}")
+
+
+# HiSLIP messages are received by generators that yield how many bytes they
+# need next and are sent those bytes back, so the blocking and the asyncio
+# connections share the framing and differ only in how they read.
+
+def _hs_receive():
+    """
+    Receive one message header, raising the instrument's errors.
+    Returns (type, parameter, payload length); the payload is left unread.
+    """
+    kind, control, parameter, length = _hs_header((yield HS_HEADER.size))
+    if kind in (HS_FATAL_ERROR, HS_ERROR):
+        raise _hs_error(kind, control, (yield length))
+    return kind, parameter, length
+
+
+def _hs_expect(expected):
+    """
+    Receive one message of the expected type and return (parameter, payload).
+    """
+    kind, parameter, length = yield from _hs_receive()
+    if kind != expected:
+        raise ValueError(f"Expected HiSLIP message {expected}, got {kind}")
+    return parameter, (yield length)
+
+
+def _run_blocking(steps, reader):
+    try:
+        size = next(steps)
+        while True:
+            size = steps.send(reader.readexactly(size))
+    except StopIteration as done:
+        return done.value
+
+
+async def _run_async(steps, reader):
+    try:
+        size = next(steps)
+        while True:
+            size = steps.send(await reader.readexactly(size))
+    except StopIteration as done:
+        return done.value
+
+
+class _HislipState:
+    """
+    What a HiSLIP session keeps between messages: the message IDs, the
+    RMT-delivered flag and how much of the current reply is left. It builds
+    and checks messages; sending and receiving them is up to the connection.
+    """
+
+    def __init__(self, sub_address):
+        self.sub_address = sub_address
+        self.max_message_size = HS_MAX_MESSAGE_SIZE
+        self.session_id = None
+        self.remaining = 0
+        self.end = True
+        self._message_id = 0xFFFFFF00
+        self._last_message_id = None
+        self._rmt = 0
+
+    def initialize(self):
+        # protocol version 1.0 and our vendor ID, then the sub-address as payload
+        return _hs_message(HS_INITIALIZE, 0, (1 << 24) | int.from_bytes(HS_VENDOR_ID, "big"),
+                           self.sub_address.encode("ascii"))
+
+    def async_initialize(self):
+        return _hs_message(HS_ASYNC_INITIALIZE, 0, self.session_id)
+
+    def async_max_message_size(self):
+        return _hs_message(HS_ASYNC_MAX_MESSAGE_SIZE, 0, 0, struct.pack("!Q", self.max_message_size))
+
+    def agree_max_message_size(self, payload):
+        self.max_message_size = min(self.max_message_size, struct.unpack("!Q", payload)[0])
+
+    def request(self, message):
+        """
+        The Data/DataEnd messages carrying message, as one buffer.
+        A new request abandons whatever is left of the previous reply.
+        """
+        view = memoryview(_terminated(message))
+        chunk = self.max_message_size - HS_HEADER.size
+        self.remaining = 0
+        self.end = False
+        messages = []
+        while True:
+            last = len(view) <= chunk
+            messages.append(_hs_message(HS_DATA_END if last else HS_DATA, self._rmt, self._message_id,
+                                        view if last else view[:chunk]))
+            self._rmt = 0
+            self._last_message_id = self._message_id
+            self._message_id = (self._message_id + 2) & 0xFFFFFFFF
+            if last:
+                return b"".join(messages)
+            view = view[chunk:]
+
+    def reply_part(self, kind, parameter, length):
+        """
+        Whether a received message is part of the current reply. The payload
+        of one that is not (a reply to an abandoned request) must be skipped.
+        """
+        if kind not in (HS_DATA, HS_DATA_END) or parameter not in (HS_ANY_MESSAGE_ID, self._last_message_id):
+            return False
+        self.remaining = length
+        self.end = kind == HS_DATA_END
+        self.consumed(0)
+        return True
+
+    def consumed(self, count):
+        self.remaining -= count
+        if self.remaining == 0 and self.end:
+            self._rmt = 1
+
+    def next_part(self):
+        """
+        Receive up to the next payload bytes of the current reply (see _hs_receive).
+        Returns False once the reply is complete.
+        """
+        while self.remaining == 0:
+            if self.end:
+                return False
+            kind, parameter, length = yield from _hs_receive()
+            if not self.reply_part(kind, parameter, length):
+                yield length
+        return True
+
+
+def _connect(host, port, timeout):
+    sock = socket.create_connection((host, port), timeout)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+
+class _SocketReader:
+    """
+    Buffered reads from a blocking socket; socket timeouts surface as TimeoutError.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self._buffer = bytearray()
+
+    def _fill(self, size=65536):
+        data = self.sock.recv(size)
+        if not data:
+            raise ConnectionResetError("The instrument closed the connection")
+        self._buffer += data
+
+    def readexactly(self, size):
+        if len(self._buffer) < size:
+            # read the rest straight into place rather than through the buffer
+            view = memoryview(bytearray(size))
+            filled = len(self._buffer)
+            view[:filled] = self._buffer
+            self._buffer.clear()
+            while filled < size:
+                count = self.sock.recv_into(view[filled:])
+                if not count:
+                    raise ConnectionResetError("The instrument closed the connection")
+                filled += count
+            return view.obj
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def readuntil(self, separator):
+        searched = 0
+        while True:
+            found = self._buffer.find(separator, searched)
+            if found >= 0:
+                end = found + len(separator)
+                data = bytes(self._buffer[:end])
+                del self._buffer[:end]
+                return data
+            if len(self._buffer) > MAX_LINE:
+                raise ValueError(f"Reply longer than {MAX_LINE} bytes without a line terminator")
+            searched = max(0, len(self._buffer) - len(separator) + 1)
+            self._fill()
+
+    def read(self, size):
+        if not self._buffer:
+            return self.sock.recv(size)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+
+class RawSocketConnection:
+    """
+    SCPI over a plain TCP socket: newline-terminated messages, no framing
+    and no extra round trip per transaction. Blocking; AsyncRawSocketConnection
+    is the same for an asyncio event loop.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self._sock = None
+        self._reader = None
+
+    def connect(self, timeout=None):
+        self._sock = _connect(self.host, self.port, timeout)
+        self._reader = _SocketReader(self._sock)
+        return self
+
+    def settimeout(self, timeout):
+        self._sock.settimeout(timeout)
+
+    def write(self, message):
+        self._sock.sendall(_terminated(message))
+
+    def read(self):
+        """
+        One reply without its line terminator.
+        """
+        return _unterminated(self._reader.readuntil(b"\n"))
+
+    def read_some(self, size):
+        """
+        Up to size bytes of the reply stream (for binary blocks).
+        """
+        data = self._reader.read(size)
+        if not data:
+            raise ConnectionResetError(f"{self.host}:{self.port} closed the connection")
+        return data
+
+    def query(self, message):
+        self.write(message)
+        return self.read()
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = self._reader = None
+
+
+class HislipConnection:
+    """
+    HiSLIP client over blocking sockets: a synchronous channel carrying
+    Data/DataEnd messages and an asynchronous channel used to set the session
+    up. Replies are matched to requests by message ID and the RMT-delivered
+    flag is kept as IVI-6.1 requires. Overlapped mode, locking and device
+    clear are not used. AsyncHislipConnection is the same for an asyncio event loop.
+    """
+
+    def __init__(self, host, port=HISLIP_PORT, sub_address="hislip0"):
+        self.host = host
+        self.port = port
+        self.state = _HislipState(sub_address)
+        self._sock = None
+        self._reader = None
+        self._async_sock = None
+
+    def connect(self, timeout=None):
+        state = self.state
+        self._sock = _connect(self.host, self.port, timeout)
+        self._reader = _SocketReader(self._sock)
+        self._sock.sendall(state.initialize())
+        parameter, _ = _run_blocking(_hs_expect(HS_INITIALIZE_RESPONSE), self._reader)
+        state.session_id = parameter & 0xFFFF
+
+        self._async_sock = _connect(self.host, self.port, timeout)
+        reader = _SocketReader(self._async_sock)
+        self._async_sock.sendall(state.async_initialize())
+        _run_blocking(_hs_expect(HS_ASYNC_INITIALIZE_RESPONSE), reader)
+        self._async_sock.sendall(state.async_max_message_size())
+        _, payload = _run_blocking(_hs_expect(HS_ASYNC_MAX_MESSAGE_SIZE_RESPONSE), reader)
+        state.agree_max_message_size(payload)
+        return self
+
+    def settimeout(self, timeout):
+        for sock in (self._sock, self._async_sock):
+            if sock is not None:
+                sock.settimeout(timeout)
+
+    def write(self, message):
+        self._sock.sendall(self.state.request(message))
+
+    def read_some(self, size):
+        """
+        Up to size bytes of the current reply; b"" once it is complete.
+        """
+        state = self.state
+        if not _run_blocking(state.next_part(), self._reader):
+            return b""
+        data = self._reader.readexactly(min(size, state.remaining))
+        state.consumed(len(data))
+        return data
+
+    def read(self):
+        """
+        One complete reply (up to DataEnd) without its line terminator.
+        """
+        parts = []
+        while True:
+            data = self.read_some(self.state.max_message_size)
+            if not data:
+                break
+            parts.append(data)
+        return _unterminated(b"".join(parts))
+
+    def query(self, message):
+        self.write(message)
+        return self.read()
+
+    def close(self):
+        for sock in (self._sock, self._async_sock):
+            if sock is not None:
+                sock.close()
+        self._sock = self._reader = self._async_sock = None
+
+
+async def _open_stream(host, port, timeout):
+    """
+    (reader, writer) of an asyncio stream connection, for the running event loop.
+    """
+    import asyncio
+
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port, limit=MAX_LINE), timeout)
+    sock = writer.get_extra_info("socket")
+    if sock is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return reader, writer
+
+
+async def _close_stream(writer):
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+
+
+class AsyncRawSocketConnection:
+    """
+    RawSocketConnection for an asyncio event loop (writes and queries).
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self._reader = None
+        self._writer = None
+
+    async def connect(self, timeout=None):
+        self._reader, self._writer = await _open_stream(self.host, self.port, timeout)
+        return self
+
+    async def write(self, message):
+        self._writer.write(_terminated(message))
+        await self._writer.drain()
+
+    async def read(self):
+        return _unterminated(await self._reader.readuntil(b"\n"))
+
+    async def query(self, message):
+        await self.write(message)
+        return await self.read()
+
+    async def close(self):
+        if self._writer is not None:
+            writer, self._reader, self._writer = self._writer, None, None
+            await _close_stream(writer)
+
+
+class AsyncHislipConnection:
+    """
+    HislipConnection for an asyncio event loop (writes and queries).
+    """
+
+    def __init__(self, host, port=HISLIP_PORT, sub_address="hislip0"):
+        self.host = host
+        self.port = port
+        self.state = _HislipState(sub_address)
+        self._reader = None
+        self._writer = None
+        self._async_writer = None
+
+    async def connect(self, timeout=None):
+        state = self.state
+        self._reader, self._writer = await _open_stream(self.host, self.port, timeout)
+        self._writer.write(state.initialize())
+        parameter, _ = await _run_async(_hs_expect(HS_INITIALIZE_RESPONSE), self._reader)
+        state.session_id = parameter & 0xFFFF
+
+        reader, self._async_writer = await _open_stream(self.host, self.port, timeout)
+        self._async_writer.write(state.async_initialize())
+        await _run_async(_hs_expect(HS_ASYNC_INITIALIZE_RESPONSE), reader)
+        self._async_writer.write(state.async_max_message_size())
+        _, payload = await _run_async(_hs_expect(HS_ASYNC_MAX_MESSAGE_SIZE_RESPONSE), reader)
+        state.agree_max_message_size(payload)
+        return self
+
+    async def write(self, message):
+        self._writer.write(self.state.request(message))
+        await self._writer.drain()
+
+    async def read(self):
+        """
+        One complete reply (up to DataEnd) without its line terminator.
+        """
+        state = self.state
+        parts = []
+        while await _run_async(state.next_part(), self._reader):
+            data = await self._reader.readexactly(state.remaining)
+            state.consumed(len(data))
+            parts.append(data)
+        return _unterminated(b"".join(parts))
+
+    async def query(self, message):
+        await self.write(message)
+        return await self.read()
+
+    async def close(self):
+        writers = [writer for writer in (self._writer, self._async_writer) if writer is not None]
+        self._reader = self._writer = self._async_writer = None
+        for writer in writers:
+            await _close_stream(writer)
+
+
+def connection_for(address, asynchronous=False):
+    """
+    An unconnected connection for address: blocking, or for an asyncio event
+    loop with asynchronous.
+    """
+    transport = parse_transport(address)
+    if transport is None:
+        raise ValueError(f"No native transport for {address}")
+    kind, host, port, sub_address = transport
+    if kind == "socket":
+        return (AsyncRawSocketConnection if asynchronous else RawSocketConnection)(host, port)
+    return (AsyncHislipConnection if asynchronous else HislipConnection)(host, port, sub_address)
+
+
+class TransportSession:
+    """
+    A blocking native connection with the parts of the pyvisa resource
+    interface the SCPI helpers use (timeout in ms, write, read, query,
+    read_into, close), so SessionPool hands it out like a VISA session.
+    """
+
+    def __init__(self, address, open_timeout=DEFAULT_OPEN_TIMEOUT_MS):
+        self.address = address
+        self.timeout = open_timeout
+        self.read_termination = None
+        self.write_termination = None
+        connection = connection_for(address)
+        try:
+            connection.connect(open_timeout / 1000.0)
+        except BaseException:
+            connection.close()
+            raise
+        self._connection = connection
+
+    @property
+    def session(self):
+        if self._connection is None:
+            raise OSError(f"Session to {self.address} is closed")
+        return self._connection
+
+    def _ready(self):
+        connection = self.session
+        connection.settimeout(self.timeout / 1000.0 if self.timeout is not None else None)
+        return connection
+
+    def write(self, command):
+        self._ready().write(command.encode())
+
+    def read(self):
+        return self._ready().read().decode()
+
+    def query(self, command):
+        return self._ready().query(command.encode()).decode()
+
+    def read_into(self, view):
+        data = self._ready().read_some(len(view))
+        view[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            connection.close()
+
+
+class NativeTransports:
+    """
+    Opens raw-socket and HiSLIP sessions for SessionPool; other addresses
+    are left to its resource manager. transports limits which of the two
+    ("socket", "hislip") are served natively.
+    """
+
+    def __init__(self, transports=("socket", "hislip")):
+        self.transports = tuple(transports)
+
+    def handles(self, address):
+        transport = parse_transport(address)
+        return transport is not None and transport[0] in self.transports
+
+    def open(self, address, open_timeout=DEFAULT_OPEN_TIMEOUT_MS, **kwargs):
+        return TransportSession(address, open_timeout)
+
+
+class InstrumentPoller:
+    """
+    Sends rounds of commands to many raw-socket and HiSLIP instruments at
+    once from one event loop running in its own thread. Connections stay
+    open from one poll to the next, one per address and apart from
+    SessionPool's sessions; a connection that failed is opened again by the
+    next poll.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        # used only on the loop's thread
+        self._connections = {}
+        self._address_locks = {}
+
+    def _event_loop(self):
+        with self._lock:
+            if self._loop is None:
+                import asyncio
+
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="slate-poller", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def poll(self, requests, timeout_ms=DEFAULT_OPEN_TIMEOUT_MS):
+        """
+        Send every (address, command) of requests, all instruments at once
+        and each instrument's commands in order, and wait for the replies:
+        the reply ("NA" for commands without one), or the exception raised,
+        in the order of requests. Not to be called from the poller's own loop.
+        """
+        import asyncio
+
+        return asyncio.run_coroutine_threadsafe(self._poll(requests, timeout_ms), self._event_loop()).result()
+
+    async def _poll(self, requests, timeout_ms):
+        import asyncio
+
+        by_address = {}
+        for position, (address, command) in enumerate(requests):
+            by_address.setdefault(address, []).append((position, command))
+        results = [None] * len(requests)
+        await asyncio.gather(*(self._run(address, commands, timeout_ms / 1000.0, results)
+                               for address, commands in by_address.items()))
+        return results
+
+    async def _run(self, address, commands, timeout, results):
+        import asyncio
+
+        lock = self._address_locks.get(address)
+        if lock is None:
+            lock = self._address_locks[address] = asyncio.Lock()
+        async with lock:
+            reopened = False
+            while True:
+                connection = self._connections.get(address)
+                reused = connection is not None
+                try:
+                    if connection is None:
+                        connection = self._connections[address] = connection_for(address, asynchronous=True)
+                        await asyncio.wait_for(connection.connect(timeout), timeout)
+                    for position, command in commands:
+                        if "?" in command:
+                            reply = await asyncio.wait_for(connection.query(command.encode()), timeout)
+                            results[position] = reply.decode()
+                        else:
+                            await asyncio.wait_for(connection.write(command.encode()), timeout)
+                            results[position] = "NA"
+                    return
+                except Exception as e:
+                    await self._drop(address)
+                    if (reused and not reopened and results[commands[0][0]] is None
+                            and isinstance(e, (ConnectionError, EOFError))):
+                        # the instrument closed the idle connection before seeing the command
+                        reopened = True
+                        continue
+                    if isinstance(e, asyncio.TimeoutError):
+                        e = TimeoutError(f"No response from {address}")
+                    for position, _ in commands:
+                        if results[position] is None:
+                            results[position] = e
+                    return
+
+    async def _drop(self, address):
+        connection = self._connections.pop(address, None)
+        if connection is not None:
+            try:
+                await connection.close()
+            except Exception:
+                pass
+
+    async def _close_all(self):
+        for address in list(self._connections):
+            await self._drop(address)
+        # the locks belong to this loop
+        self._address_locks.clear()
+
+    def close(self):
+        """
+        Close every connection and stop the event loop thread.
+        """
+        import asyncio
+
+        with self._lock:
+            loop, thread, self._loop, self._thread = self._loop, self._thread, None, None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._close_all(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
@@ -0,0 +1,249 @@
+import argparse
+import math
+import random
+import socket
+import struct
+import threading
+import time
+
+# Conventional ports of raw-socket SCPI and HiSLIP instruments
+RAW_SOCKET_PORT = 5025
+HISLIP_PORT = 4880
+HISLIP_HEADER = struct.Struct("!2sBBIQ")
+HISLIP_MAX_MESSAGE_SIZE = 1 << 20
+
+
+class SimulatedInstrument:
+    """
+    Raw-socket SCPI instrument for benchmarks and tests without hardware.
+    Commands are newline-terminated; queries (containing "?") get one
+    newline-terminated reply, compound queries joined with ";" get the
+    replies joined with ";", and queries containing "DATA?" or "CURV?"
+    return an IEEE 488.2 definite-length block of block_size bytes.
+    Every reply is delayed by latency seconds plus up to +/- jitter seconds.
+    Numeric replies are padded with extra comma-separated values until they
+    are at least response_size bytes long. With probability error_rate a
+    command fails according to error_mode: "drop" closes the connection as a
+    rebooted instrument would (the client sees it as a timeout), "garbage"
+    answers with bytes that are not a valid reply.
+    Reach it from pyvisa as TCPIP::<host>::<port>::SOCKET, or with
+    protocol="hislip" as TCPIP::<host>::hislip0,<port>::INSTR (synchronous
+    mode only: Data/DataEnd, no locking, device clear or SRQ).
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, response_size=0,
+                 error_rate=0.0, error_mode="drop", block_size=1000, idn="SLATE,SIMULATOR,0,1.0", seed=None,
+                 protocol="raw"):
+        if protocol not in ("raw", "hislip"):
+            raise ValueError(f"Unknown protocol: {protocol}")
+        self.protocol = protocol
+        self.latency = latency
+        self.jitter = jitter
+        self.response_size = response_size
+        self.error_rate = error_rate
+        self.error_mode = error_mode
+        self.block_size = block_size
+        self.idn = idn
+        self.commands = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._server = socket.create_server((host, port))
+        self.host, self.port = self._server.getsockname()[:2]
+        # accept() is not interrupted by close() on every platform, so poll a stop flag
+        self._server.settimeout(0.2)
+        self._stop = threading.Event()
+        self._thread = None
+        self._clients = set()
+        self._sessions = 0
+
+    @property
+    def address(self):
+        if self.protocol == "hislip":
+            return f"TCPIP::{self.host}::hislip0,{self.port}::INSTR"
+        return f"TCPIP::{self.host}::{self.port}::SOCKET"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._accept, name="slate-sim-instrument", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._server.close()
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            client.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _accept(self):
+        while not self._stop.is_set():
+            try:
+                client, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            client.settimeout(None)
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._lock:
+                self._clients.add(client)
+            serve = self._serve_hislip if self.protocol == "hislip" else self._serve
+            threading.Thread(target=serve, args=(client,), daemon=True).start()
+
+    def _serve(self, client):
+        pending = b""
+        try:
+            with client:
+                while True:
+                    data = client.recv(65536)
+                    if not data:
+                        return
+                    pending += data
+                    while b"\n" in pending:
+                        line, pending = pending.split(b"\n", 1)
+                        line = line.strip().decode("ascii", "replace")
+                        if not line:
+                            continue
+                        reply = self.respond(line)
+                        if reply is False:
+                            return  # simulated failure: drop the connection
+                        if reply is not None:
+                            client.sendall(reply)
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._clients.discard(client)
+
+    def _serve_hislip(self, client):
+        def receive(size):
+            data = b""
+            while len(data) < size:
+                chunk = client.recv(size - len(data))
+                if not chunk:
+                    raise ConnectionResetError
+                data += chunk
+            return data
+
+        def send(kind, control, parameter, payload=b""):
+            client.sendall(HISLIP_HEADER.pack(b"HS", kind, control, parameter, len(payload)) + payload)
+
+        message = b""
+        try:
+            with client:
+                while True:
+                    prologue, kind, control, parameter, length = HISLIP_HEADER.unpack(receive(HISLIP_HEADER.size))
+                    payload = receive(length) if length else b""
+                    if prologue != b"HS":
+                        return
+                    if kind == 0:  # Initialize: version 1.0, synchronous mode, a new session ID
+                        with self._lock:
+                            self._sessions += 1
+                            session_id = self._sessions & 0xFFFF
+                        send(1, 0, (0x0100 << 16) | session_id)
+                    elif kind == 17:  # AsyncInitialize, answered with our vendor ID
+                        send(18, 0, int.from_bytes(b"SL", "big"))
+                    elif kind == 15:  # AsyncMaximumMessageSize
+                        send(16, 0, 0, struct.pack("!Q", HISLIP_MAX_MESSAGE_SIZE))
+                    elif kind in (6, 7):  # Data, DataEnd
+                        message += payload
+                        if kind == 6:
+                            continue
+                        replies = []
+                        for line in message.split(b"\n"):
+                            line = line.strip().decode("ascii", "replace")
+                            if not line:
+                                continue
+                            reply = self.respond(line)
+                            if reply is False:
+                                return
+                            if reply is not None:
+                                replies.append(reply)
+                        message = b""
+                        if replies:
+                            # replies carry the message ID of the request they answer
+                            send(7, 0, parameter, b"".join(replies))
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._clients.discard(client)
+
+    def respond(self, line):
+        """
+        Bytes to send back for one command line, None for writes, False to drop the connection.
+        """
+        with self._lock:
+            self.commands += 1
+            fail = self._random.random() < self.error_rate
+            delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+            if fail:
+                self.errors += 1
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            return b"\xff\xfe?\n" if self.error_mode == "garbage" else False
+        if "?" not in line:
+            return None
+        queries = [query for query in line.split(";") if "?" in query]
+        if len(queries) == 1 and ("DATA?" in line.upper() or "CURV?" in line.upper()):
+            payload = bytes(self._random.getrandbits(8) for _ in range(self.block_size))
+            length = str(len(payload)).encode()
+            return b"#" + str(len(length)).encode() + length + payload + b"\n"
+        return (";".join(self.answer(query) for query in queries) + "\n").encode()
+
+    def answer(self, query):
+        query = query.strip().lstrip(":").upper()
+        if query == "*IDN?":
+            return self.idn
+        if query == "*OPC?":
+            return "1"
+        if query.startswith("SYST:ERR") or query.startswith("SYSTEM:ERROR"):
+            return '0,"No error"'
+        elapsed = time.monotonic() - self._start
+        value = f"{math.sin(elapsed) + self._random.gauss(0, 0.01):.6E}"
+        reply = value
+        while len(reply) < self.response_size:
+            reply += "," + value
+        return reply
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a simulated raw-socket or HiSLIP SCPI instrument.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help=f"Default {RAW_SOCKET_PORT} (raw) or {HISLIP_PORT} (hislip)")
+    parser.add_argument("--protocol", choices=["raw", "hislip"], default="raw")
+    parser.add_argument("--latency", type=float, default=0.0, help="Reply delay in ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random +/- delay in ms")
+    parser.add_argument("--response-size", type=int, default=0, help="Minimum reply size in bytes")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of commands that fail")
+    parser.add_argument("--error-mode", choices=["drop", "garbage"], default="drop",
+                        help="Close the connection or send an invalid reply on failure")
+    args = parser.parse_args()
+
+    if args.port is None:
+        args.port = HISLIP_PORT if args.protocol == "hislip" else RAW_SOCKET_PORT
+    instrument = SimulatedInstrument(args.host, args.port, args.latency / 1000.0, args.jitter / 1000.0,
+                                     args.response_size, args.error_rate, args.error_mode,
+                                     protocol=args.protocol)
+    print(f"Simulated instrument at {instrument.address}")
+    instrument.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        instrument.close()
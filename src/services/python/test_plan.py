@@ -0,0 +1,189 @@
+import collections
+import time
+import types
+
+from log_reduction import WINDOW_COLUMNS
+from log_sinks import LOG_FORMATS
+from scpi_timing import ERROR_COLUMN, TIMING_COLUMNS
+
+FIRST_COLUMNS = {
+    "Index": ['Index'],
+    "Timestamp": ['Timestamp'],
+    "Both": ['Index', 'Timestamp'],
+}
+SCHEDULES = ("interval", "deadline")
+OVERRUN_POLICIES = ("skip", "catchup")
+BATCH_MODES = (None, "join", "pipeline")
+BYTE_ORDERS = ("big", "little")  # of binary block samples; IEEE 488.2 sends big-endian
+
+
+class PlanError(ValueError):
+    """
+    The test plan JSON is malformed; raised before anything is sent to the instrument.
+    """
+
+
+# One command of a compiled plan. spec is a read-only view of the command's
+# JSON (for TimeoutPolicy); batch_size > 1 marks the first query of a group
+# that shares a round trip with the batch_size - 1 queries after it.
+CompiledCommand = collections.namedtuple(
+    "CompiledCommand",
+    ["text", "is_query", "wait_after", "binary", "dtype", "byteorder", "preamble", "reduce", "spec", "batch_size"])
+
+# Everything handle_test_data() needs, resolved once before the test starts.
+# setup holds the runOnce commands, run once before the periodic loop.
+CompiledPlan = collections.namedtuple(
+    "CompiledPlan",
+    ["name", "duration", "interval", "first_column", "schedule", "overrun", "batch_mode", "log_format",
+     "timing_columns", "window_columns", "setup", "loop", "header", "row_prefix", "limits"])
+
+
+def _number(container, key, default, where):
+    value = container.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+        raise PlanError(f"{where}: \"{key}\" must be a non-negative number, got {value!r}")
+    return value
+
+
+def _choice(container, key, default, choices, where):
+    value = container.get(key, default)
+    if value not in choices:
+        raise PlanError(f"{where}: \"{key}\" must be one of {', '.join(map(str, choices))}, got {value!r}")
+    return value
+
+
+def _limits(command, where):
+    """
+    A command's "limits": {"low": x, "high": y}, either bound optional.
+    """
+    limits = command["limits"]
+    if not isinstance(limits, dict) or not limits.keys() <= {"low", "high"}:
+        raise PlanError(f"{where}: \"limits\" must be an object with \"low\" and/or \"high\"")
+    for key, value in limits.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise PlanError(f"{where}: \"limits\" {key} must be a number, got {value!r}")
+    return types.MappingProxyType(dict(limits))
+
+
+def _row_prefix(first_column):
+    """
+    First cell(s) of a log row for the firstCol setting.
+    """
+    if first_column == "Timestamp":
+        return lambda index: [time.strftime('%H:%M:%S')]
+    if first_column == "Both":
+        return lambda index: [index, time.strftime('%H:%M:%S')]
+    return lambda index: [index]
+
+
+def is_batchable_query(command):
+    """
+    True for periodic queries without a wait that may share a round trip with their neighbours.
+    """
+    return ("?" in command.get("command", "")
+            and not command.get("binary", False)
+            and not command.get("runOnce", False)
+            and command.get("waitAfter", 0) <= 0)
+
+
+def compile_plan(test_data):
+    """
+    Validate a test plan once and turn it into an immutable CompiledPlan.
+    Raises PlanError naming the first problem found.
+    """
+    if not isinstance(test_data, dict):
+        raise PlanError("Test plan must be a JSON object")
+    commands = test_data.get("commands", [])
+    if not isinstance(commands, list):
+        raise PlanError("\"commands\" must be a list")
+
+    first_column = _choice(test_data, "firstCol", "Index", tuple(FIRST_COLUMNS), "plan")
+    schedule = _choice(test_data, "schedule", "interval", SCHEDULES, "plan")
+    overrun = _choice(test_data, "overrun", "skip", OVERRUN_POLICIES, "plan")
+    batch_mode = _choice(test_data, "batch", None, BATCH_MODES, "plan")
+    log_format = _choice(test_data, "logFormat", "csv", tuple(LOG_FORMATS), "plan")
+    duration = _number(test_data, "duration", 0, "plan") * 60  # Convert duration from minutes to seconds
+    interval = _number(test_data, "interval", 0, "plan") / 1000.0  # Convert interval from ms to seconds
+    for key in ("timeout", "retries", "retryBackoff", "maxBackoff"):
+        if key in test_data:
+            _number(test_data, key, 0, "plan")
+    stream = test_data.get("stream", {})
+    if not isinstance(stream, dict):
+        raise PlanError("\"stream\" must be an object")
+    rate = stream.get("rate", 4)
+    if isinstance(rate, bool) or not isinstance(rate, (int, float)) or rate <= 0:
+        raise PlanError(f"stream: \"rate\" must be a positive number of updates per second, got {rate!r}")
+    max_batch = stream.get("maxBatch", 1000)
+    if isinstance(max_batch, bool) or not isinstance(max_batch, int) or max_batch < 1:
+        raise PlanError(f"stream: \"maxBatch\" must be a positive integer, got {max_batch!r}")
+    default_reduce = test_data.get("reduce")
+
+    setup = []
+    loop = []
+    limits = {}  # command text -> limits, for the post-run summary
+    for position, command in enumerate(commands):
+        where = f"command {position + 1}"
+        if not isinstance(command, dict):
+            raise PlanError(f"{where} must be an object")
+        text = command.get("command")
+        if not isinstance(text, str) or not text.strip():
+            raise PlanError(f"{where}: \"command\" must be a non-empty string")
+        wait_after = _number(command, "waitAfter", 0, where) / 1000.0  # Convert ms to seconds
+        if "timeout" in command:
+            _number(command, "timeout", 0, where)
+        if "limits" in command:
+            limits[text] = _limits(command, where)
+        reduce = command.get("reduce", default_reduce)
+        if reduce is not None and not isinstance(reduce, dict):
+            raise PlanError(f"{where}: \"reduce\" must be an object")
+        compiled = CompiledCommand(
+            text=text,
+            is_query="?" in text,
+            wait_after=wait_after,
+            binary=bool(command.get("binary", False)),
+            dtype=command.get("dtype", "B"),
+            byteorder=_choice(command, "byteorder", "big", BYTE_ORDERS, where),
+            preamble=command.get("preamble"),
+            reduce=types.MappingProxyType(dict(reduce)) if reduce else None,
+            spec=types.MappingProxyType(dict(command)),
+            batch_size=0,
+        )
+        (setup if command.get("runOnce", False) else loop).append((compiled, command))
+
+    if batch_mode:
+        # mark the first command of every run of two or more batchable queries
+        position = 0
+        while position < len(loop):
+            size = 0
+            while position + size < len(loop) and is_batchable_query(loop[position + size][1]):
+                size += 1
+            if size > 1:
+                loop[position] = (loop[position][0]._replace(batch_size=size), loop[position][1])
+            position += max(size, 1)
+
+    window_columns = any(compiled.reduce and compiled.reduce.get("window") for compiled, _ in setup + loop)
+    timing_columns = bool(test_data.get("timingColumns", False))
+    header = (FIRST_COLUMNS[first_column]
+              + (['Intended', 'Actual'] if schedule == "deadline" and interval > 0 else [])
+              + ['Command', 'Response']
+              + (TIMING_COLUMNS if timing_columns else [])
+              + [ERROR_COLUMN]
+              + (WINDOW_COLUMNS if window_columns else []))
+
+    return CompiledPlan(
+        name=test_data.get("name", "unnamed_test"),
+        duration=duration,
+        interval=interval,
+        first_column=first_column,
+        schedule=schedule,
+        overrun=overrun,
+        batch_mode=batch_mode,
+        log_format=log_format,
+        timing_columns=timing_columns,
+        window_columns=window_columns,
+        setup=tuple(compiled for compiled, _ in setup),
+        loop=tuple(compiled for compiled, _ in loop),
+        header=tuple(header),
+        row_prefix=_row_prefix(first_column),
+        limits=types.MappingProxyType(limits),
+    )
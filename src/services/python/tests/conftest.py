@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+# the service modules are flat scripts next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import load_api  # noqa: E402
+from sim_instrument import SimulatedInstrument  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def api():
+    """
+    vxi11-api.py loaded as a module; its pooled sessions are closed at the end.
+    """
+    module = load_api()
+    yield module
+    module.session_pool.close_all()
+
+
+@pytest.fixture
+def instrument():
+    """
+    Starts SimulatedInstruments with the given options and closes them after the test.
+    """
+    started = []
+
+    def start(**options):
+        options.setdefault("seed", 1)
+        simulator = SimulatedInstrument(**options).start()
+        started.append(simulator)
+        return simulator
+
+    yield start
+    for simulator in started:
+        simulator.close()
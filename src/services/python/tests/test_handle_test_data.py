@@ -0,0 +1,74 @@
+import csv
+import threading
+
+import pytest
+
+from checkpoints import load_checkpoint
+
+
+def read_log(path):
+    with open(path, newline="") as file:
+        rows = list(csv.reader(file))
+    return rows[0], rows[1:]
+
+
+def run_test(api, address, output_dir, plan, **options):
+    options.setdefault("on_status", lambda status: None)
+    return api.handle_test_data(plan, address, str(output_dir), **options)
+
+
+@pytest.mark.parametrize("error_rate", [0.0, 1.0])
+def test_rows_are_full_width(api, instrument, tmp_path, error_rate):
+    simulator = instrument(error_rate=error_rate, error_mode="garbage")
+    plan = {
+        "name": "width", "duration": 0.005, "interval": 50, "schedule": "deadline", "timingColumns": True,
+        "commands": [{"command": "MEAS:VOLT?"}, {"command": "MEAS:CURR?", "reduce": {"window": 2}}],
+    }
+    result = run_test(api, simulator.address, tmp_path, plan, test_id="width")
+    header, rows = read_log(result["log_file_path"])
+    assert header[-4:] == ["Error", "Min", "Max", "Samples"]
+    assert rows
+    for row in rows:
+        assert len(row) == len(header)
+        error = row[header.index("Error")]
+        if error_rate:
+            # the failed command and its error, in their own columns
+            assert row[header.index("Command")] in ("MEAS:VOLT?", "MEAS:CURR?")
+            assert row[header.index("Response")] == ""
+            assert error.startswith("bad_reply: ")
+            assert row[header.index("Actual")] != ""
+        else:
+            assert error == ""
+            float(row[header.index("Response")])
+
+
+def test_resume_from_checkpoint(api, instrument, tmp_path):
+    simulator = instrument()
+    plan = {
+        "name": "resume", "duration": 0.015, "interval": 50, "checkpointInterval": 0.1,
+        "commands": [{"command": "*RST", "runOnce": True}, {"command": "MEAS:VOLT?"},
+                     {"command": "MEAS:CURR?", "reduce": {"window": 3}}],
+    }
+    stop_event = threading.Event()
+    threading.Timer(0.3, stop_event.set).start()
+    first = run_test(api, simulator.address, tmp_path, plan, test_id="resume", stop_event=stop_event)
+    assert first["status"] == "stopped"
+
+    state = load_checkpoint(str(tmp_path), "resume")
+    assert state["status"] == "stopped"
+    assert state["setup_done"] == 1
+    second = run_test(api, simulator.address, tmp_path, state["plan"], test_id="resume", resume=state)
+    assert second["status"] == "success"
+    assert second["log_file_path"] == first["log_file_path"]
+    with pytest.raises(ValueError):
+        load_checkpoint(str(tmp_path), "resume")
+
+    header, rows = read_log(second["log_file_path"])
+    assert header[0] == "Index"
+    assert "Index" not in (row[0] for row in rows)
+    index = [int(row[0]) for row in rows]
+    assert index == sorted(index)
+    # every plain sample is logged once, the index carrying on across the resume
+    volts = [int(row[0]) for row in rows if row[1] == "MEAS:VOLT?"]
+    assert len(volts) > 6
+    assert volts == list(range(0, 2 * len(volts), 2))
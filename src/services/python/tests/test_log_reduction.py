@@ -0,0 +1,78 @@
+from log_reduction import ResponseReducer
+
+# rows laid out as Index, Command, Response, Error
+RESPONSE = 2
+
+
+def feed(reducer, values, start=0):
+    rows = []
+    for index, value in enumerate(values, start):
+        rows += reducer.feed([index, "MEAS?", str(value), ""], str(value))
+    return rows
+
+
+def indexes(rows):
+    return [row[0] for row in rows]
+
+
+def test_deadband():
+    reducer = ResponseReducer({"deadband": 0.5}, RESPONSE)
+    rows = feed(reducer, [1.0, 1.2, 1.4, 1.6, 1.7, 0.9])
+    assert [row[RESPONSE] for row in rows] == ["1.0", "1.6", "0.9"]
+    assert reducer.stats() == {"rows_in": 6, "rows_out": 3, "triggers": 0}
+
+
+def test_change_only_text():
+    reducer = ResponseReducer({"changeOnly": True}, RESPONSE)
+    rows = feed(reducer, ["ON", "ON", "OFF", "OFF", "ON"])
+    assert indexes(rows) == [0, 2, 4]
+
+
+def test_window():
+    reducer = ResponseReducer({"window": 3}, RESPONSE, window_columns=True)
+    rows = feed(reducer, [1, 2, 6, 4, 4, 4, 7])
+    # one row per window, stamped with its last sample
+    assert rows == [[2, "MEAS?", "3", "", "1", "6", 3], [5, "MEAS?", "4", "", "4", "4", 3]]
+    assert reducer.flush([9]) == [[9, "MEAS?", "7", "", "7", "7", 1]]
+    assert reducer.flush() == []
+
+
+def test_window_with_deadband():
+    reducer = ResponseReducer({"window": 2, "deadband": 1}, RESPONSE, window_columns=True)
+    rows = feed(reducer, [1, 1, 1.5, 1.5, 3, 3])
+    assert [row[RESPONSE] for row in rows] == ["1", "3"]
+
+
+def test_trigger_only_logs_triggered_stretches():
+    reducer = ResponseReducer({"trigger": {"above": 5, "pre": 1, "post": 1}}, RESPONSE)
+    rows = feed(reducer, [1, 2, 3, 7, 8, 2, 1, 1, 9, 1])
+    # pre sample, triggered samples, post sample; nothing in between
+    assert indexes(rows) == [2, 3, 4, 5, 7, 8, 9]
+    assert reducer.stats()["triggers"] == 2
+
+
+def test_trigger_below():
+    reducer = ResponseReducer({"deadband": 10, "trigger": {"below": 0}}, RESPONSE)
+    rows = feed(reducer, [1, 2, -1, 3])
+    assert indexes(rows) == [0, 2]
+
+
+def test_trigger_closes_window():
+    reducer = ResponseReducer({"window": 3, "trigger": {"above": 5}}, RESPONSE, window_columns=True)
+    rows = feed(reducer, [1, 2, 3, 4, 7, 1])
+    assert rows == [
+        [2, "MEAS?", "2", "", "1", "3", 3],
+        # the partial window takes the index of the sample that closed it
+        [4, "MEAS?", "4", "", "4", "4", 1],
+        [4, "MEAS?", "7", "", "", "", ""],
+    ]
+
+
+def test_state_round_trip():
+    options = {"window": 3, "trigger": {"above": 5, "pre": 2}}
+    reducer = ResponseReducer(options, RESPONSE, window_columns=True)
+    feed(reducer, [1, 2, 3, 4])
+    resumed = ResponseReducer(options, RESPONSE, window_columns=True)
+    resumed.restore(reducer.state())
+    assert feed(resumed, [5, 6], 4) == feed(reducer, [5, 6], 4)
+    assert resumed.stats() == reducer.stats()
@@ -0,0 +1,100 @@
+import struct
+
+import pytest
+
+from scpi_block import BlockFormatError, parse_block_header, parse_preamble, read_block, scale_samples
+from scpi_transports import TransportSession
+
+
+class ChunkedReader:
+    """
+    Hands data out at most size bytes per read_into(), like a socket would.
+    """
+
+    def __init__(self, data, size=3):
+        self.data = data
+        self.size = size
+
+    def read_into(self, view):
+        count = min(len(view), self.size, len(self.data))
+        view[:count] = self.data[:count]
+        self.data = self.data[count:]
+        return count
+
+
+def test_read_block():
+    reader = ChunkedReader(b"#210" + bytes(range(10)) + b"\n")
+    assert bytes(read_block(reader)) == bytes(range(10))
+    assert reader.data == b""
+
+
+def test_read_block_reuses_buffer():
+    buffer = bytearray(64)
+    payload = read_block(ChunkedReader(b"#15abcde\n"), buffer)
+    assert bytes(payload) == b"abcde"
+    assert payload.obj is buffer
+    # a buffer that is too small is replaced
+    payload = read_block(ChunkedReader(b"#15abcde\n"), bytearray(2))
+    assert bytes(payload) == b"abcde"
+
+
+def test_read_block_without_terminator():
+    reader = ChunkedReader(b"#13abc*IDN")
+    assert bytes(read_block(reader, terminator=False)) == b"abc"
+    assert reader.data == b"*IDN"
+
+
+@pytest.mark.parametrize("data", [
+    b"1.5\n",          # not a block
+    b"#0abc\n",        # indefinite length
+    b"#3",             # header cut short
+    b"#210abc",        # payload cut short
+])
+def test_read_block_rejects(data):
+    with pytest.raises(BlockFormatError):
+        read_block(ChunkedReader(data))
+
+
+def test_parse_block_header():
+    assert parse_block_header(b"#41000") == 1000
+    with pytest.raises(BlockFormatError):
+        parse_block_header(b"#4100")
+
+
+@pytest.mark.parametrize("protocol", ["raw", "hislip"])
+def test_read_block_from_instrument(instrument, protocol):
+    simulator = instrument(protocol=protocol, block_size=200000)
+    session = TransportSession(simulator.address)
+    try:
+        session.write(":WAV:DATA?")
+        assert len(read_block(session)) == 200000
+        # the terminator was consumed with the block
+        assert session.query("*OPC?") == "1"
+    finally:
+        session.close()
+
+
+def test_parse_preamble():
+    preamble = parse_preamble("+0,+1,+1000,+1,+2.0E-06,-1.0E-03,+0,+4.0E-02,+1.5E-01,+128\n")
+    assert preamble == {
+        "points": 1000,
+        "x_increment": 2.0e-06,
+        "x_origin": -1.0e-03,
+        "x_reference": 0.0,
+        "y_increment": 4.0e-02,
+        "y_origin": 1.5e-01,
+        "y_reference": 128.0,
+    }
+    with pytest.raises(BlockFormatError):
+        parse_preamble("+0,+1,+1000")
+
+
+def test_scale_samples_byteorder():
+    payload = struct.pack(">2H", 0x0102, 0x0010)
+    assert [int(value) for value in scale_samples(payload, "H")] == [0x0102, 0x0010]
+    assert [int(value) for value in scale_samples(payload, "H", byteorder="little")] == [0x0201, 0x1000]
+
+
+def test_scale_samples_preamble():
+    preamble = {"y_reference": 128.0, "y_increment": 0.5, "y_origin": 1.0}
+    assert [float(value) for value in scale_samples(bytes([128, 130, 126]), "B", preamble)] == [1.0, 2.0, 0.0]
@@ -7,8 +7,6 @@ import time
 import csv
 import threading
 import pyvisa
-# Dictionary to keep track of active test threads
-active_tests = {}
 # Load the shared library
 # Get the directory of the current script
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -194,49 +192,6 @@ def handle_test_data(test_data, device_ip,output_dir):
             "message": str(e)
         }
 
-def handle_test_thread(test_data, device_ip):
-    """
-    Runs a test in a separate thread.
-    """
-    test_id = test_data.get("name", "unnamed_test") + "_" + str(uuid.uuid4())
-    result = handle_test_data(test_data, device_ip)
-    
-    # Remove the test from active tests after completion
-    if test_id in active_tests:
-        del active_tests[test_id]
-
-    print(f"Test {test_id} completed with result: {result}")
-
-
-def start_test(test_data, device_ip):
-    """
-    Starts a new test in a separate thread.
-    """
-    test_id = test_data.get("name", "unnamed_test") + "_" + str(uuid.uuid4())
-    
-    # Create and start a new thread for the test
-    test_thread = threading.Thread(target=handle_test_thread, args=(test_data, device_ip))
-    test_thread.daemon = True  # Ensures the thread will not block program exit
-    active_tests[test_id] = test_thread
-    test_thread.start()
-
-    return {
-        "status": "success",
-        "test_id": test_id,
-        "message": f"Test {test_id} started successfully"
-    }
-def stop_test(test_id):
-    """
-    Stops the test with the given test_id.
-    """
-    if test_id in active_tests:
-        # Attempt to stop the thread (requires cooperative cancellation in the thread logic)
-        thread = active_tests[test_id]
-        # Implement your cancellation logic here
-        return {"status": "success", "message": f"Test {test_id} stopped successfully"}
-    else:
-        return {"status": "error", "message": f"Test {test_id} not found"}
-
 if __name__ == "__main__":
     try:
         if "--ip" in sys.argv and "--command" in sys.argv:
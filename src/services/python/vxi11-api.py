@@ -1,108 +1,315 @@
-import vxi11
-import uuid
 import os
 import json
 import sys
 import time
-import csv
 import threading
-import pyvisa
-import uuid
-import pyvisa
+import atexit
+# Only what a one-shot --ip/--command needs is imported here. Test, log, discovery
+# and VISA modules are imported by the functions that use them, so a command to a
+# raw socket or HiSLIP instrument starts without loading pyvisa, numpy or asyncio.
+from scpi_sessions import SessionPool
+from scpi_transports import NativeTransports
+from scpi_timing import PhaseTimer, ScpiError, TimingStats, classify_error
+from scpi_timeouts import DEFAULT_TIMEOUT_MS, ResponseTimes, TimeoutPolicy
 
-def scan_lxi_devices(subnet=None):
+# Upper bound on tests running at once in server mode; the rest wait queued
+MAX_CONCURRENT_TESTS = 32
+
+# Instrument sessions stay open between commands and are closed on exit.
+# Raw socket (::SOCKET) and HiSLIP (::hislipN::INSTR) addresses use the native
+# asyncio transports, whatever the backend; the backend serves the rest.
+session_pool = SessionPool(transports=NativeTransports())
+atexit.register(session_pool.close_all)
+
+# Rescans within this many seconds reuse earlier *IDN? replies
+IDN_CACHE_TTL = 300
+idn_cache = None  # created by the first scan
+
+# Recent response times per (device, command), used by adaptive timeouts
+response_times = ResponseTimes()
+
+# Library that talks to the instruments: "pyvisa", or "liblxi" for the lighter native
+# VXI-11/raw socket client. Chosen with --backend, SLATE_SCPI_BACKEND or the set_backend call.
+SCPI_BACKENDS = ("pyvisa", "liblxi")
+
+def select_backend(name):
+    """
+    Route every session of session_pool through the named backend.
+    liblxi reaches raw sockets itself, so only HiSLIP (which it does not
+    speak) stays on the native transports.
+    """
+    if name == "liblxi":
+        from liblxi_backend import LxiResourceManager
+        session_pool.use(LxiResourceManager(), NativeTransports(("hislip",)))
+    elif name == "pyvisa":
+        session_pool.use(None, NativeTransports())
+    else:
+        raise ValueError(f"Unknown SCPI backend: {name} (expected one of {', '.join(SCPI_BACKENDS)})")
+    return name
+
+def probe_idn(address, timeout_ms=2000):
+    """
+    Open a short-lived session to address and return its *IDN? reply.
+    """
+    instrument = session_pool.open(address, open_timeout=timeout_ms)
+    try:
+        instrument.timeout = timeout_ms
+        return instrument.query("*IDN?")
+    finally:
+        instrument.close()
+
+def scan_lxi_devices(subnet=None, on_device=None, timeout_ms=2000):
     """
     Scan for LXI devices using PyVISA and return a list of devices
     with id, name, address, type, and isConnected.
+    Known VISA resources and, when subnet is given, hosts answering a VXI-11
+    portmapper sweep are probed in parallel, each with its own timeout.
+    on_device is called for every device as soon as it is identified.
+    *IDN? results are cached for IDN_CACHE_TTL seconds.
+    An invalid or too large subnet raises ValueError before anything is probed.
     """
-    # Initialize Resource Manager
-    rm = pyvisa.ResourceManager()
-    
-    devices = []
+    global idn_cache
+    from lxi_discovery import IdnCache, discover_devices, subnet_hosts
+
+    if subnet:
+        subnet_hosts(subnet)
+    if idn_cache is None:
+        idn_cache = IdnCache(IDN_CACHE_TTL)
     try:
-        # List available resources
-        resources = rm.list_resources()
-        
-        
-        try:
-            device_list = [res for res in resources if "TCPIP" in res or "USB" in res]
-            if device_list:
-                for device_found in device_list:
-                    # Open a session to the resource
-                    instrument = rm.open_resource(device_found)
-                    # Query the instrument for identification
-                    response = instrument.query("*IDN?")
-                    instrument.close()
-                    # Parse the IDN response
-                    idn_parts = response.split(",")
-                    device_name = idn_parts[1] if len(idn_parts) > 1 else "Unknown"
-
-                    # Add device to the list
-                    devices.append({
-                        "id": str(uuid.uuid4()),
-                        "name": device_name,
-                        "address": device_found,
-                        "type": "Unknown",  # Type determination could be added here if needed
-                        "isConnected": False  # Assume devices are not connected for now
-                    })
-        except Exception as e:
-            # Add a placeholder for devices that failed to respond
-            devices.append({
-                "id": str(uuid.uuid4()),
-                "name": "Unknown",
-                "address": resource,
-                "type": "Error",
-                "isConnected": False,
-                "error": str(e)
-            })
+        resources = [res for res in session_pool.resource_manager().list_resources()
+                     if "TCPIP" in res or "USB" in res]
     except Exception as e:
-        print(f"Error while scanning devices: {e}")
+        print(f"Error while listing VISA resources: {e}", file=sys.stderr)
+        resources = []
 
-    return devices
+    try:
+        return discover_devices(resources, lambda address: probe_idn(address, timeout_ms),
+                                subnet=subnet, cache=idn_cache, on_device=on_device)
+    except Exception as e:
+        print(f"Error while scanning devices: {e}", file=sys.stderr)
+        return []
 
 
-def send_scpi_command( device_address, command):
+def send_scpi_command( device_address, command, timer=None, timeout_ms=DEFAULT_TIMEOUT_MS):
     """
     Send an SCPI command to the device at the given address.
     Returns the response from the device.
+    The session is taken from session_pool and left open for the next call.
     """
-    response = "NA"
     try:
-        rm = pyvisa.ResourceManager()
-        dev = rm.open_resource(device_address)
+        return query_scpi(device_address, command, timer, timeout_ms)
+    except ScpiError:
+        return "No response"
+
+def query_scpi(device_address, command, timer=None, timeout_ms=DEFAULT_TIMEOUT_MS):
+    """
+    Same as send_scpi_command() but failures raise ScpiError, whose kind tells
+    timeouts, refused or lost connections and bad replies apart.
+    The connect, write and read phases are timed into timer (a PhaseTimer).
+    The pool does not retry: a failed command is not sent again unless the
+    caller's TimeoutPolicy says so (idle sessions are still probed before reuse).
+    """
+    if timer is None:
+        timer = PhaseTimer()
+
+    def run(dev):
+        dev.timeout = timeout_ms
         # check if the scpi command is a command or query
         if "?" in command:
-            # send query with long timeout so it has time to respond
-            dev.timeout = 25000
-            response = dev.query(command)
-        else:
-            # commands dont need a response
+            with timer.phase("write"):
+                dev.write(command)
+            with timer.phase("read"):
+                return dev.read()
+        # commands dont need a response
+        with timer.phase("write"):
             dev.write(command)
-        dev.close()
-        return response
+        return "NA"
+
+    try:
+        return session_pool.execute(device_address, run, retries=0, timer=timer)
     except Exception as e:
-        return "No response"
+        raise ScpiError(classify_error(e), str(e), timer.failed_phase) from e
 
-def handle_test_data(test_data, device_ip,output_dir):
+def acquire_waveform(device_address, command, dtype="B", preamble_query=None, buffers=None, timer=None,
+                     timeout_ms=DEFAULT_TIMEOUT_MS, byteorder="big"):
+    """
+    Fetch a binary block waveform (e.g. CURV? or :WAV:DATA?) and return its samples.
+    The block is read straight into a preallocated buffer; pass the same `buffers`
+    dict on every call to reuse it. With preamble_query the samples are scaled
+    to physical units in one vectorized step. byteorder is that of multi-byte
+    samples ("big", the IEEE 488.2 default, or "little").
+    Failures raise ScpiError; phases are timed into timer when given.
+    """
+    from scpi_block import VisaBlockReader, parse_preamble, read_block, scale_samples
+
+    if timer is None:
+        timer = PhaseTimer()
+
+    def run(dev):
+        dev.timeout = timeout_ms
+        preamble = None
+        if preamble_query:
+            with timer.phase("write"):
+                dev.write(preamble_query)
+            with timer.phase("read"):
+                preamble_text = dev.read()
+            with timer.phase("parse"):
+                preamble = parse_preamble(preamble_text)
+        with timer.phase("write"):
+            dev.write(command)
+        buffer = buffers.get(command) if buffers is not None else None
+        with timer.phase("read"):
+            # liblxi sessions read blocks themselves, pyvisa ones through the VISA library
+            payload = read_block(dev if hasattr(dev, "read_into") else VisaBlockReader(dev), buffer)
+        if buffers is not None:
+            buffers[command] = payload.obj
+        with timer.phase("parse"):
+            return scale_samples(payload, dtype, preamble, byteorder)
+
+    try:
+        return session_pool.execute(device_address, run, retries=0, timer=timer)
+    except Exception as e:
+        raise ScpiError(classify_error(e), str(e), timer.failed_phase) from e
+
+def join_scpi_queries(queries):
+    """
+    Join queries into one compound SCPI message.
+    Later queries get a leading ':' so each is parsed from the root of the command tree.
+    """
+    parts = [queries[0]]
+    for query in queries[1:]:
+        query = query.strip()
+        parts.append(query if query.startswith((":", "*")) else ":" + query)
+    return ";".join(parts)
+
+def send_scpi_batch(device_address, queries, mode="join", timer=None, timeout_ms=DEFAULT_TIMEOUT_MS):
+    """
+    Send several queries in as few round trips as possible and return one response per query.
+    mode "join" sends a single ';'-separated message and splits the reply,
+    mode "pipeline" writes every query before reading the replies back
+    (only for instruments that queue more than one response).
+    """
+    try:
+        return query_scpi_batch(device_address, queries, mode, timer, timeout_ms)
+    except ScpiError:
+        return ["No response"] * len(queries)
+
+def query_scpi_batch(device_address, queries, mode="join", timer=None, timeout_ms=DEFAULT_TIMEOUT_MS):
+    """
+    Same as send_scpi_batch() but failures raise ScpiError; phases are timed into timer.
+    """
+    if timer is None:
+        timer = PhaseTimer()
+
+    def run(dev):
+        dev.timeout = timeout_ms
+        if mode == "pipeline":
+            with timer.phase("write"):
+                for query in queries:
+                    dev.write(query)
+            with timer.phase("read"):
+                return [dev.read() for _ in queries]
+        with timer.phase("write"):
+            dev.write(join_scpi_queries(queries))
+        with timer.phase("read"):
+            reply = dev.read()
+        with timer.phase("parse"):
+            responses = reply.strip().split(";")
+        if len(responses) != len(queries):
+            # reply could not be split unambiguously, ask one by one
+            return [dev.query(query) for query in queries]
+        return responses
+
+    try:
+        return session_pool.execute(device_address, run, retries=0, timer=timer)
+    except Exception as e:
+        raise ScpiError(classify_error(e), str(e), timer.failed_phase) from e
+
+def test_log_path(test_data, test_id, output_dir):
+    """
+    Path of the log handle_test_data() writes for this test (.csv, or .arrow for columnar logs).
+    """
+    from log_sinks import LOG_FORMATS
+
+    test_name = test_data.get("name", "unnamed_test").replace(" ", "_")
+    _, extension = LOG_FORMATS.get(test_data.get("logFormat", "csv"), LOG_FORMATS["csv"])
+    return os.path.join(output_dir, f"{test_name}_{test_id}{extension}")
+
+def handle_test_data(test_data, device_ip,output_dir, test_id=None, stop_event=None, on_status=None,
+                     on_samples=None, resume=None):
     """
     Handles the test data, executes commands, creates a CSV log, and returns a JSON response.
     !!!!!!  print statements are used to send messages to the Electron app via stdout. !!!!!!!
+    stop_event (threading.Event) ends the test early when set.
+    on_status receives the initial "running" status instead of it being printed.
+    With "schedule": "deadline" each pass starts on a fixed-rate tick and every row
+    records its Intended and Actual time in seconds since the start of the test.
+    With "batch": "join" or "pipeline" consecutive periodic queries share one round trip.
+    Commands with "binary": true (optional "dtype", "byteorder", "preamble") are read as IEEE 488.2
+    blocks, saved next to the log, and the saved file name is logged as the response.
+    "logFormat": "arrow" writes a typed columnar log instead of CSV (see log_sinks.py).
+    Rows are written by a background writer; "logWriter" sets its flush policy.
+    on_samples(batch) receives the logged samples live, batched by SampleStream at most
+    "stream": {"rate": updates per second, "maxBatch": samples per update} times a second.
+    Connect/write/read/parse/log times are summarised in the result's "timing";
+    "timingColumns": true also logs them per row. Failed commands are logged as full
+    rows with an empty Response and their error kind (timeout, refused,
+    connection_lost, bad_reply, ...) and message in the Error column.
+    Timeouts come from the command's "timeout" (ms), the learned response times
+    with "adaptiveTimeout", or the plan's "timeout"; "retries", "retryBackoff" and
+    "maxBackoff" (ms) bound retries of failed commands (see TimeoutPolicy).
+    "reduce" (plan default, or per command) thins the log with a deadband, min/max/mean
+    windows and threshold triggers with pre/post full-rate capture (see ResponseReducer).
+    "transforms" cleans columns with precompiled regex rules as rows are logged and
+    can extract numbers into typed columns (see ColumnTransform).
+    CSV logs get a sidecar index for fast row/time range reads unless "index" is false.
+    When the test ends the log is read once more into per-command statistics saved
+    next to it (see log_analytics); commands may set "limits": {"low", "high"} to
+    count out-of-limit samples, and "summary": false skips this or
+    {"percentiles": [...]} picks the percentiles.
+    CSV logs are checkpointed every "checkpointInterval" seconds (default 60) next to
+    the log; resume (a checkpoint from load_checkpoint()) continues that test, appending
+    to its log from the checkpointed offset with the index and elapsed time carried on.
     """
+    import uuid
+    from checkpoints import DEFAULT_CHECKPOINT_INTERVAL, checkpoint_path, truncate_log, write_checkpoint
+    from column_transforms import ColumnTransform
+    from log_analytics import DEFAULT_PERCENTILES, summarize_log, summary_path
+    from log_index import discard_index
+    from log_reduction import ResponseReducer
+    from log_sinks import open_log_sink
+    from sample_clock import SampleClock
+    from sample_stream import SampleStream
+    from scpi_block import save_samples
+    from test_plan import PlanError, compile_plan
+
     # Generate a unique test ID (if needed)
-    test_id = f"{str(uuid.uuid4())[:8]}"
+    if test_id is None:
+        test_id = f"{str(uuid.uuid4())[:8]}"
+    if stop_event is None:
+        stop_event = threading.Event()
+    sample_stream = None
+    try:
+        # Validate once and resolve everything the loop needs before touching the instrument
+        plan = compile_plan(test_data)
+    except PlanError as e:
+        return {"status": "error", "message": str(e)}
 
     sys.stdout.flush()  # Ensure the output is sent to the Electron app
-    timestamp = int(time.time())
-    test_name = test_data.get("name", "unnamed_test").replace(" ", "_")
-    duration = test_data.get("duration", 0) * 60  # Convert duration from minutes to seconds
-    interval = test_data.get("interval", 0) / 1000.0  # Convert interval from ms to seconds
-    commands = test_data.get("commands", [])
-    first_column = test_data.get("firstCol", "Index")
-    debugCount = 1
+    duration = plan.duration
+    interval = plan.interval
+    timing_stats = TimingStats()
+    timer = PhaseTimer()
+    timeout_policy = TimeoutPolicy.from_plan(test_data, response_times)
+    sample_clock = None
+    if plan.schedule == "deadline" and interval > 0:
+        sample_clock = SampleClock(interval, overrun=plan.overrun)
     
     # Generate a unique CSV file for logging
-    file_name = f"{test_name}_{test_id}.csv"
-    csv_file_path = os.path.join(output_dir, file_name)
+    csv_file_path = resume["log_file_path"] if resume else test_log_path(test_data, test_id, output_dir)
+    if resume and plan.log_format != "csv":
+        return {"status": "error", "message": "Only CSV logs can be resumed"}
+    waveform_base = os.path.splitext(csv_file_path)[0]
 
     # Immediately send a response indicating that the test has started
     test_statusu = {
@@ -110,87 +317,466 @@ def handle_test_data(test_data, device_ip,output_dir):
             "test_id": test_id,
             "log_file_path": str(csv_file_path)
         }
-    print(json.dumps(test_statusu)) 
-    sys.stdout.flush()  # Ensure the output is sent to the Electron app
+    if on_status is not None:
+        on_status(test_statusu)
+    else:
+        print(json.dumps(test_statusu)) 
+        sys.stdout.flush()  # Ensure the output is sent to the Electron app
+    session_pool.acquire(device_ip)
     try:
-        with open(csv_file_path, mode='w', newline='',buffering=1) as csv_file:
-            csv_writer = csv.writer(csv_file)
-            if first_column == "Timestamp":
-                csv_writer.writerow(['Timestamp', 'Command', 'Response'])
-            if first_column == "Index":
-                csv_writer.writerow(['Index', 'Command', 'Response'])
-            if first_column == "Both":
-                csv_writer.writerow(['Index', 'Timestamp', 'Command', 'Response'])
-
-            # Start test execution
-            start_time = time.time()
-            command_status = {}
-            indexCount = 0
-            newListLoopCommands = []
-            while time.time() - start_time < duration:
-               
-                for command in commands:
-                    cmd_text = command.get("command", "")
-                    run_once = command.get("runOnce", False)
-                    wait_after = command.get("waitAfter", 0) / 1000.0  # Convert ms to seconds
-                    
-                    print(f"Print 1 : RunOnce= {run_once} command = {cmd_text}");
-                    try:
-                        # Send SCPI command
-                        response = send_scpi_command(device_ip, cmd_text)
-                        if run_once:
-                            commands.remove(command)
-                        # skip commands that are not queries because they have no response
-                        if "?" not in cmd_text:
-                            continue
-                        if first_column == "Timestamp":
-                            csv_writer.writerow([time.strftime('%H:%M:%S'), cmd_text, response])
-                        if first_column == "Index":
-                            csv_writer.writerow([ indexCount , cmd_text, response])
-                        if first_column == "Both":
-                            csv_writer.writerow([indexCount,time.strftime('%H:%M:%S'), cmd_text, response])
-                       
-                        command_status[cmd_text] = True  # Mark as executed
-                    except Exception as e:
-                        # Log errors to the CSV
-                        csv_writer.writerow([time.strftime('%Y-%m-%d %H:%M:%S'), cmd_text, str(e)])
-
-                    #Wait after the command execution
-                    if wait_after > 0:
-                        time.sleep(wait_after) 
-    
+        if on_samples is not None:
+            stream_options = test_data.get("stream", {})
+            sample_stream = SampleStream(on_samples, test_id, stream_options.get("rate", 4),
+                                         stream_options.get("maxBatch", 1000))
+        log_metadata = {"test_name": plan.name, "test_id": test_id,
+                        "device": device_ip, "plan": test_data}
+        if resume:
+            # drop rows written after the checkpoint, they are taken again
+            truncate_log(csv_file_path, resume["log_offset"])
+            discard_index(csv_file_path)
+        transform = ColumnTransform(test_data.get("transforms"), plan.header)
+        with open_log_sink(csv_file_path, plan.log_format, log_metadata, test_data.get("logWriter"),
+                           append=bool(resume), column_types=transform.column_types,
+                           index=test_data.get("index", True)) as csv_writer:
+            if not resume:
+                csv_writer.writerow(transform.header)
+            log_row = (lambda row: csv_writer.writerow(transform.apply(row))) if transform else csv_writer.writerow
+            response_index = plan.header.index('Response')
+            window_padding = ["", "", ""] if plan.window_columns else []
+            reducers = {}  # command text -> ResponseReducer, for commands with "reduce" options
+            if resume:
+                # samples a reducer held back at the checkpoint are already counted in its index
+                for command in plan.setup + plan.loop:
+                    saved = resume.get("reducers", {}).get(command.text)
+                    if command.reduce and saved is not None and command.text not in reducers:
+                        reducers[command.text] = ResponseReducer(command.reduce, response_index, plan.window_columns)
+                        reducers[command.text].restore(saved)
+
+            # Start test execution; a resumed test carries on from the checkpointed time and index
+            elapsed_before = resume["elapsed"] if resume else 0.0
+            start_time = time.time() - elapsed_before
+            indexCount = resume["index"] if resume else 0
+            setup_done = resume["setup_done"] if resume else 0
+            waveform_buffers = {}  # reused block buffers for binary commands
+            checkpoint_file = checkpoint_path(csv_file_path) if plan.log_format == "csv" else None
+            checkpoint_interval = test_data.get("checkpointInterval", DEFAULT_CHECKPOINT_INTERVAL)
+            last_checkpoint = time.monotonic()
+
+            def checkpoint(status="running"):
+                """
+                Record where the test is, including what the reducers hold back.
+                The log writer's thread writes it once every row logged so far
+                is on disk, so the test loop does not wait for the fsyncs.
+                """
+                nonlocal last_checkpoint
+                if checkpoint_file is None:
+                    return
+                state = {
+                    "test_id": test_id,
+                    "device": device_ip,
+                    "plan": test_data,
+                    "log_file_path": csv_file_path,
+                    "status": status,
+                    "elapsed": time.time() - start_time,
+                    "index": indexCount,
+                    "setup_done": setup_done,
+                    "reducers": {text: reducer.state() for text, reducer in reducers.items()},
+                }
+                csv_writer.at_sync_point(lambda offset: write_checkpoint(checkpoint_file, dict(state, log_offset=offset)))
+                last_checkpoint = time.monotonic()
+
+            def run_command(command, timing, batched=None, position=None):
+                """
+                Execute one compiled command and log its response (or the error).
+                """
+                nonlocal indexCount
+                timer.reset()
+                cmd_text = command.text
+                try:
+                    if command.batch_size > 1 and plan.batch_mode:
+                        # Fetch this query and the batchable ones right after it in one go
+                        group = plan.loop[position:position + command.batch_size]
+                        responses = timeout_policy.call(
+                            device_ip, [c.spec for c in group],
+                            lambda timeout: query_scpi_batch(device_ip, [c.text for c in group],
+                                                             plan.batch_mode, timer, timeout),
+                            stop_event)
+                        batched.update(zip(range(position + 1, position + len(group)), responses[1:]))
+                        response = responses[0]
+                    elif batched and position in batched:
+                        response = batched.pop(position)
+                    elif command.binary:
+                        samples = timeout_policy.call(
+                            device_ip, command.spec,
+                            lambda timeout: acquire_waveform(device_ip, cmd_text, command.dtype, command.preamble,
+                                                             waveform_buffers, timer, timeout, command.byteorder),
+                            stop_event, timer)
+                        response = os.path.basename(save_samples(samples, f"{waveform_base}_{indexCount}"))
+                    else:
+                        response = timeout_policy.call(
+                            device_ip, command.spec, lambda timeout: query_scpi(device_ip, cmd_text, timer, timeout),
+                            stop_event, timer)
+                    # commands that are not queries have no response to log
+                    if command.is_query:
+                        phase_values = (timer.columns() if plan.timing_columns else []) + [""]
+                        row = plan.row_prefix(indexCount) + timing + [cmd_text, response] + phase_values
+                        with timer.phase("log"):
+                            if command.reduce:
+                                reducer = reducers.get(cmd_text)
+                                if reducer is None:
+                                    reducer = reducers[cmd_text] = ResponseReducer(
+                                        command.reduce, response_index, plan.window_columns)
+                                for reduced_row in reducer.feed(row, response):
+                                    log_row(reduced_row)
+                            else:
+                                log_row(row + window_padding)
+                        if sample_stream is not None:
+                            sample_stream.publish({"index": indexCount, "time": round(time.time() - start_time, 6),
+                                                   "command": cmd_text, "response": response})
+                        indexCount += 1
+                    timing_stats.add(cmd_text, timer.phases)
+                except Exception as e:
+                    # Log errors to the CSV
+                    kind = classify_error(e)
+                    timing_stats.add_error(cmd_text, kind)
+                    # same layout as a data row so the error lines up with its columns;
+                    # a ScpiError's message already starts with its kind
+                    error = str(e) if isinstance(e, ScpiError) else f"{kind}: {e}"
+                    log_row(plan.row_prefix(indexCount) + timing + [cmd_text, ""]
+                            + (timer.columns() if plan.timing_columns else []) + [error] + window_padding)
                     indexCount += 1
-                                   
+
+                #Wait after the command execution
+                if command.wait_after > 0:
+                    stop_event.wait(command.wait_after)
+
+            # runOnce commands set the instrument up before the periodic loop starts
+            setup_timing = ["", ""] if sample_clock is not None else []
+            for command in plan.setup[setup_done:]:
+                if stop_event.is_set():
+                    break
+                run_command(command, setup_timing)
+                setup_done += 1
+            checkpoint()
+
+            while time.time() - start_time < duration and not stop_event.is_set():
+                timing = []
+                if sample_clock is not None:
+                    # Sleep until the next absolute deadline instead of a fixed gap
+                    tick = sample_clock.wait(stop_event)
+                    if tick is None:
+                        break
+                    intended = f"{elapsed_before + tick[1]:.6f}"
+                batched = {}  # loop position -> response fetched with an earlier command of its group
+                pass_started = time.perf_counter()
+
+                for position, command in enumerate(plan.loop):
+                    if stop_event.is_set():
+                        break
+                    if sample_clock is not None:
+                        timing = [intended, f"{elapsed_before + sample_clock.elapsed():.6f}"]
+                    run_command(command, timing, batched, position)
+                timing_stats.add_iteration(time.perf_counter() - pass_started)
+                if time.monotonic() - last_checkpoint >= checkpoint_interval:
+                    checkpoint()
+
                 #Wait for the specified interval before the next iteration
-                if interval > 0:
-                    time.sleep(interval)
-                debugCount += 1
+                if interval > 0 and sample_clock is None:
+                    stop_event.wait(interval)
+
+            # windows still being averaged when the test ended, stamped with its end
+            end_head = plan.row_prefix(indexCount)
+            if sample_clock is not None:
+                # no tick was waited for when the test was stopped right away
+                end_head += ["", f"{elapsed_before + sample_clock.elapsed():.6f}" if sample_clock.origin is not None else ""]
+            for reducer in reducers.values():
+                for reduced_row in reducer.flush(end_head):
+                    log_row(reduced_row)
 
-            return {
-                "status": "success",
+            result = {
+                "status": "stopped" if stop_event.is_set() else "success",
                 "log_file_path": csv_file_path
             }
+            # a stopped test can be resumed later, a finished one cannot
+            checkpoint(result["status"])
+            if checkpoint_file is not None:
+                result["checkpoint"] = checkpoint_file
+            if sample_clock is not None:
+                # ticks run, late_ticks and skipped_ticks
+                result.update(sample_clock.stats())
+            # per-phase and per-command histograms plus error counts by kind
+            result["timing"] = timing_stats.summary()
+            if reducers:
+                # samples taken, rows logged and trigger events per command
+                result["reduction"] = {text: reducer.stats() for text, reducer in reducers.items()}
+        if hasattr(csv_writer, "stats"):
+            # rows, flushes and backpressure from the background writer
+            result["log_writer"] = csv_writer.stats()
+        summary_options = test_data.get("summary", {})
+        if summary_options is not False:
+            if not isinstance(summary_options, dict):
+                summary_options = {}
+            try:
+                summary = summarize_log(csv_file_path, plan.limits,
+                                        summary_options.get("percentiles", DEFAULT_PERCENTILES))
+                result["summary"] = summary_path(csv_file_path)
+                if plan.limits:
+                    # what pass/fail needs without opening the summary
+                    result["out_of_limits"] = {command: stats.get("limits", {}).get("out_of_limits", 0)
+                                               for command, stats in summary["commands"].items()
+                                               if command in plan.limits}
+            except Exception as e:
+                # the test itself succeeded; report the analysis failure alongside
+                result["summary_error"] = str(e)
+        return result
     except Exception as e:
         return {
             "status": "error",
             "message": str(e)
         }
+    finally:
+        if sample_stream is not None:
+            # deliver the last partial batch before the test reports completion
+            sample_stream.close()
+        # Release the instrument link once no other test is using it
+        session_pool.release(device_ip)
+
+# Runs every test started in server mode; one process, bounded number of workers.
+# Created on first use, so one-shot commands never load the scheduler.
+_test_scheduler = None
+_test_scheduler_lock = threading.Lock()
+
+def test_scheduler():
+    global _test_scheduler
+    with _test_scheduler_lock:
+        if _test_scheduler is None:
+            from scheduler import TestScheduler
+            _test_scheduler = TestScheduler(handle_test_data, max_workers=MAX_CONCURRENT_TESTS)
+        return _test_scheduler
+
+# Sends the "poll" RPC's commands; its connections stay open from one poll to the next.
+_instrument_poller = None
+_instrument_poller_lock = threading.Lock()
+
+def instrument_poller():
+    global _instrument_poller
+    with _instrument_poller_lock:
+        if _instrument_poller is None:
+            from scpi_transports import InstrumentPoller
+            _instrument_poller = InstrumentPoller()
+            atexit.register(_instrument_poller.close)
+        return _instrument_poller
+
 def stop_test(test_id):
     """
     Stops the test with the given test_id.
     """
-    if test_id in active_tests:
-        # Attempt to stop the thread (requires cooperative cancellation in the thread logic)
-        thread = active_tests[test_id]
-        # Implement your cancellation logic here
+    if test_scheduler().cancel(test_id):
+        # The test loop checks its stop event and winds down on its own
         return {"status": "success", "message": f"Test {test_id} stopped successfully"}
     else:
         return {"status": "error", "message": f"Test {test_id} not found"}
 
+def serve(max_workers=8):
+    """
+    Run as a long-lived server speaking line-delimited JSON-RPC over stdin/stdout.
+    Each request is one line: {"id": 1, "method": "query", "params": {...}}.
+    Replies carry the request id so slow calls never block fast ones;
+    a queued test leaving the queue and its completion are sent as "test-started"
+    and "test-finished" notifications without an id, live samples as rate-limited
+    "test-samples" notifications. start_test takes an optional test_id so the
+    caller knows the test before any of them can arrive.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from checkpoints import load_checkpoint
+    from column_transforms import transform_log
+    from log_analytics import DEFAULT_PERCENTILES, load_summary
+    from log_index import overview, read_rows
+    from log_sinks import arrow_to_csv
+    from scpi_block import save_samples
+    from test_plan import compile_plan
+
+    protocol_out = sys.stdout
+    # Debug prints from the test loop and charts.py must not corrupt the protocol stream
+    sys.stdout = sys.stderr
+    out_lock = threading.Lock()
+
+    def send(message):
+        message["jsonrpc"] = "2.0"
+        line = json.dumps(message)
+        with out_lock:
+            protocol_out.write(line + "\n")
+            protocol_out.flush()
+
+    def notify(method, params):
+        send({"method": method, "params": params})
+
+    def rpc_command(params):
+        return send_scpi_command(params["address"], params["command"])
+
+    def rpc_query(params):
+        # unlike "command", errors are reported (as "kind: message") instead of returning "No response";
+        # like the test loop, the command is sent once with a timeout
+        return query_scpi(params["address"], params["command"], timeout_ms=params.get("timeout_ms", DEFAULT_TIMEOUT_MS))
+
+    def rpc_waveform(params):
+        samples = acquire_waveform(params["address"], params["command"], params.get("dtype", "B"),
+                                   params.get("preamble"), byteorder=params.get("byteorder", "big"))
+        path = save_samples(samples, params["output"])
+        return {"path": path, "points": len(samples)}
+
+    def rpc_export_csv(params):
+        return arrow_to_csv(params["log_file"], params.get("csv_file"))
+
+    def rpc_discover(params):
+        # devices are also streamed as "device-found" notifications while the scan runs
+        return scan_lxi_devices(params.get("subnet"),
+                                on_device=lambda device: notify("device-found", device))
+
+    def rpc_start_test(params):
+        test_data = params["test"]
+        output_dir = params["save_dir"]
+        compile_plan(test_data)  # reject a malformed plan before it is queued
+
+        def on_finished(test_id, result):
+            result["test_id"] = test_id
+            notify("test-finished", result)
+
+        # the caller may pick the test_id, so it knows the test before its notifications arrive
+        test_id = test_scheduler().submit(test_data, params["address"], output_dir, test_id=params.get("test_id"),
+                                        on_finished=on_finished,
+                                        on_samples=lambda batch: notify("test-samples", batch),
+                                        on_started=lambda test_id: notify("test-started", {"test_id": test_id}))
+        return {
+            "status": test_scheduler().status(test_id)["status"],
+            "test_id": test_id,
+            "log_file_path": test_log_path(test_data, test_id, output_dir),
+        }
+
+    def rpc_resume_test(params):
+        # continue a stopped or interrupted test from its last checkpoint
+        state = load_checkpoint(params["save_dir"], params["test_id"])
+        address = params.get("address", state["device"])
+
+        def on_finished(test_id, result):
+            result["test_id"] = test_id
+            notify("test-finished", result)
+
+        test_id = test_scheduler().submit(state["plan"], address, params["save_dir"], test_id=state["test_id"],
+                                        on_finished=on_finished,
+                                        on_samples=lambda batch: notify("test-samples", batch), resume=state,
+                                        on_started=lambda test_id: notify("test-started", {"test_id": test_id}))
+        return {
+            "status": test_scheduler().status(test_id)["status"],
+            "test_id": test_id,
+            "log_file_path": state["log_file_path"],
+        }
+
+    def rpc_stop_test(params):
+        return stop_test(params["test_id"])
+
+    def rpc_test_status(params):
+        return test_scheduler().status(params.get("test_id"))
+
+    def rpc_transform_log(params):
+        # bulk regex cleanup of a finished log, spread over worker processes
+        return transform_log(params["log_file"], params["rules"], params.get("output"), params.get("workers"))
+
+    def rpc_chart(params):
+        # csv_file and y_column may be lists to overlay runs and series in one chart
+        import charts
+        csv_files = params["csv_file"]
+        if isinstance(csv_files, str):
+            csv_files = [csv_files]
+        output_html = os.path.splitext(csv_files[0])[0] + "_chart.html"
+        charts.generate_chart(csv_files, params["x_column"], params["y_column"], output_html,
+                              params.get("theme", "light"), pivot_column=params.get("pivot"),
+                              start_time=params.get("start_time"), end_time=params.get("end_time"))
+        return output_html
+
+    def rpc_set_backend(params):
+        return {"backend": select_backend(params["backend"])}
+
+    def rpc_poll(params):
+        # one round of queries to many raw socket/HiSLIP instruments at once, from a single event loop
+        requests = [(request["address"], request["command"]) for request in params["requests"]]
+        replies = instrument_poller().poll(requests, params.get("timeout_ms", DEFAULT_TIMEOUT_MS))
+        return [{"error": str(reply), "kind": classify_error(reply)} if isinstance(reply, Exception)
+                else {"response": reply} for reply in replies]
+
+    def rpc_log_rows(params):
+        # a row or time window of a CSV log, read through its sidecar index
+        return read_rows(params["log_file"], params.get("start_row"), params.get("stop_row"),
+                         params.get("start_time"), params.get("end_time"), params.get("max_rows", 100000))
+
+    def rpc_log_summary(params):
+        # per-command statistics of one or more logs, computed once and then read from the saved summary
+        log_files = params["log_files"] if "log_files" in params else [params["log_file"]]
+        return [load_summary(log_file, params.get("limits"), params.get("percentiles", DEFAULT_PERCENTILES))
+                for log_file in log_files]
+
+    def rpc_log_overview(params):
+        # per-chunk min/max of one command, from the index alone
+        return overview(params["log_file"], params["command"], params.get("start_time"), params.get("end_time"))
+
+    handlers = {
+        "command": rpc_command,
+        "query": rpc_query,
+        "waveform": rpc_waveform,
+        "discover": rpc_discover,
+        "start_test": rpc_start_test,
+        "stop_test": rpc_stop_test,
+        "resume_test": rpc_resume_test,
+        "test_status": rpc_test_status,
+        "chart": rpc_chart,
+        "export_csv": rpc_export_csv,
+        "transform_log": rpc_transform_log,
+        "log_rows": rpc_log_rows,
+        "set_backend": rpc_set_backend,
+        "poll": rpc_poll,
+        "log_overview": rpc_log_overview,
+        "log_summary": rpc_log_summary,
+    }
+
+    def dispatch(request):
+        request_id = request.get("id")
+        handler = handlers.get(request.get("method"))
+        if handler is None:
+            reply = {"id": request_id, "error": {"code": -32601, "message": f"Unknown method: {request.get('method')}"}}
+        else:
+            try:
+                reply = {"id": request_id, "result": handler(request.get("params") or {})}
+            except Exception as e:
+                reply = {"id": request_id, "error": {"code": -32000, "message": str(e)}}
+        if request_id is not None:
+            send(reply)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                send({"id": None, "error": {"code": -32700, "message": f"Invalid JSON format: {str(e)}"}})
+                continue
+            executor.submit(dispatch, request)
+
+    # stdin closed: the parent is gone, wind down running tests
+    test_scheduler().shutdown()
+
         
 if __name__ == "__main__":
     try:
-        if "--ip" in sys.argv and "--command" in sys.argv:
+        if "--backend" in sys.argv:
+            select_backend(sys.argv[sys.argv.index("--backend") + 1])
+        elif os.environ.get("SLATE_SCPI_BACKEND"):
+            select_backend(os.environ["SLATE_SCPI_BACKEND"])
+        if "--serve" in sys.argv:
+            # Long-lived JSON-RPC server used by the Electron app
+            serve()
+        elif "--ip" in sys.argv and "--command" in sys.argv:
             # Handle SCPI commands
             ip_index = sys.argv.index("--ip") + 1
             command_index = sys.argv.index("--command") + 1
@@ -228,11 +814,33 @@ if __name__ == "__main__":
             output_dir = sys.argv[savedir_index]
             try:
                 test_data = json.loads(test_data_json)
-                result = handle_test_data(test_data, device_ip, output_dir)
+                # live samples go out as NDJSON lines ahead of the final result
+                def print_samples(batch):
+                    print(json.dumps(dict(batch, event="samples")), flush=True)
+                result = handle_test_data(test_data, device_ip, output_dir, on_samples=print_samples)
                 print(json.dumps(result))  # Return the result as JSON
             except json.JSONDecodeError as e:
                 print(json.dumps({"error": f"Invalid JSON format: {str(e)}"}))
                 sys.exit(1)
+        elif "--resume" in sys.argv:
+            # Continue an interrupted test from its checkpoint, appending to its log
+            test_index = sys.argv.index("--resume") + 1
+            savedir_index = sys.argv.index("--savedir") + 1 if "--savedir" in sys.argv else len(sys.argv)
+
+            if test_index >= len(sys.argv) or savedir_index >= len(sys.argv):
+                print(json.dumps({"error": "Missing test ID or save directory argument"}))
+                sys.exit(1)
+
+            output_dir = sys.argv[savedir_index]
+            from checkpoints import load_checkpoint
+            state = load_checkpoint(output_dir, sys.argv[test_index])
+            # --ip overrides the instrument address recorded in the checkpoint
+            device_ip = sys.argv[sys.argv.index("--ip") + 1] if "--ip" in sys.argv else state["device"]
+            def print_samples(batch):
+                print(json.dumps(dict(batch, event="samples")), flush=True)
+            result = handle_test_data(state["plan"], device_ip, output_dir, test_id=state["test_id"],
+                                      on_samples=print_samples, resume=state)
+            print(json.dumps(result))
        
         else:
             # Show usage instructions
@@ -240,6 +848,9 @@ if __name__ == "__main__":
             print("  python3 vxi11-api.py --ip <device_ip> --command <command>")
             print("  python3 vxi11-api.py --discover <subnet>")
             print("  python3 vxi11-api.py --start-test <test_data_json>")
+            print("  python3 vxi11-api.py --resume <test_id> --savedir <save_dir> [--ip <device_ip>]")
+            print("  python3 vxi11-api.py --serve")
+            print("  Any of the above with --backend pyvisa|liblxi")
             sys.exit(1)
     except Exception as e:
         print(json.dumps({"error": str(e)}))
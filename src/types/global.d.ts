@@ -8,6 +8,14 @@ declare global {
       saveSelectedDevice: (device: Device) => void;
       startTest: (testData: Omit<Test, 'id' | 'isExpanded'>) => Promise<any>;
       readCSV: (filePath: string) => Promise<{ headers: string[]; data: Record<string, string>[] }>;
+      readCSVRange: (params: {
+        filePath: string;
+        startRow?: number;
+        stopRow?: number;
+        startTime?: number;
+        endTime?: number;
+        maxRows?: number;
+      }) => Promise<{ header: string[]; rows: string[][]; truncated: boolean }>;
       writeCSV: (params: { filePath: string; headers: string[]; data: Record<string, string>[] }) => Promise<boolean>;
       openDirectory: () => Promise<{ path: string; files: string[] } | null>;
       generateChart: (filePath: string) => Promise<any>;
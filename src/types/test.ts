@@ -1,7 +1,7 @@
 export interface TestResult {
   id: string;
   name: string;
-  status: 'running' | 'completed' | 'failed';
+  status: 'queued' | 'running' | 'completed' | 'failed';
   startTime: string;
   endTime?: string;
   command: string;